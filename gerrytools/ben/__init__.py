@@ -1,4 +1,8 @@
 from .binary_ensemble import ben, ben_replay
+from .backends import Backend, FakeBackend, LocalBackend, backend_name, get_backend
+from .docker_manager import PooledContainer, ContainerPool, default_pool, resolve_image
+from .codec import BenIndex, BenReader, BenWriter, ben_to_xben, index_path
+from .shards import ben_score, ben_shards
 from .reben import (
     canonicalize_ben_file,
     relabel_json_file_by_key,
@@ -28,6 +32,22 @@ logger.addHandler(handler)
 __all__ = [
     "ben",
     "ben_replay",
+    "Backend",
+    "LocalBackend",
+    "FakeBackend",
+    "backend_name",
+    "get_backend",
+    "ContainerPool",
+    "PooledContainer",
+    "default_pool",
+    "resolve_image",
+    "BenIndex",
+    "BenReader",
+    "BenWriter",
+    "ben_to_xben",
+    "index_path",
+    "ben_score",
+    "ben_shards",
     "msms_parse",
     "smc_parse",
     "canonicalize_ben_file",
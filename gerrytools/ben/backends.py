@@ -0,0 +1,528 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+# A command and its arguments. PathLike arguments are host paths, which
+# backends translate (e.g. to paths mounted in a container).
+Command = Sequence[Union[str, os.PathLike]]
+
+# Data streamed to a command's stdin: bytes, a file object, or an iterable of
+# chunks of bytes (like the output of Backend.pipe()).
+Stream = Union[bytes, BinaryIO, Iterable[bytes]]
+
+# The backend used when functions aren't given one: "auto", "local", or "docker".
+BACKEND_VARIABLE = "GERRYTOOLS_BACKEND"
+
+# Paths the tools are given to read from their stdin and write to their stdout.
+# Every tool accepts file paths, so streaming through them works whether or not a
+# tool reads stdin by itself, in a container or locally.
+STDIN = "/dev/stdin"
+STDOUT = "/dev/stdout"
+
+CHUNK_SIZE = 1 << 16
+
+
+def byte_chunks(source: Stream) -> Iterator[bytes]:
+    """
+    Splits data to stream to a command into chunks of bytes.
+
+    Args:
+        source (bytes, file, or Iterable): Bytes, a file object (opened in binary
+            or text mode), or an iterable of chunks of bytes or strings.
+
+    Yields:
+        bytes: Chunks of the data.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield bytes(source)
+        return
+
+    read = getattr(source, "read", None)
+    chunks = iter(lambda: read(CHUNK_SIZE), None) if read else iter(source)
+    for chunk in chunks:
+        if not chunk:
+            if read:
+                return
+            continue
+
+        yield chunk.encode("utf-8") if isinstance(chunk, str) else bytes(chunk)
+
+
+def tool_io(
+    input_source: Union[str, os.PathLike, Stream],
+    output_file_path: Optional[Union[str, os.PathLike]] = None,
+) -> Tuple[Union[str, Path], Optional[Union[str, Path]], Optional[Iterator[bytes]]]:
+    """
+    Works out how a tool reads its input and writes its output. Paths are passed
+    to the tool as they are. Anything else is streamed to the tool's stdin, and
+    then its output is streamed from its stdout too, unless an output path is
+    given. An output path of ``"-"`` streams the output of path inputs.
+
+    Args:
+        input_source (str, PathLike, or Stream): The input path, or the input
+            itself; see :func:`byte_chunks`.
+        output_file_path (str or PathLike, optional): The output path. Its
+            directory is created if it doesn't exist. Defaults to None.
+
+    Returns:
+        Tuple: The input argument, the output argument (``STDOUT`` when the output
+        is streamed, and None when the tool names the output file itself), and the
+        chunks to stream to the tool's stdin, if there are any.
+    """
+    if isinstance(input_source, (str, os.PathLike)):
+        source, stdin = Path(input_source), None
+    else:
+        source, stdin = STDIN, byte_chunks(input_source)
+
+    if output_file_path == "-" or (output_file_path is None and stdin is not None):
+        return source, STDOUT, stdin
+
+    if output_file_path is not None:
+        os.makedirs(Path(output_file_path).parent, exist_ok=True)
+        return source, Path(output_file_path), stdin
+
+    return source, None, stdin
+
+
+class _Feeder(threading.Thread):
+    """
+    Writes chunks to a command's stdin from a thread, then closes it. Writes
+    block while the command isn't reading, so the chunks are only consumed as
+    fast as the command processes them. Exceptions raised while producing the
+    chunks are kept in ``error``, to be raised once the command has finished.
+    """
+
+    def __init__(
+        self, chunks: Iterable[bytes], write: Callable, close: Callable[[], None]
+    ):
+        super().__init__(daemon=True)
+        self.chunks, self.write, self.close = chunks, write, close
+        self.error: Optional[BaseException] = None
+
+    def run(self):
+        try:
+            for chunk in self.chunks:
+                try:
+                    self.write(chunk)
+                except OSError:
+                    # The command exited (or closed its stdin) early.
+                    return
+        except BaseException as error:
+            self.error = error
+        finally:
+            try:
+                self.close()
+            except OSError:
+                pass
+
+    def finish(self):
+        """
+        Waits for the thread, re-raising any exception from the chunks.
+        """
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+
+class Backend(ABC):
+    """
+    Runs the command-line tools wrapped by :mod:`gerrytools.ben` and
+    :mod:`gerrytools.mgrp` (``ben``, ``reben``, ``frcw``, ``msms_parser``,
+    ``smc_parser``, ...). Backends only have to implement :meth:`stream`.
+
+    :ivar size: The largest number of commands :meth:`submit` runs at once.
+    """
+
+    size: int = 1
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    @abstractmethod
+    def stream(
+        self,
+        command: Command,
+        demux: bool = False,
+        stdin: Optional[Iterable[bytes]] = None,
+    ) -> Generator:
+        """
+        Runs a command, yielding its output as it's produced.
+
+        Args:
+            command (Sequence): The command and its arguments. ``PathLike``
+                arguments are host paths.
+            demux (bool, optional): Whether to yield ``(stdout, stderr)`` pairs,
+                one of which is None, rather than combined output. Defaults to
+                False.
+            stdin (Iterable[bytes], optional): Chunks to write to the command's
+                stdin, which is closed after the last one. Chunks are only
+                consumed as fast as the command reads them. Defaults to None.
+
+        Yields:
+            bytes: Chunks of the command's output.
+
+        Returns:
+            int: The command's exit code, as the generator's return value.
+        """
+
+    def run(
+        self, command: Command, echo: bool = True, stdin: Optional[Stream] = None
+    ) -> int:
+        """
+        Runs a command and waits for it to finish.
+
+        Args:
+            command (Sequence): The command and its arguments; see :meth:`stream`.
+            echo (bool, optional): Whether to print the command's output as it's
+                produced. Defaults to True.
+            stdin (Stream, optional): Data to stream to the command's stdin; see
+                :func:`byte_chunks`. Defaults to None.
+
+        Returns:
+            int: The command's exit code.
+        """
+        if stdin is not None:
+            stdin = byte_chunks(stdin)
+
+        output = self.stream(command, stdin=stdin)
+        while True:
+            try:
+                chunk = next(output)
+            except StopIteration as stop:
+                return stop.value
+
+            if echo:
+                print(chunk.decode("utf-8"), end="")
+
+    def pipe(
+        self, command: Command, stdin: Optional[Stream] = None, echo: bool = False
+    ) -> Iterator[bytes]:
+        """
+        Runs a command like a stage in a shell pipeline: ``stdin`` is streamed to
+        the command, and its stdout is yielded as it's produced. The command only
+        runs as fast as its output is consumed, so stages can be chained (by
+        passing one's output as the next one's ``stdin``) without writing
+        intermediate files or holding whole outputs in memory. The command
+        starts when iteration does.
+
+        Args:
+            command (Sequence): The command and its arguments; see :meth:`stream`.
+            stdin (Stream, optional): Data to stream to the command's stdin; see
+                :func:`byte_chunks`. Defaults to None.
+            echo (bool, optional): Whether to print the command's stderr. Defaults
+                to False.
+
+        Raises:
+            RuntimeError: If the command fails.
+
+        Yields:
+            bytes: Chunks of the command's stdout.
+        """
+        if stdin is not None:
+            stdin = byte_chunks(stdin)
+
+        output = self.stream(command, demux=True, stdin=stdin)
+        try:
+            while True:
+                try:
+                    stdout, stderr = next(output)
+                except StopIteration as stop:
+                    exit_code = stop.value
+                    break
+
+                if stdout:
+                    yield stdout
+                if stderr and echo:
+                    print(stderr.decode("utf-8", "replace"), end="")
+        finally:
+            output.close()
+
+        if exit_code:
+            raise RuntimeError(
+                f"Command {command[0]} failed with exit code {exit_code}."
+            )
+
+    def submit(self, command: Command, echo: bool = True) -> Future:
+        """
+        Runs a command in the background. Up to ``size`` commands run at once.
+
+        Args:
+            command (Sequence): The command and its arguments; see :meth:`stream`.
+            echo (bool, optional): Whether to print the command's output as it's
+                produced. Defaults to True.
+
+        Returns:
+            Future: A future holding the command's exit code.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.size)
+
+        return self._executor.submit(self.run, command, echo)
+
+    def close(self):
+        """
+        Waits for submitted commands to finish and releases the backend's
+        resources.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _pipe(stream, index: int, chunks: queue.Queue):
+    """
+    Copies chunks from one of a process's pipes to a queue, followed by None.
+    """
+    for chunk in iter(lambda: stream.read1(CHUNK_SIZE), b""):
+        chunks.put((index, chunk))
+    chunks.put((index, None))
+
+
+class LocalBackend(Backend):
+    """
+    Runs commands as local processes, for machines where the tools are installed
+    (e.g. with ``cargo install binary-ensemble``) and Docker is unavailable or
+    unnecessary, like HPC nodes.
+
+    Args:
+        size (int, optional): The largest number of commands :meth:`submit` runs
+            at once. Defaults to the number of cores.
+        paths (dict, optional): Maps paths which appear in string arguments
+            (like the container paths in the MCMC runners' shell commands) to host
+            paths, so commands written for a container can run locally. Defaults
+            to None.
+    """
+
+    def __init__(self, size: Optional[int] = None, paths: Optional[Dict] = None):
+        self.size = size or os.cpu_count() or 1
+
+        # Replace longer paths first, so nested paths are translated correctly.
+        self.paths = sorted(
+            ((str(k), str(v)) for k, v in (paths or {}).items()),
+            key=lambda pair: len(pair[0]),
+            reverse=True,
+        )
+
+    def command(self, command: Command) -> List[str]:
+        """
+        Translates a command's arguments to strings, replacing mapped paths.
+        """
+        translated = []
+        for arg in command:
+            arg = os.fspath(arg) if isinstance(arg, os.PathLike) else str(arg)
+            for path, host in self.paths:
+                arg = arg.replace(path, host)
+            translated.append(arg)
+
+        return translated
+
+    def stream(
+        self,
+        command: Command,
+        demux: bool = False,
+        stdin: Optional[Iterable[bytes]] = None,
+    ) -> Generator:
+        process = subprocess.Popen(
+            self.command(command),
+            stdin=None if stdin is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE if demux else subprocess.STDOUT,
+        )
+
+        feeder = None
+        if stdin is not None:
+            feeder = _Feeder(stdin, process.stdin.write, process.stdin.close)
+            feeder.start()
+
+        try:
+            if not demux:
+                yield from iter(lambda: process.stdout.read1(CHUNK_SIZE), b"")
+                return _finish(process, feeder)
+
+            # Read both pipes at once, so neither fills up and blocks the process.
+            chunks = queue.Queue()
+            for index, pipe in enumerate((process.stdout, process.stderr)):
+                threading.Thread(
+                    target=_pipe, args=(pipe, index, chunks), daemon=True
+                ).start()
+
+            open_pipes = 2
+            while open_pipes:
+                index, chunk = chunks.get()
+                if chunk is None:
+                    open_pipes -= 1
+                else:
+                    yield (chunk, None) if index == 0 else (None, chunk)
+
+            return _finish(process, feeder)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+
+def _finish(process: subprocess.Popen, feeder: Optional[_Feeder]) -> int:
+    """
+    Waits for a process (and the thread writing its stdin) to finish.
+    """
+    exit_code = process.wait()
+    if feeder is not None:
+        feeder.finish()
+
+    return exit_code
+
+
+class FakeBackend(Backend):
+    """
+    Replays recorded output instead of running commands, for testing code which
+    runs the tools. Commands are recorded (with their arguments as strings) in
+    ``commands``, and the data streamed to their stdin (or None) in ``inputs``.
+
+    Example:
+        .. code-block:: python
+
+            backend = FakeBackend({"ben": [b'{"assignment": [1, 2], "sample": 1}\\n']})
+            plans = list(ben_replay("plans.jsonl.ben", use_docker=True, backend=backend))
+
+    Args:
+        outputs (Mapping, optional): Maps strings to the output of commands
+            containing them, as a list of chunks. Each command gets the output of
+            the first string found in it, or no output. To replay demultiplexed
+            output, chunks should be ``(stdout, stderr)`` pairs.
+        exit_code (int, optional): The exit code of every command. Defaults to 0.
+    """
+
+    def __init__(
+        self,
+        outputs: Optional[Mapping[str, Iterable]] = None,
+        exit_code: int = 0,
+    ):
+        self.outputs = {key: list(chunks) for key, chunks in (outputs or {}).items()}
+        self.exit_code = exit_code
+        self.commands: List[List[str]] = []
+        self.inputs: List[Optional[bytes]] = []
+
+    def stream(
+        self,
+        command: Command,
+        demux: bool = False,
+        stdin: Optional[Iterable[bytes]] = None,
+    ) -> Generator:
+        command = [
+            os.fspath(arg) if isinstance(arg, os.PathLike) else str(arg)
+            for arg in command
+        ]
+        self.commands.append(command)
+        self.inputs.append(None if stdin is None else b"".join(stdin))
+
+        joined = " ".join(command)
+        for key, chunks in self.outputs.items():
+            if key in joined:
+                for chunk in chunks:
+                    if demux and not isinstance(chunk, tuple):
+                        chunk = (chunk, None)
+                    elif not demux and isinstance(chunk, tuple):
+                        chunk = b"".join(part for part in chunk if part)
+                    yield chunk
+                break
+
+        return self.exit_code
+
+
+def backend_name(backend: Optional[str] = None, tools: Iterable[str] = ()) -> str:
+    """
+    Resolves the name of a backend.
+
+    Args:
+        backend (str, optional): One of ``"local"``, ``"docker"``, or ``"auto"``.
+            Defaults to None, which uses the ``GERRYTOOLS_BACKEND`` environment
+            variable if it's set and ``"auto"`` otherwise.
+        tools (Iterable[str], optional): The executables the commands need.
+            Automatic selection chooses ``"local"`` if they're all on the
+            ``PATH``, and ``"docker"`` otherwise.
+
+    Returns:
+        str: ``"local"`` or ``"docker"``.
+    """
+    if backend is None:
+        backend = os.environ.get(BACKEND_VARIABLE, "auto")
+
+    if backend == "auto":
+        tools = list(tools)
+        local = tools and all(shutil.which(tool) for tool in tools)
+        return "local" if local else "docker"
+
+    if backend not in {"local", "docker"}:
+        raise ValueError(
+            f'Unsupported backend "{backend}"; use "local", "docker", or "auto".'
+        )
+
+    return backend
+
+
+_local: Optional[LocalBackend] = None
+_local_lock = threading.Lock()
+
+
+def get_backend(
+    backend: Union[str, Backend, None] = None,
+    tools: Iterable[str] = (),
+    docker_image_name: str = "mgggdev/replicate:v0.2",
+    docker_client_args: Optional[dict] = None,
+) -> Backend:
+    """
+    Chooses the backend to run tools with.
+
+    Args:
+        backend (str or Backend, optional): A backend, or one of ``"local"``,
+            ``"docker"``, or ``"auto"``; see :func:`backend_name`. Defaults to
+            None.
+        tools (Iterable[str], optional): The executables the commands need.
+        docker_image_name (str, optional): The image to run Docker commands in.
+            Defaults to ``"mgggdev/replicate:v0.2"``.
+        docker_client_args (dict, optional): Arguments for the Docker client.
+            Defaults to None.
+
+    Returns:
+        Backend: The given backend, a shared :class:`LocalBackend`, or the shared
+        :class:`ContainerPool` for the image (see :func:`default_pool`).
+    """
+    global _local
+
+    if isinstance(backend, Backend):
+        return backend
+
+    backend = backend_name(backend, tools)
+    if backend == "local":
+        with _local_lock:
+            if _local is None:
+                _local = LocalBackend()
+            return _local
+
+    # Imported here, since the Docker backend is built on Backend.
+    from .docker_manager import default_pool
+
+    return default_pool(docker_image_name, docker_client_args)
@@ -1,95 +1,68 @@
-import docker
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 import os
-from .docker_manager import managed_docker_container
+from .backends import STDOUT, Backend, Stream, get_backend, tool_io
+from .codec import BenReader
+from .framing import frame_lines, parse_assignment_line
 import logging
 import json
+import numpy as np
 
 logger = logging.getLogger("ben")
 
 
 def ben(
     mode: str,
-    input_file_path: str,
+    input_file_path: Union[str, os.PathLike, Stream],
     output_file_path: Optional[str] = None,
     verbose: bool = True,
     docker_image_name: str = "mgggdev/replicate:v0.2",
     docker_client_args: Optional[dict] = None,
+    backend: Union[str, Backend, None] = None,
 ):
     """
     Runs the BEN CLI tool from the `binary-ensemble <https://crates.io/crates/binary-ensemble>`_
-    crate in a Docker container. By convention, the output file will be written to the same
-    directory as the input file and any duplicates will be overwritten.
+    crate in a Docker container (or locally, if it's installed). By convention, the output
+    file will be written to the same directory as the input file and any duplicates will be
+    overwritten.
+
+    The input and output can also be streamed, so steps like encoding, canonicalizing
+    and relabeling can be chained without writing intermediate files:
+
+    .. code-block:: python
+
+        with open("ensemble.jsonl", "rb") as plans:
+            encoded = ben("encode", plans)
+            canonical = canonicalize_ben_file(encoded, verbose=False)
+            ben("x-encode", canonical, "ensemble.jsonl.xben")
 
     Args:
         mode (str): The mode to run the program in. Must be one of 'encode', 'x-encode', 'decode', 'x-decode', 'xz-encode', 'xz-decode'.
-        input_file_path (str): The path to the input file to read from.
+        input_file_path (str or Stream): The path to the input file to read from, or the
+            input itself (as bytes, a binary file object, or an iterable of chunks of
+            bytes, like the output of another of these functions), which is streamed to
+            the program's stdin.
         output_file_name (str, optional): The name of the output file to write to.
             When not given, the output name will be derived from the input name
             according to a set of heuristics (usually adding or deleting "ben" or "xben"
-            in the file extension). Defaults to None.
-        verbose (bool, optional): Whether to run the program in verbose mode. Defaults to True.
+            in the file extension), or the output is streamed if the input is. If "-",
+            the output is streamed. Defaults to None.
+        verbose (bool, optional): Whether to run the program in verbose mode. Ignored when
+            the output is streamed. Defaults to True.
         docker_image_name (str, optional): The name of the Docker image to run the program in.
             Defaults to "mgggdev/replicate:v0.2".
         docker_client_args (dict, optional): Additional arguments to pass to the Docker client.
             Used primarily if there are multiple docker contexts on the same machine.
             Defaults to None.
+        backend (str or Backend, optional): Where to run the program: ``"local"``,
+            ``"docker"``, ``"auto"``, or a :class:`Backend`. Defaults to None, which
+            runs the program locally if it's on the ``PATH`` and in the shared pool of
+            Docker containers otherwise (see :func:`get_backend`).
+
+    Returns:
+        Optional[Iterator[bytes]]: If the output is streamed, an iterator over chunks of
+        the program's output, which runs the program as it's consumed. Otherwise, None.
     """
-
-    if docker_client_args is not None:
-        client = docker.DockerClient(**docker_client_args)
-    else:
-        client = docker.from_env()
-
-    # Set up the input and output paths
-    input_parent_path = Path(input_file_path).parent
-    input_file_name = Path(input_file_path).name
-
-    if output_file_path is not None:
-        output_parent_path = Path(output_file_path).parent
-        output_file_name = Path(output_file_path).name
-    else:
-        output_parent_path = input_parent_path
-        output_file_name = None
-
-    os.makedirs(output_parent_path, exist_ok=True)
-
-    config_args = {
-        "name": "ben_runner",
-        "image": docker_image_name,
-        "detach": True,
-        "auto_remove": True,
-        "tty": True,
-        "stdin_open": True,
-        "network_mode": "none",
-    }
-
-    if input_parent_path == output_parent_path:
-        config_args["volumes"] = {
-            os.getcwd(): {"bind": "/home/ben/working", "mode": "rw"},
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/io",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/io"
-        docker_output_path = "/home/ben/io"
-    else:
-        config_args["volumes"] = {
-            os.getcwd(): {"bind": "/home/ben/working", "mode": "rw"},
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/input",
-                "mode": "rw",
-            },
-            output_parent_path.resolve(): {
-                "bind": "/home/ben/output",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/input"
-        docker_output_path = "/home/ben/output"
-
     # Build the command to run in the container
     if mode not in [
         "encode",
@@ -106,52 +79,42 @@ def ben(
         )
         return
 
-    with managed_docker_container(client, config_args) as container:
-        # Pull the docker image and set up the container
-        try:
-            print(f"Pulling Docker image {config_args['image']}")
-            client.images.pull(config_args["image"])
-        except Exception as e:
-            print(
-                f"Error comparing docker container {config_args['image']} against web version. "
-                f"Attempting to run using local image"
-            )
+    source, output, stdin = tool_io(input_file_path, output_file_path)
+    ben_cmd = ["ben", source, "-w", "-m", mode]
 
-        ben_cmd = f"ben {docker_input_path}/{input_file_name} -w -m {mode}"
+    # Progress messages mustn't end up in streamed output.
+    if verbose and output != STDOUT:
+        ben_cmd.append("-v")
 
-        if verbose:
-            ben_cmd += " -v"
+    if output is not None:
+        ben_cmd += ["-o", output]
 
-        if output_file_name is not None:
-            ben_cmd += f" -o {docker_output_path}/{Path(output_file_name).name}"
+    backend = get_backend(backend, [ben_cmd[0]], docker_image_name, docker_client_args)
 
-        cmd = ["sh", "-c", f"{ben_cmd}"]
+    logger.debug(f"Running command: {ben_cmd}")
+    if output == STDOUT:
+        return backend.pipe(ben_cmd, stdin)
 
-        logger.debug(f"Running command: {cmd}")
-        exec_id = client.api.exec_create(
-            container.id, cmd=cmd, tty=False, stdout=True, stderr=True, stdin=False
-        )
-
-        output_generator = client.api.exec_start(
-            exec_id=exec_id, stream=True, detach=False
-        )
-
-        for output in output_generator:
-            print(output.decode("utf-8"), end="")
-
-    client.close()
+    backend.run(ben_cmd, stdin=stdin)
 
 
 def ben_replay(
     input_file_path: str,
     docker_image_name: str = "mgggdev/replicate:v0.2",
     docker_client_args: Optional[dict] = None,
+    use_docker: bool = False,
+    arrays: bool = False,
+    backend: Union[str, Backend, None] = None,
 ):
     """
     This is an iterator that replays any ensemble that is stored in a BEN file so that
     the user may analyze them without having to re-run the ensemble or extract the
     entire ensemble to something human-readable.
 
+    By default, the file is decoded in Python by :class:`BenReader`, which also reads
+    XBEN files. To iterate over assignment vectors as NumPy arrays (or batches of
+    them) rather than dictionaries, use :class:`BenReader` directly.
+
     Args:
         input_file_path (str): The path to the input file to read from.
         docker_image_name (str, optional): The name of the Docker image to run the program in.
@@ -159,88 +122,43 @@ def ben_replay(
         docker_client_args (dict, optional): Additional arguments to pass to the Docker client.
             Used primarily if there are multiple docker contexts on the same machine.
             Defaults to None.
+        use_docker (bool, optional): Whether to decode the file with the BEN CLI tool
+            (in a Docker container, or locally if it's installed; see ``backend``) rather
+            than in Python. Defaults to False.
+        arrays (bool, optional): Whether to yield assignment vectors as NumPy arrays
+            rather than dictionaries, which is much faster for large graphs. Arrays
+            may be read-only. Defaults to False.
+        backend (str or Backend, optional): Where to run the BEN CLI tool when
+            ``use_docker`` is True; see :func:`ben`.
 
     Yields:
         dict: A dictionary of the form {node_index: assignment_value} that is compatible with
-        the constructor for the ``gerrychain.Partition`` class.
+        the constructor for the ``gerrychain.Partition`` class, or an assignment array if
+        ``arrays`` is True.
     """
+    if not use_docker:
+        with BenReader(input_file_path) as reader:
+            for assignment in reader:
+                yield assignment if arrays else dict(enumerate(assignment.tolist()))
+        return
 
-    if docker_client_args is not None:
-        client = docker.DockerClient(**docker_client_args)
-    else:
-        client = docker.from_env()
-
-    # Set up the input and output paths
-    input_parent_path = Path(input_file_path).parent
-    input_file_name = Path(input_file_path).name
-
-    config_args = {
-        "name": "ben_runner",
-        "image": docker_image_name,
-        "detach": True,
-        "auto_remove": True,
-        "tty": True,
-        "stdin_open": True,
-        "network_mode": "none",
-    }
-
-    config_args["volumes"] = {
-        os.getcwd(): {"bind": "/home/ben/working", "mode": "rw"},
-        input_parent_path.resolve(): {
-            "bind": "/home/ben/input",
-            "mode": "rw",
-        },
-    }
-
-    docker_input_path = "/home/ben/input"
-
-    with managed_docker_container(client, config_args) as container:
-        # Pull the docker image and set up the container
-        try:
-            print(f"Pulling Docker image {config_args['image']}")
-            client.images.pull(config_args["image"])
-        except Exception as e:
-            print(
-                f"Error comparing docker container {config_args['image']} against web version. "
-                f"Attempting to run using local image"
-            )
-
-        ben_cmd = f"ben {docker_input_path}/{input_file_name} -w -m decode -p"
-
-        cmd = ["sh", "-c", f"{ben_cmd}"]
+    ben_cmd = ["ben", Path(input_file_path), "-w", "-m", "decode", "-p"]
+    backend = get_backend(backend, [ben_cmd[0]], docker_image_name, docker_client_args)
+    logger.debug(f"Running command: {ben_cmd}")
+    output_generator = backend.stream(ben_cmd, demux=True)
 
-        logger.debug(f"Running command: {cmd}")
-        exec_id = client.api.exec_create(
-            container.id, cmd=cmd, tty=False, stdout=True, stderr=True, stdin=False
-        )
+    # Output arrives in chunks which needn't line up with the lines of JSON,
+    # so the chunks are framed into lines first.
+    stdout_chunks = (stdout for stdout, _ in output_generator)
+    for line in frame_lines(stdout_chunks):
+        if not line.lstrip().startswith(b"{"):
+            continue
 
-        output_generator = client.api.exec_start(
-            exec_id=exec_id, stream=True, detach=False, demux=True
-        )
+        try:
+            assignment = parse_assignment_line(line)["assignment"]
+        except json.JSONDecodeError:
+            print(f"Error parsing JSON: {line.decode('utf-8', 'replace')}")
+            exit(1)
 
-        # Sometimes the output is split between multiple lines
-        # So this will take care of that issue by accumulating the
-        # output until a newline is reached
-        stdout_buffer = ""
-        for stdout, stderr in output_generator:
-            if stdout:
-                stdout_buffer += stdout.decode("utf-8")
-                # Process any complete JSON objects in the buffer
-                while "\n" in stdout_buffer and "}" in stdout_buffer:
-                    newline_index = stdout_buffer.find("\n")
-                    possible_json = stdout_buffer[:newline_index]
-
-                    if "}" in possible_json:
-                        try:
-                            json_obj = json.loads(possible_json)
-                            yield {i: v for i, v in enumerate(json_obj["assignment"])}
-                        except json.JSONDecodeError:
-                            print(f"Error parsing JSON: {possible_json}")
-                            exit(1)
-
-                        stdout_buffer = stdout_buffer[newline_index + 1 :]
-                    else:
-                        # If no complete JSON object, wait for more data
-                        break
-
-    client.close()
+        assignment = np.asarray(assignment)
+        yield assignment if arrays else dict(enumerate(assignment.tolist()))
@@ -0,0 +1,871 @@
+import json
+import lzma
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+STANDARD_HEADER = b"STANDARD BEN FILE"
+MKVCHAIN_HEADER = b"MKVCHAIN BEN FILE"
+HEADER_LENGTH = 17
+
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+# Size of the chunks read from XBEN files.
+XBEN_CHUNK_SIZE = 1 << 20
+
+# Run lengths, repetition counts, and XBEN values are stored as 16-bit unsigned
+# integers; longer runs are split.
+MAX_RUN = (1 << 16) - 1
+
+# Suffix of the sidecar index files written next to BEN files.
+INDEX_SUFFIX = ".idx"
+
+
+def _read_exactly(stream: BinaryIO, n: int) -> bytes:
+    """
+    Reads exactly `n` bytes from a stream, raising an error if the stream ends
+    early.
+    """
+    data = stream.read(n)
+    if len(data) != n:
+        raise ValueError(
+            f"Unexpected end of BEN file: expected {n} bytes, got {len(data)}."
+        )
+    return data
+
+
+def _read_header(stream: BinaryIO) -> bool:
+    """
+    Reads the header of a BEN file (or a decompressed XBEN file).
+
+    Returns:
+        bool: Whether the file is in the Markov chain variant of the format, where
+        each distinct assignment is followed by the number of times it repeats.
+    """
+    header = stream.read(HEADER_LENGTH)
+    if header == STANDARD_HEADER:
+        return False
+    if header == MKVCHAIN_HEADER:
+        return True
+    raise ValueError(
+        f"Unsupported BEN header {header!r}. Only standard and Markov chain "
+        "BEN files are supported."
+    )
+
+
+def decode_ben_frame(
+    data: bytes, max_val_bits: int, max_len_bits: int, dtype=np.int32
+) -> np.ndarray:
+    """
+    Decodes a single frame of a BEN file: a sequence of bit-packed
+    (value, run length) pairs, most significant bit first, padded with zeros to
+    a whole number of bytes.
+
+    Args:
+        data (bytes): The packed pairs.
+        max_val_bits (int): The number of bits used for each value.
+        max_len_bits (int): The number of bits used for each run length.
+        dtype (optional): The dtype of the decoded assignment. Defaults to
+            ``np.int32``.
+
+    Returns:
+        np.ndarray: The decoded assignment vector.
+    """
+    width = max_val_bits + max_len_bits
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    n_pairs = len(bits) // width
+    bits = bits[: n_pairs * width].reshape(n_pairs, width)
+
+    values = bits[:, :max_val_bits] @ (
+        1 << np.arange(max_val_bits - 1, -1, -1, dtype=np.int64)
+    )
+    lengths = bits[:, max_val_bits:] @ (
+        1 << np.arange(max_len_bits - 1, -1, -1, dtype=np.int64)
+    )
+
+    # Padding decodes as pairs with zero length.
+    keep = lengths > 0
+    return np.repeat(values[keep].astype(dtype), lengths[keep])
+
+
+def _runs(assignment: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run-length encodes an assignment vector, splitting runs longer than
+    ``MAX_RUN``.
+
+    Returns:
+        tuple: Arrays of values and run lengths.
+    """
+    assignment = np.asarray(assignment)
+    if assignment.ndim != 1 or len(assignment) == 0:
+        raise ValueError("Assignments must be non-empty one-dimensional arrays.")
+    if assignment.dtype.kind not in "iub":
+        raise ValueError(f"Assignments must be integers; got {assignment.dtype}.")
+    if assignment.min() < 0:
+        raise ValueError("Assignments must be non-negative.")
+
+    starts = np.flatnonzero(np.r_[True, assignment[1:] != assignment[:-1]])
+    lengths = np.diff(np.r_[starts, len(assignment)])
+    values = assignment[starts].astype(np.int64)
+
+    # Split long runs into full runs followed by the remainder.
+    pieces = (lengths + MAX_RUN - 1) // MAX_RUN
+    if (pieces > 1).any():
+        values = np.repeat(values, pieces)
+        last = np.cumsum(pieces) - 1
+        remainders = lengths - MAX_RUN * (pieces - 1)
+        lengths = np.full(len(values), MAX_RUN, dtype=np.int64)
+        lengths[last] = remainders
+
+    return values, lengths
+
+
+def encode_ben_frame(assignment: np.ndarray) -> bytes:
+    """
+    Encodes an assignment vector as a single frame of a BEN file, the inverse
+    of :func:`decode_ben_frame`: the number of bits used for each value and
+    each run length, the number of bytes of packed pairs, and the packed pairs.
+
+    Args:
+        assignment (np.ndarray): The assignment vector, of non-negative integers.
+
+    Returns:
+        bytes: The encoded frame.
+    """
+    values, lengths = _runs(assignment)
+    max_val_bits = max(int(values.max()).bit_length(), 1)
+    max_len_bits = int(lengths.max()).bit_length()
+
+    bits = np.empty((len(values), max_val_bits + max_len_bits), dtype=np.uint8)
+    bits[:, :max_val_bits] = (
+        values[:, None] >> np.arange(max_val_bits - 1, -1, -1)
+    ) & 1
+    bits[:, max_val_bits:] = (
+        lengths[:, None] >> np.arange(max_len_bits - 1, -1, -1)
+    ) & 1
+    data = np.packbits(bits.ravel()).tobytes()
+
+    return bytes([max_val_bits, max_len_bits]) + len(data).to_bytes(4, "big") + data
+
+
+def _encode_xben_sample(assignment: np.ndarray) -> bytes:
+    """
+    Encodes an assignment vector as it's stored in a (decompressed) XBEN file:
+    16-bit big-endian (value, run length) pairs, terminated by four zero bytes.
+    """
+    values, lengths = _runs(assignment)
+    if values.max() > MAX_RUN:
+        raise ValueError(f"XBEN files can't store values larger than {MAX_RUN}.")
+
+    return np.column_stack([values, lengths]).astype(">u2").tobytes() + bytes(4)
+
+
+def _ben_frames(stream: BinaryIO, mkv: bool, dtype) -> Iterator[Tuple[np.ndarray, int]]:
+    """
+    Yields (assignment, count) pairs from a BEN stream positioned just after its
+    header.
+    """
+    while True:
+        prefix = stream.read(6)
+        if not prefix:
+            return
+        if len(prefix) != 6:
+            raise ValueError("Unexpected end of BEN file in a frame header.")
+
+        max_val_bits, max_len_bits = prefix[0], prefix[1]
+        n_bytes = int.from_bytes(prefix[2:], "big")
+        assignment = decode_ben_frame(
+            _read_exactly(stream, n_bytes), max_val_bits, max_len_bits, dtype
+        )
+        count = int.from_bytes(_read_exactly(stream, 2), "big") if mkv else 1
+
+        yield assignment, count
+
+
+def _xben_frames(
+    stream: BinaryIO, mkv: bool, dtype
+) -> Iterator[Tuple[np.ndarray, int]]:
+    """
+    Yields (assignment, count) pairs from a decompressed XBEN stream positioned
+    just after its header. Each assignment is a sequence of 16-bit big-endian
+    (value, run length) pairs terminated by four zero bytes.
+    """
+    buffer = b""
+    while True:
+        chunk = stream.read(XBEN_CHUNK_SIZE)
+        buffer += chunk
+
+        # Runs never have zero length, so a pair of zero halves at a pair
+        # boundary marks the end of an assignment. Which halves are at pair
+        # boundaries depends on where the assignment starts, so keep candidates
+        # at even and odd positions separately.
+        halves = np.frombuffer(buffer, dtype=">u2", count=len(buffer) // 2)
+        zero = halves == 0
+        ends = np.flatnonzero(zero[:-1] & zero[1:])
+        ends = (ends[ends % 2 == 0], ends[ends % 2 == 1])
+
+        start = 0
+        while True:
+            candidates = ends[start % 2]
+            k = np.searchsorted(candidates, start)
+            if k == len(candidates):
+                break
+
+            end = candidates[k]
+            following = end + 2 + (1 if mkv else 0)
+            if following > len(halves):
+                break
+
+            pairs = halves[start:end].reshape(-1, 2)
+            assignment = np.repeat(pairs[:, 0].astype(dtype), pairs[:, 1])
+            count = int(halves[end + 2]) if mkv else 1
+
+            yield assignment, count
+            start = following
+
+        buffer = buffer[2 * start :]
+
+        if not chunk:
+            if buffer:
+                raise ValueError("Unexpected end of XBEN file.")
+            return
+
+
+def index_path(path: Union[str, Path]) -> str:
+    """
+    Gets the path of the sidecar index for a BEN file.
+
+    Args:
+        path (str or Path): The path of the BEN file.
+
+    Returns:
+        str: The path of its index.
+    """
+    return f"{path}{INDEX_SUFFIX}"
+
+
+@dataclass
+class BenIndex:
+    """
+    Index of the frames in an (uncompressed) BEN file, so individual samples can
+    be decoded without decoding the samples before them. Indexes are stored as
+    sidecar files next to the BEN files they index (see :func:`index_path`), and
+    record the size and modification time of the file they were built from so
+    stale indexes can be detected.
+    """
+
+    offsets: np.ndarray
+    """Byte offset of each frame, relative to the start of the BEN file."""
+    starts: np.ndarray
+    """Number of samples before each frame, followed by the total number of
+    samples; frame ``i`` holds samples ``starts[i]`` through ``starts[i + 1] - 1``."""
+    size: int
+    """Size of the indexed file, in bytes."""
+    mkv: bool
+    """Whether the indexed file is in the Markov chain variant."""
+    mtime_ns: Optional[int] = None
+    """Modification time of the indexed file, in nanoseconds, if known."""
+
+    @classmethod
+    def build(cls, file: Union[str, Path, BinaryIO]) -> "BenIndex":
+        """
+        Builds an index by scanning a BEN file's frame headers. Frames themselves
+        are skipped rather than decoded.
+
+        Args:
+            file (str, Path, or binary file): The path of the BEN file, or an
+                open, seekable binary file positioned at the start of one.
+
+        Returns:
+            BenIndex: The file's index.
+        """
+        if isinstance(file, (str, Path)):
+            with open(file, "rb") as stream:
+                return cls.build(stream)
+
+        origin = file.tell()
+        mkv = _read_header(file)
+        offsets, counts = [], []
+
+        while True:
+            offset = file.tell() - origin
+            prefix = file.read(6)
+            if not prefix:
+                break
+            if len(prefix) != 6:
+                raise ValueError("Unexpected end of BEN file in a frame header.")
+
+            file.seek(int.from_bytes(prefix[2:], "big"), os.SEEK_CUR)
+            count = int.from_bytes(_read_exactly(file, 2), "big") if mkv else 1
+            offsets.append(offset)
+            counts.append(count)
+
+        size = file.tell() - origin
+        file.seek(origin)
+
+        return cls(
+            offsets=np.array(offsets, dtype=np.int64),
+            starts=np.concatenate(([0], np.cumsum(counts, dtype=np.int64))),
+            size=size,
+            mkv=mkv,
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "BenIndex":
+        """
+        Loads an index written by :meth:`BenIndex.save`.
+
+        Args:
+            path (str or Path): The path of the index file.
+
+        Returns:
+            BenIndex: The stored index.
+        """
+        with np.load(path, allow_pickle=False) as stored:
+            meta = json.loads(stored["meta"].item())
+            return cls(
+                offsets=stored["offsets"],
+                starts=stored["starts"],
+                size=meta["size"],
+                mkv=meta["mkv"],
+                mtime_ns=meta.get("mtime_ns"),
+            )
+
+    @classmethod
+    def for_file(cls, path: Union[str, Path], save: bool = True) -> "BenIndex":
+        """
+        Gets the index of a BEN file, loading its sidecar index if there's an
+        up-to-date one and building (and saving) it otherwise.
+
+        Args:
+            path (str or Path): The path of the BEN file.
+            save (bool, optional): Whether to save newly-built indexes. Indexes
+                which can't be written (e.g. in read-only directories) are only
+                kept in memory. Defaults to True.
+
+        Returns:
+            BenIndex: The file's index.
+        """
+        sidecar = index_path(path)
+        stat = os.stat(path)
+
+        if os.path.exists(sidecar):
+            try:
+                index = cls.load(sidecar)
+                if index.size == stat.st_size and index.mtime_ns == stat.st_mtime_ns:
+                    return index
+            except (OSError, ValueError, KeyError):
+                pass
+
+        index = cls.build(path)
+        index.mtime_ns = stat.st_mtime_ns
+        if save:
+            try:
+                index.save(sidecar)
+            except OSError:
+                pass
+
+        return index
+
+    def save(self, path: Union[str, Path]):
+        """
+        Saves the index.
+
+        Args:
+            path (str or Path): The path of the index file; usually
+                ``index_path(ben_file_path)``.
+        """
+        meta = {"size": int(self.size), "mkv": bool(self.mkv)}
+        if self.mtime_ns is not None:
+            meta["mtime_ns"] = int(self.mtime_ns)
+        meta = json.dumps(meta)
+        with open(path, "wb") as stream:
+            np.savez(
+                stream,
+                offsets=self.offsets,
+                starts=self.starts,
+                meta=np.asarray(meta),
+            )
+
+    def frame(self, sample: int) -> int:
+        """
+        Finds the frame holding a sample.
+
+        Args:
+            sample (int): The (zero-based) sample number.
+
+        Returns:
+            int: The frame number.
+        """
+        return int(np.searchsorted(self.starts, sample, side="right")) - 1
+
+    def __len__(self) -> int:
+        return int(self.starts[-1])
+
+
+class BenReader:
+    """
+    Decodes BEN and XBEN files (from the
+    `binary-ensemble <https://crates.io/crates/binary-ensemble>`_ crate) in
+    Python, yielding assignment vectors as NumPy arrays without running the
+    BEN CLI tool in a Docker container. Both the standard and Markov chain
+    variants of the format are supported; XBEN files are recognized by their xz
+    header and decompressed as they're read.
+
+    Example:
+        .. code-block:: python
+
+            with BenReader("ensemble.jsonl.ben") as reader:
+                for assignment in reader:
+                    ...
+
+    Samples in uncompressed BEN files can also be read in any order, using a
+    :class:`BenIndex` of the file's frames. The index is built (and saved next
+    to the file) the first time it's needed, or loaded if it already exists:
+
+    .. code-block:: python
+
+            with BenReader("ensemble.jsonl.ben") as reader:
+                last = reader[-1]
+                thinned = reader.samples(step=100)
+                resampled = reader.take(np.random.randint(len(reader.index), size=1000))
+
+    Args:
+        file (str, Path, or binary file): The path of the BEN or XBEN file to
+            read, or an open binary file positioned at the start of one.
+        dtype (optional): The dtype of the decoded assignment vectors.
+            Defaults to ``np.int32``.
+        index (BenIndex, optional): An index of the file's frames. Defaults to
+            None, in which case the index is loaded or built when needed.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, Path, BinaryIO],
+        dtype=np.int32,
+        index: Optional[BenIndex] = None,
+    ):
+        if isinstance(file, (str, Path)):
+            self.path = file
+            self._file = open(file, "rb")
+            self._owns_file = True
+        else:
+            self.path = None
+            self._file = file
+            self._owns_file = False
+
+        self.dtype = dtype
+        self._index = index
+        self._origin = self._file.tell() if self._file.seekable() else None
+        self._cached = (None, None)
+
+        # Figure out whether the file is compressed, without consuming anything
+        # from streams that can't seek.
+        magic = self._peek(len(XZ_MAGIC))
+        self.compressed = magic == XZ_MAGIC
+        self._stream = lzma.open(self._file) if self.compressed else self._file
+
+        self.mkv = _read_header(self._stream)
+        self._frames = (_xben_frames if self.compressed else _ben_frames)(
+            self._stream, self.mkv, dtype
+        )
+
+    def _peek(self, n: int) -> bytes:
+        if hasattr(self._file, "peek"):
+            return self._file.peek(n)[:n]
+
+        position = self._file.tell()
+        data = self._file.read(n)
+        self._file.seek(position)
+        return data
+
+    @property
+    def variant(self) -> str:
+        """
+        str: The variant of the BEN format, either ``"standard"`` or ``"mkv"``.
+        """
+        return "mkv" if self.mkv else "standard"
+
+    def frames(self) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Yields each distinct run of samples once, along with the number of
+        consecutive samples it represents. In standard BEN files every count is
+        1; in Markov chain files, repeated samples are stored once. Scoring each
+        frame once and weighting by its count avoids re-scoring repeated plans.
+
+        Yields:
+            tuple: An ``(assignment, count)`` pair.
+        """
+        yield from self._frames
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """
+        Yields each sample's assignment vector. Repeated samples in Markov chain
+        files are yielded as the same read-only array.
+        """
+        for assignment, count in self._frames:
+            if count > 1:
+                assignment.flags.writeable = False
+            for _ in range(count):
+                yield assignment
+
+    def batches(self, size: int) -> Iterator[np.ndarray]:
+        """
+        Yields samples in batches, as two-dimensional arrays with one row per
+        sample. The final batch may be smaller than ``size``.
+
+        Args:
+            size (int): The number of samples in each batch.
+
+        Yields:
+            np.ndarray: A ``(samples, units)`` array.
+        """
+        batch, filled = [], 0
+        for assignment, count in self._frames:
+            while count > 0:
+                taken = min(count, size - filled)
+                batch.append(np.broadcast_to(assignment, (taken, len(assignment))))
+                filled += taken
+                count -= taken
+
+                if filled == size:
+                    yield np.concatenate(batch)
+                    batch, filled = [], 0
+
+        if batch:
+            yield np.concatenate(batch)
+
+    @property
+    def index(self) -> BenIndex:
+        """
+        BenIndex: The index of the file's frames, loaded or built the first time
+        it's needed; ``len(reader.index)`` is the number of samples in the file.
+        Only uncompressed BEN files can be indexed.
+        """
+        if self._index is None:
+            if self.compressed:
+                raise ValueError(
+                    "XBEN files can't be read out of order; decompress them to "
+                    "BEN files first."
+                )
+            if self._origin is None:
+                raise ValueError("Reading out of order requires a seekable file.")
+
+            if self.path is not None:
+                self._index = BenIndex.for_file(self.path)
+            else:
+                position = self._file.tell()
+                self._file.seek(self._origin)
+                self._index = BenIndex.build(self._file)
+                self._file.seek(position)
+
+        return self._index
+
+    def _decode_frame(self, frame: int) -> np.ndarray:
+        """
+        Decodes a single frame, leaving the file where it was so sequential
+        iteration isn't disturbed. The most recently decoded frame is cached.
+        """
+        if self._cached[0] != frame:
+            position = self._file.tell()
+            self._file.seek(self._origin + int(self.index.offsets[frame]))
+            assignment, _ = next(_ben_frames(self._file, self.mkv, self.dtype))
+            self._file.seek(position)
+
+            assignment.flags.writeable = False
+            self._cached = (frame, assignment)
+
+        return self._cached[1]
+
+    def get(self, sample: int) -> np.ndarray:
+        """
+        Decodes a single sample.
+
+        Args:
+            sample (int): The (zero-based) sample number. Negative numbers count
+                from the end of the file.
+
+        Returns:
+            np.ndarray: The sample's assignment vector, as a read-only array.
+        """
+        n = len(self.index)
+        if sample < 0:
+            sample += n
+        if not 0 <= sample < n:
+            raise IndexError(f"Sample {sample} is out of range for {n} samples.")
+
+        return self._decode_frame(self.index.frame(sample))
+
+    def __getitem__(self, key: Union[int, slice]) -> np.ndarray:
+        """
+        Decodes a sample, or a slice of samples as a two-dimensional array with
+        one row per sample.
+        """
+        if isinstance(key, slice):
+            samples = list(self.take(range(*key.indices(len(self.index)))))
+            return np.stack(samples) if samples else np.empty((0, 0), self.dtype)
+
+        return self.get(key)
+
+    def samples(
+        self, start: int = 0, stop: Optional[int] = None, step: int = 1
+    ) -> Iterator[np.ndarray]:
+        """
+        Yields every ``step``-th sample from ``start`` up to (but not including)
+        ``stop``, decoding only the frames holding them. Useful for thinning a
+        chain, or splitting it into shards.
+
+        Args:
+            start (int, optional): The first sample. Defaults to 0.
+            stop (int, optional): The sample to stop before. Defaults to None,
+                which is the end of the file.
+            step (int, optional): The spacing between samples. Defaults to 1.
+
+        Yields:
+            np.ndarray: Read-only assignment vectors.
+        """
+        return self.take(range(*slice(start, stop, step).indices(len(self.index))))
+
+    def take(self, samples: Iterable[int]) -> Iterator[np.ndarray]:
+        """
+        Yields the given samples, in the given order, e.g. for bootstrap
+        resampling.
+
+        Args:
+            samples (Iterable[int]): Sample numbers.
+
+        Yields:
+            np.ndarray: Read-only assignment vectors.
+        """
+        for sample in samples:
+            yield self.get(int(sample))
+
+    def close(self):
+        """
+        Closes the file, if it was opened by the reader.
+        """
+        if self.compressed:
+            self._stream.close()
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class BenWriter:
+    """
+    Encodes assignment vectors as a BEN or XBEN file as they're produced, so
+    ensembles can be written in compressed form without an intermediate JSONL
+    file or a Docker container. Files written by a ``BenWriter`` can be read by
+    :class:`BenReader` and the BEN CLI tool.
+
+    Example:
+        .. code-block:: python
+
+            with BenWriter("ensemble.jsonl.ben", variant="mkv") as writer:
+                for partition in chain:
+                    writer.write(partition.assignment.to_series().sort_index())
+
+    Args:
+        file (str, Path, or binary file): The path of the file to write, or an
+            open binary file. Files opened by the writer are overwritten.
+        variant (str, optional): The variant of the BEN format, either
+            ``"standard"`` or ``"mkv"``. In the Markov chain (``"mkv"``) variant,
+            consecutive repeated samples are stored once, with a count. Defaults
+            to ``"standard"``.
+        xben (bool, optional): Whether to write an xz-compressed XBEN file rather
+            than a BEN file. Defaults to False.
+        compression_level (int, optional): The xz compression level (0-9) used for
+            XBEN files. Defaults to 9.
+        index (bool, optional): Whether to index the frames of a BEN file as
+            they're written, so it can be read out of order without a scan. The
+            index is available as :attr:`index` once the writer is closed, and
+            is saved next to files opened by the writer. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, Path, BinaryIO],
+        variant: str = "standard",
+        xben: bool = False,
+        compression_level: int = 9,
+        index: bool = False,
+    ):
+        if variant not in {"standard", "mkv"}:
+            raise ValueError(
+                f'Unsupported BEN variant "{variant}"; use "standard" or "mkv".'
+            )
+        if index and xben:
+            raise ValueError("Only BEN files can be indexed, not XBEN files.")
+
+        if isinstance(file, (str, Path)):
+            self.path = file
+            self._file = open(file, "wb")
+            self._owns_file = True
+        else:
+            self.path = None
+            self._file = file
+            self._owns_file = False
+
+        self.variant = variant
+        self.mkv = variant == "mkv"
+        self.xben = xben
+        self.samples = 0
+
+        if xben:
+            self._stream = lzma.open(self._file, "wb", preset=compression_level)
+            self._encode = _encode_xben_sample
+        else:
+            self._stream = self._file
+            self._encode = encode_ben_frame
+
+        self._stream.write(MKVCHAIN_HEADER if self.mkv else STANDARD_HEADER)
+
+        # Frame offsets and counts, if the file is being indexed.
+        self.index = None
+        self._indexing = index
+        self._position = HEADER_LENGTH
+        self._offsets, self._counts = [], []
+
+        # The most recent assignment and its count, for the Markov chain variant.
+        self._previous = None
+        self._count = 0
+        self.closed = False
+
+    def write(self, assignment):
+        """
+        Writes a sample.
+
+        Args:
+            assignment (array-like): The sample's assignment vector, of
+                non-negative integers. Assignment dictionaries keyed by node
+                index should be converted to lists (or arrays) first.
+        """
+        self._write(np.asarray(assignment), 1)
+
+    def _write(self, assignment: np.ndarray, count: int):
+        """
+        Writes ``count`` consecutive copies of a sample.
+        """
+        if self.closed:
+            raise ValueError("Can't write to a closed BenWriter.")
+
+        self.samples += count
+
+        if not self.mkv:
+            frame = self._encode(assignment)
+            for _ in range(count):
+                self._emit(frame, 1)
+            return
+
+        # Merge repeated samples into the pending one, up to the largest count
+        # that can be stored.
+        if self._previous is not None and np.array_equal(assignment, self._previous):
+            merged = self._count + count
+            if merged <= MAX_RUN:
+                self._count = merged
+                return
+            self._count, count = MAX_RUN, merged - MAX_RUN
+
+        # The pending sample is copied, so callers may reuse their arrays.
+        pending = assignment.copy()
+        self._flush()
+        self._previous = pending
+        while count > MAX_RUN:
+            self._count = MAX_RUN
+            self._flush()
+            self._previous = pending
+            count -= MAX_RUN
+        self._count = count
+
+    def _flush(self):
+        """
+        Writes the pending Markov chain sample, if any.
+        """
+        if self._previous is not None:
+            self._emit(
+                self._encode(self._previous) + self._count.to_bytes(2, "big"),
+                self._count,
+            )
+            self._previous = None
+
+    def _emit(self, frame: bytes, count: int):
+        """
+        Writes an encoded frame holding ``count`` samples, indexing it if needed.
+        """
+        self._stream.write(frame)
+
+        if self._indexing:
+            self._offsets.append(self._position)
+            self._counts.append(count)
+            self._position += len(frame)
+
+    def close(self):
+        """
+        Writes any pending sample and finishes the file. If the writer opened the
+        file, it's closed.
+        """
+        if self.closed:
+            return
+
+        self._flush()
+        if self.xben:
+            self._stream.close()
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+        if self._indexing:
+            self.index = BenIndex(
+                offsets=np.array(self._offsets, dtype=np.int64),
+                starts=np.concatenate(([0], np.cumsum(self._counts, dtype=np.int64))),
+                size=self._position,
+                mkv=self.mkv,
+            )
+            if self.path is not None:
+                self.index.mtime_ns = os.stat(self.path).st_mtime_ns
+                self.index.save(index_path(self.path))
+
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def ben_to_xben(
+    input_file: Union[str, Path, BinaryIO],
+    output_file: Union[str, Path, BinaryIO],
+    compression_level: int = 9,
+):
+    """
+    Compresses a BEN file into an XBEN file, keeping its variant. Markov chain
+    repetition counts are copied rather than expanded.
+
+    Args:
+        input_file (str, Path, or binary file): The BEN file to compress.
+        output_file (str, Path, or binary file): The XBEN file to write.
+        compression_level (int, optional): The xz compression level (0-9).
+            Defaults to 9.
+    """
+    with (
+        BenReader(input_file) as reader,
+        BenWriter(
+            output_file,
+            variant=reader.variant,
+            xben=True,
+            compression_level=compression_level,
+        ) as writer,
+    ):
+        for assignment, count in reader.frames():
+            writer._write(assignment, count)
@@ -1,28 +1,540 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
 from contextlib import contextmanager
-import docker
+from pathlib import Path, PurePosixPath
+from typing import Dict, Generator, Iterable, Iterator, List, Optional, Tuple, Union
 
+from .backends import Backend, Command, _Feeder
 
-@contextmanager
-def managed_docker_container(docker_client, config_args):
+logger = logging.getLogger("ben")
+
+DEFAULT_IMAGE = "mgggdev/replicate:v0.2"
+
+# Host directories are mounted in pooled containers under this directory.
+MOUNT_ROOT = PurePosixPath("/home/ben/mnt")
+
+# How long (in seconds) a resolved image is trusted before it's looked up again.
+IMAGE_TTL = 3600.0
+
+# The IDs of resolved images, and when they were resolved, by Docker host and name.
+_images: Dict[tuple, Tuple[str, float]] = {}
+_images_lock = threading.Lock()
+
+
+def resolve_image(
+    client,
+    docker_image_name: str = DEFAULT_IMAGE,
+    pull: bool = False,
+    ttl: float = IMAGE_TTL,
+) -> str:
     """
-    Context manager for running a docker container. This helps to make
-    sure that the container is properly removed after it is done running
-    or if an error is encountered in the middle of running the container.
+    Makes sure an image is available to a Docker client without going to the
+    network unless it has to. An image that's already available locally (by tag
+    or digest) is used as it is; otherwise, it's pulled. Successful resolutions
+    are remembered for ``ttl`` seconds, so later calls don't even ask the Docker
+    daemon, which keeps offline machines from waiting on pulls that time out.
 
     Args:
-        docker_client: The docker client that will be used to run the container.
-        config_args: The arguments that will be passed to docker_client.containers.run.
-    """
-    container = None
-    try:
-        container = docker_client.containers.run(**config_args)
-        print(f"Running container {container.name}")
-        yield container
-    except Exception as e:
-        print(f"Error running container: {e}")
-    finally:
-        if container:
-            try:
-                container.remove(force=True)
-            except docker.errors.APIError as e:
-                print(f"Error removing container: {e}")
+        client: The Docker client.
+        docker_image_name (str, optional): The image's name, tag, or digest.
+            Defaults to ``"mgggdev/replicate:v0.2"``.
+        pull (bool, optional): Whether to pull the image even if it's available
+            locally, e.g. to pick up a new version of a tag. If the pull fails,
+            the local image is used. Defaults to False.
+        ttl (float, optional): How long to remember the resolution, in seconds.
+            Defaults to an hour.
+
+    Raises:
+        docker.errors.DockerException: If the image isn't available locally and
+            can't be pulled.
+
+    Returns:
+        str: The image's ID.
+    """
+    import docker
+
+    key = (getattr(getattr(client, "api", None), "base_url", None), docker_image_name)
+
+    image = None
+    if not pull:
+        with _images_lock:
+            cached = _images.get(key)
+        if cached is not None and time.monotonic() - cached[1] < ttl:
+            return cached[0]
+
+        try:
+            image = client.images.get(docker_image_name)
+        except docker.errors.ImageNotFound:
+            logger.debug(f"Docker image {docker_image_name} isn't available locally")
+
+    if image is None:
+        try:
+            print(f"Pulling Docker image {docker_image_name}")
+            image = client.images.pull(docker_image_name)
+        except Exception:
+            if not pull:
+                raise
+
+            print(
+                f"Error comparing docker container {docker_image_name} against web "
+                f"version. Attempting to run using local image"
+            )
+            image = client.images.get(docker_image_name)
+
+    image_id = getattr(image, "id", None) or docker_image_name
+    with _images_lock:
+        _images[key] = (image_id, time.monotonic())
+
+    return image_id
+
+
+def _directory(path: Union[str, os.PathLike]) -> Path:
+    """
+    Gets the host directory a path needs mounted: the path itself for
+    directories, and its parent otherwise.
+    """
+    path = Path(path).resolve()
+    return path if path.is_dir() else path.parent
+
+
+def _mountpoint(directory: Path) -> PurePosixPath:
+    return MOUNT_ROOT / hashlib.sha1(str(directory).encode()).hexdigest()[:12]
+
+
+class PooledContainer(Backend):
+    """
+    A warm container leased from a :class:`ContainerPool`, with some host
+    directories mounted in it. It can also wrap any running container, to run
+    commands in it as a :class:`Backend`.
+
+    :ivar container: The Docker container.
+    :ivar mounts: The host directories mounted in the container, and where
+        they're mounted.
+    """
+
+    def __init__(self, client, container, mounts: Dict[Path, PurePosixPath]):
+        self.client = client
+        self.container = container
+        self.mounts = mounts
+
+    @property
+    def name(self) -> str:
+        return self.container.name
+
+    def _mounted(self, directory: Path) -> Optional[PurePosixPath]:
+        """
+        Finds where a host directory is in the container, if it's mounted.
+        """
+        for host, bind in self.mounts.items():
+            if directory == host or host in directory.parents:
+                return bind.joinpath(*directory.relative_to(host).parts)
+
+        return None
+
+    def covers(self, directories: Iterable[Path]) -> bool:
+        """
+        Checks whether host directories are available in the container.
+        """
+        return all(self._mounted(directory) is not None for directory in directories)
+
+    def path(self, path: Union[str, os.PathLike]) -> str:
+        """
+        Translates a host path to the corresponding path in the container.
+
+        Args:
+            path (str or PathLike): The host path.
+
+        Raises:
+            ValueError: If the path's directory isn't mounted in the container.
+
+        Returns:
+            str: The path in the container.
+        """
+        resolved = Path(path).resolve()
+        directory = _directory(resolved)
+        mounted = self._mounted(directory)
+
+        if mounted is None:
+            raise ValueError(f"{path} isn't mounted in container {self.name}.")
+
+        return str(mounted if directory == resolved else mounted / resolved.name)
+
+    def command(self, command: Command) -> List[str]:
+        """
+        Translates the host paths in a command, given as ``PathLike`` arguments,
+        to paths in the container. Other arguments are left as they are.
+        """
+        return [
+            self.path(arg) if isinstance(arg, os.PathLike) else str(arg)
+            for arg in command
+        ]
+
+    def stream(
+        self,
+        command: Command,
+        demux: bool = False,
+        stdin: Optional[Iterable[bytes]] = None,
+    ) -> Generator:
+        """
+        Runs a command in the container.
+
+        Args:
+            command (Sequence): The command and its arguments; see :meth:`command`.
+            demux (bool, optional): Whether to yield ``(stdout, stderr)`` pairs
+                rather than combined output. Defaults to False.
+            stdin (Iterable[bytes], optional): Chunks to write to the command's
+                stdin through the exec's socket. Defaults to None.
+
+        Yields:
+            Chunks of the command's output, as it's produced.
+
+        Returns:
+            int: The command's exit code, as the generator's return value.
+        """
+        from docker.utils.socket import STDOUT, frames_iter
+
+        cmd = self.command(command)
+        logger.debug(f"Running command in {self.name}: {cmd}")
+
+        exec_id = self.client.api.exec_create(
+            self.container.id,
+            cmd=cmd,
+            tty=False,
+            stdout=True,
+            stderr=True,
+            stdin=stdin is not None,
+        )
+
+        if stdin is None:
+            yield from self.client.api.exec_start(
+                exec_id, stream=True, detach=False, demux=demux
+            )
+            return self._exit_code(exec_id)
+
+        # Attach to the exec's socket: stdin is written to it from a thread, and
+        # the multiplexed stdout and stderr frames are read from it here.
+        attached = self.client.api.exec_start(exec_id, socket=True)
+        raw = getattr(attached, "_sock", attached)
+        feeder = _Feeder(stdin, raw.sendall, lambda: raw.shutdown(socket.SHUT_WR))
+        feeder.start()
+
+        try:
+            for stream_id, chunk in frames_iter(attached, tty=False):
+                if not demux:
+                    yield chunk
+                elif stream_id == STDOUT:
+                    yield (chunk, None)
+                else:
+                    yield (None, chunk)
+        finally:
+            attached.close()
+
+        feeder.finish()
+        return self._exit_code(exec_id)
+
+    def _exit_code(self, exec_id) -> int:
+        """
+        Gets an exec's exit code, waiting for it to finish if its output has
+        ended but it hasn't exited yet.
+        """
+        while True:
+            inspected = self.client.api.exec_inspect(exec_id)
+            if not inspected.get("Running"):
+                return inspected["ExitCode"]
+            time.sleep(0.01)
+
+
+class ContainerPool(Backend):
+    """
+    A pool of warm Docker containers for running the command-line tools in the
+    ``mgggdev/replicate`` image (``ben``, ``reben``, ``msms_parser``,
+    ``smc_parser``, ...). Containers are started when they're first needed and
+    reused for later commands, rather than being started and removed for every
+    command; each has a unique name, so commands can run concurrently.
+
+    Host paths are passed to commands as ``Path`` (or other ``PathLike``)
+    arguments. The directories holding them are mounted on demand: a command
+    runs in an idle container with the directories it needs already mounted if
+    there is one, or otherwise in a new container with them mounted (replacing
+    the least recently used idle container if the pool is full).
+
+    Example:
+        .. code-block:: python
+
+            with ContainerPool(size=8) as pool:
+                futures = [
+                    pool.submit(["reben", Path(path), "-m", "ben"]) for path in paths
+                ]
+                codes = [future.result() for future in futures]
+
+    Args:
+        docker_image_name (str, optional): The image to run containers from.
+            Defaults to ``"mgggdev/replicate:v0.2"``.
+        size (int, optional): The largest number of containers to keep. Defaults
+            to the number of cores, up to four.
+        docker_client_args (dict, optional): Arguments for the Docker client.
+            Defaults to None, which uses the environment's Docker settings.
+        pull (bool, optional): Whether to pull the image before starting the first
+            container, even if it's available locally. Defaults to False, which
+            only pulls images that aren't; see :func:`resolve_image`.
+        name (str, optional): Prefix for the containers' names. Defaults to
+            ``"gerrytools"``.
+        client (optional): A Docker client to use instead of creating one.
+    """
+
+    def __init__(
+        self,
+        docker_image_name: str = DEFAULT_IMAGE,
+        size: Optional[int] = None,
+        docker_client_args: Optional[dict] = None,
+        pull: bool = False,
+        name: str = "gerrytools",
+        client=None,
+    ):
+        if client is not None:
+            self.client = client
+        else:
+            # docker-py is only imported when it's needed, so machines without
+            # it can still use the other backends.
+            import docker
+
+            if docker_client_args is not None:
+                self.client = docker.DockerClient(**docker_client_args)
+            else:
+                self.client = docker.from_env()
+
+        self.image = docker_image_name
+        self.size = size or min(os.cpu_count() or 1, 4)
+        self.name = name
+        self.closed = False
+
+        # Idle containers, least recently used first, and the number of
+        # containers which are running (or starting).
+        self._idle: List[PooledContainer] = []
+        self._count = 0
+        self._condition = threading.Condition()
+
+        self.pull = pull
+        self._resolved = False
+        self._resolve_lock = threading.Lock()
+
+    def _resolve(self):
+        with self._resolve_lock:
+            if not self._resolved:
+                resolve_image(self.client, self.image, pull=self.pull)
+                self._resolved = True
+
+    def _start(self, directories: List[Path]) -> PooledContainer:
+        self._resolve()
+        mounts = {directory: _mountpoint(directory) for directory in directories}
+
+        container = self.client.containers.run(
+            image=self.image,
+            name=f"{self.name}_{uuid.uuid4().hex[:12]}",
+            detach=True,
+            auto_remove=True,
+            tty=True,
+            stdin_open=True,
+            network_mode="none",
+            volumes={
+                str(host): {"bind": str(bind), "mode": "rw"}
+                for host, bind in mounts.items()
+            },
+        )
+        logger.debug(f"Started container {container.name}")
+
+        return PooledContainer(self.client, container, mounts)
+
+    @staticmethod
+    def _remove(leased: PooledContainer):
+        import docker
+
+        try:
+            leased.container.remove(force=True)
+        except docker.errors.APIError as e:
+            print(f"Error removing container: {e}")
+
+    def _acquire(self, directories: List[Path]) -> PooledContainer:
+        evicted = None
+
+        with self._condition:
+            while True:
+                if self.closed:
+                    raise RuntimeError("Can't run commands in a closed ContainerPool.")
+
+                # Prefer the most recently used container with the directories.
+                for leased in reversed(self._idle):
+                    if leased.covers(directories):
+                        self._idle.remove(leased)
+                        return leased
+
+                if self._count < self.size:
+                    self._count += 1
+                    break
+                if self._idle:
+                    evicted = self._idle.pop(0)
+                    break
+
+                self._condition.wait()
+
+        if evicted is not None:
+            self._remove(evicted)
+
+        try:
+            return self._start(directories)
+        except BaseException:
+            with self._condition:
+                self._count -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, leased: PooledContainer, healthy: bool):
+        with self._condition:
+            if healthy and not self.closed:
+                self._idle.append(leased)
+                leased = None
+            else:
+                self._count -= 1
+            self._condition.notify()
+
+        if leased is not None:
+            self._remove(leased)
+
+    @contextmanager
+    def container(
+        self, paths: Iterable[Union[str, os.PathLike]] = ()
+    ) -> Iterator[PooledContainer]:
+        """
+        Leases a container with the directories holding ``paths`` mounted,
+        waiting for one to become available if the pool is full. Containers
+        which raise Docker errors are removed rather than returned to the pool.
+
+        Args:
+            paths (Iterable): Host paths the container needs.
+
+        Yields:
+            PooledContainer: The container.
+        """
+        directories = sorted({_directory(path) for path in paths})
+        directories = [
+            directory
+            for directory in directories
+            if not any(other in directory.parents for other in directories)
+        ]
+
+        import docker
+
+        leased = self._acquire(directories)
+        healthy = True
+        try:
+            yield leased
+        except docker.errors.DockerException:
+            healthy = False
+            raise
+        finally:
+            self._release(leased, healthy)
+
+    def stream(
+        self,
+        command: Command,
+        demux: bool = False,
+        stdin: Optional[Iterable[bytes]] = None,
+    ) -> Generator:
+        """
+        Runs a command in a pooled container, yielding its output as it's
+        produced. The container is leased until the output is exhausted (or the
+        generator is closed).
+
+        Args:
+            command (Sequence): The command and its arguments. ``PathLike``
+                arguments are host paths, which are mounted and translated.
+            demux (bool, optional): Whether to yield ``(stdout, stderr)`` pairs
+                rather than combined output. Defaults to False.
+            stdin (Iterable[bytes], optional): Chunks to write to the command's
+                stdin. Defaults to None.
+
+        Yields:
+            Chunks of the command's output.
+
+        Returns:
+            int: The command's exit code, as the generator's return value.
+        """
+        paths = [arg for arg in command if isinstance(arg, os.PathLike)]
+        with self.container(paths) as leased:
+            return (yield from leased.stream(command, demux=demux, stdin=stdin))
+
+    def close(self):
+        """
+        Waits for submitted commands to finish, then removes the pool's
+        containers.
+        """
+        super().close()
+
+        with self._condition:
+            self.closed = True
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+            self._condition.notify_all()
+
+        for leased in idle:
+            self._remove(leased)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+_pools: Dict[tuple, ContainerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def default_pool(
+    docker_image_name: str = DEFAULT_IMAGE, docker_client_args: Optional[dict] = None
+) -> ContainerPool:
+    """
+    Gets the shared :class:`ContainerPool` for an image (and Docker client),
+    creating it the first time it's needed. The BEN, REBEN, and parser functions
+    use the shared pool when they aren't given one, so their containers are kept
+    warm between calls; shared pools are closed when the interpreter exits.
+
+    Args:
+        docker_image_name (str, optional): The image. Defaults to
+            ``"mgggdev/replicate:v0.2"``.
+        docker_client_args (dict, optional): Arguments for the Docker client.
+            Defaults to None.
+
+    Returns:
+        ContainerPool: The shared pool.
+    """
+    key = (
+        docker_image_name,
+        json.dumps(docker_client_args, sort_keys=True, default=str),
+    )
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = _pools[key] = ContainerPool(
+                docker_image_name, docker_client_args=docker_client_args
+            )
+
+        return pool
+
+
+@atexit.register
+def _close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,165 @@
+import json
+import warnings
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+ASSIGNMENT_KEY = b'"assignment"'
+
+# The bytes a JSON list of integers may hold, and the range of int64.
+_INTEGER_BYTES = b"0123456789,- \t\r\n"
+_INT64 = np.iinfo(np.int64)
+
+
+class LineFramer:
+    """
+    Splits a stream of byte chunks (e.g. a container's stdout) into lines. Chunks
+    are appended to a single ``bytearray``, and each byte is scanned for newlines
+    only once, so lines split across many chunks (like the multi-megabyte lines
+    block-level ensembles produce) are framed in linear time.
+
+    Example:
+        .. code-block:: python
+
+            framer = LineFramer()
+            for chunk in chunks:
+                for line in framer.feed(chunk):
+                    ...
+            last = framer.flush()
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Adds a chunk to the buffer.
+
+        Args:
+            chunk (bytes): The chunk.
+
+        Returns:
+            List[bytes]: The lines completed by the chunk, without their newlines.
+        """
+        buffer = self._buffer
+        scanned = len(buffer)
+        buffer += chunk
+
+        # Only the new bytes can hold newlines.
+        lines, start = [], 0
+        end = buffer.find(b"\n", scanned)
+        while end >= 0:
+            lines.append(bytes(buffer[start:end]))
+            start = end + 1
+            end = buffer.find(b"\n", start)
+
+        if start:
+            del buffer[:start]
+
+        return lines
+
+    def flush(self) -> Optional[bytes]:
+        """
+        Empties the buffer.
+
+        Returns:
+            Optional[bytes]: The unterminated last line, if there is one.
+        """
+        rest = bytes(self._buffer)
+        self._buffer.clear()
+
+        return rest if rest.strip() else None
+
+
+def frame_lines(chunks: Iterable[Optional[bytes]]) -> Iterator[bytes]:
+    """
+    Splits a stream of byte chunks into lines with a :class:`LineFramer`. Empty
+    chunks (and ``None``) are skipped, and an unterminated last line is included.
+
+    Args:
+        chunks (Iterable[bytes]): The chunks.
+
+    Yields:
+        bytes: Lines, without their newlines.
+    """
+    framer = LineFramer()
+    for chunk in chunks:
+        if chunk:
+            yield from framer.feed(chunk)
+
+    last = framer.flush()
+    if last is not None:
+        yield last
+
+
+def parse_assignment_line(line: bytes, dtype=np.int32) -> dict:
+    """
+    Parses a JSON line holding an ``"assignment"`` list (like the canonical
+    output of the BEN CLI tool and the MCMC runners) into a dictionary whose
+    ``"assignment"`` is a NumPy array. The assignment is parsed straight into an
+    array, and only the rest of the line goes through ``json``, which is several
+    times faster than parsing the whole line for large assignments.
+
+    Args:
+        line (bytes): The line.
+        dtype (optional): The (integer) dtype of the assignment array. Defaults
+            to ``np.int32``.
+
+    Raises:
+        json.JSONDecodeError: If the line isn't valid JSON.
+
+    Returns:
+        dict: The parsed line. Assignments which aren't flat lists of integers
+        that fit in ``dtype`` are left as they are, rather than being truncated.
+    """
+    key = line.find(ASSIGNMENT_KEY)
+    start = line.find(b"[", key) if key >= 0 else -1
+    stop = line.find(b"]", start) if start >= 0 else -1
+
+    if stop >= 0 and not line[key + len(ASSIGNMENT_KEY) : start].strip(b" :"):
+        assignment = _parse_integers(line[start + 1 : stop], dtype)
+        if assignment is not None:
+            record = json.loads(line[:start] + b"null" + line[stop + 1 :])
+            record["assignment"] = assignment
+            return record
+
+    record = json.loads(line)
+    if isinstance(record, dict) and isinstance(record.get("assignment"), list):
+        assignment = record["assignment"]
+        if all(type(label) is int for label in assignment):
+            try:
+                record["assignment"] = np.asarray(assignment, dtype=dtype)
+            except (OverflowError, ValueError):
+                pass
+
+    return record
+
+
+def _parse_integers(values: bytes, dtype) -> Optional[np.ndarray]:
+    """
+    Parses comma-separated integers into an array of ``dtype``, or returns None
+    if they aren't all integers which fit in ``dtype``. NumPy stops parsing at
+    the first value it can't read (e.g. the ``.5`` of ``3.5``) and saturates
+    values which don't fit, so both are checked for rather than trusted.
+    """
+    if values.translate(None, _INTEGER_BYTES):
+        return None
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            parsed = np.fromstring(values, dtype=np.int64, sep=",")
+    except (DeprecationWarning, ValueError):
+        return None
+
+    if len(parsed) != values.count(b",") + 1:
+        return None
+
+    # Values outside int64 are saturated, so the extremes themselves are left to
+    # json.
+    bounds = np.iinfo(dtype)
+    low, high = max(bounds.min, _INT64.min + 1), min(bounds.max, _INT64.max - 1)
+    if parsed.min() < low or parsed.max() > high:
+        return None
+
+    return parsed.astype(dtype, copy=False)
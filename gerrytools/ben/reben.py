@@ -1,27 +1,27 @@
-import docker
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 import os
-from .docker_manager import managed_docker_container
+from .backends import STDOUT, Backend, Stream, get_backend, tool_io
 import logging
 
 logger = logging.getLogger("ben")
 
 
 def canonicalize_ben_file(
-    input_file_path: str,
+    input_file_path: Union[str, os.PathLike, Stream],
     output_file_path: Optional[str] = None,
     verbose: bool = True,
     docker_image_name: str = "mgggdev/replicate:v0.2",
     docker_client_args: Optional[dict] = None,
+    backend: Union[str, Backend, None] = None,
 ):
     """
     Runs the REBEN CLI tool from the
     `binary-ensemble <https://crates.io/crates/binary-ensemble>`_
-    crate in a Docker container. This function is specifically designed to just
-    run the canonialization method of the REBEN tool. This canonicalizes the
-    assignment vectors in the input file so that they are ordered starting at 1, so
-    an assignment vector of the form
+    crate in a Docker container (or locally, if it's installed). This function is
+    specifically designed to just run the canonialization method of the REBEN tool. This
+    canonicalizes the assignment vectors in the input file so that they are ordered
+    starting at 1, so an assignment vector of the form
 
     [2,2,4,4,1,1,3,3]
 
@@ -33,103 +33,50 @@ def canonicalize_ben_file(
     through the BEN tool with the 'x-encode' mode.
 
     Args:
-        input_file_path (str): The path to the input file to read from. This is expected
-            to be a BEN file.
+        input_file_path (str or Stream): The path to the input file to read from, or the
+            input itself (as bytes, a binary file object, or an iterable of chunks of
+            bytes, like the output of :func:`ben`), which is streamed to the program's
+            stdin. This is expected to be a BEN file.
         output_file_path (str, optional): The path of the output file to write to.
             When not given, the output name will be derived from the input name
             according to a set of heuristics (usually adding or deleting "ben"
-            in the file extension). Defaults to None.
-        verbose (bool, optional): Whether to run the program in verbose mode. Defaults to True.
+            in the file extension), or the output is streamed if the input is. If "-",
+            the output is streamed. Defaults to None.
+        verbose (bool, optional): Whether to run the program in verbose mode. Ignored when
+            the output is streamed. Defaults to True.
         docker_image_name (str, optional): The name of the Docker image to run the program in.
             Defaults to "mgggdev/replicate:v0.2".
         docker_client_args (dict, optional): Additional arguments to pass to the Docker client.
             Used primarily if there are multiple docker contexts on the same machine.
             Defaults to None.
+        backend (str or Backend, optional): Where to run the program: ``"local"``,
+            ``"docker"``, ``"auto"``, or a :class:`Backend`. Defaults to None, which
+            runs the program locally if it's on the ``PATH`` and in the shared pool of
+            Docker containers otherwise (see :func:`get_backend`).
+
+    Returns:
+        Optional[Iterator[bytes]]: If the output is streamed, an iterator over chunks of
+        the program's output, which runs the program as it's consumed. Otherwise, None.
     """
-    if docker_client_args is not None:
-        client = docker.DockerClient(**docker_client_args)
-    else:
-        client = docker.from_env()
-
-    try:
-        print(f"Pulling Docker image {docker_image_name}")
-        client.images.pull(docker_image_name)
-    except Exception as e:
-        print(
-            f"Error comparing docker container {docker_image_name} against web version. "
-            f"Attempting to run using local image"
-        )
-
-    # Set up the input and output paths
-    input_parent_path = Path(input_file_path).parent
-    input_file_name = Path(input_file_path).name
+    source, output, stdin = tool_io(input_file_path, output_file_path)
+    reben_cmd = ["reben", source, "-m", "ben"]
 
-    if output_file_path is not None:
-        output_parent_path = Path(output_file_path).parent
-        output_file_name = Path(output_file_path).name
-    else:
-        output_parent_path = input_parent_path
-        output_file_name = None
-
-    os.makedirs(output_parent_path, exist_ok=True)
-
-    config_args = {
-        "name": "reben_runner",
-        "image": docker_image_name,
-        "detach": True,
-        "auto_remove": True,
-        "tty": True,
-        "stdin_open": True,
-        "network_mode": "none",
-    }
-
-    if input_parent_path == output_parent_path:
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/io",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/io"
-        docker_output_path = "/home/ben/io"
-    else:
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/input",
-                "mode": "rw",
-            },
-            output_parent_path.resolve(): {
-                "bind": "/home/ben/output",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/input"
-        docker_output_path = "/home/ben/output"
-
-    with managed_docker_container(client, config_args) as container:
-        reben_cmd = f"reben {docker_input_path}/{input_file_name} -m ben"
-
-        if verbose:
-            reben_cmd += " -v"
-
-        if output_file_name is not None:
-            reben_cmd += f" -o {docker_output_path}/{output_file_name}"
-
-        cmd = ["sh", "-c", f"{reben_cmd}"]
-
-        logging.debug(f"Running command: {cmd}")
-        exec_id = client.api.exec_create(
-            container.id, cmd=cmd, tty=False, stdout=True, stderr=True, stdin=False
-        )
-
-        output_generator = client.api.exec_start(
-            exec_id=exec_id, stream=True, detach=False
-        )
-
-        for output in output_generator:
-            print(output.decode("utf-8"), end="")
-
-    client.close()
+    # Progress messages mustn't end up in streamed output.
+    if verbose and output != STDOUT:
+        reben_cmd.append("-v")
+
+    if output is not None:
+        reben_cmd += ["-o", output]
+
+    backend = get_backend(
+        backend, [reben_cmd[0]], docker_image_name, docker_client_args
+    )
+
+    logger.debug(f"Running command: {reben_cmd}")
+    if output == STDOUT:
+        return backend.pipe(reben_cmd, stdin)
+
+    backend.run(reben_cmd, stdin=stdin)
 
 
 def relabel_json_file_by_key(
@@ -139,12 +86,13 @@ def relabel_json_file_by_key(
     verbose: bool = True,
     docker_image_name: str = "mgggdev/replicate:v0.2",
     docker_client_args: Optional[dict] = None,
+    backend: Union[str, Backend, None] = None,
 ):
     """
     Runs the REBEN CLI tool from the
     `binary-ensemble <https://crates.io/crates/binary-ensemble>`_
-    crate in a Docker container. This function is specifically designed to run the
-    REBEN tool in its relabeling mode.
+    crate in a Docker container (or locally, if it's installed). This function is
+    specifically designed to run the REBEN tool in its relabeling mode.
 
     This function will relabel the input dual-graph according to the key value
     provided and output a new dual-graph file together with a map file in the event that
@@ -164,108 +112,43 @@ def relabel_json_file_by_key(
         docker_image_name (str, optional): The name of the Docker image to run the program in.
             Defaults to "mgggdev/replicate:v0.2".
         docker_client_args (dict, optional): Additional arguments to pass to the Docker client.
+        backend (str or Backend, optional): Where to run the program: ``"local"``,
+            ``"docker"``, ``"auto"``, or a :class:`Backend`. Defaults to None, which
+            runs the program locally if it's on the ``PATH`` and in the shared pool of
+            Docker containers otherwise (see :func:`get_backend`).
     """
-    if docker_client_args is not None:
-        client = docker.DockerClient(**docker_client_args)
-    else:
-        client = docker.from_env()
-
-    try:
-        print(f"Pulling Docker image {docker_image_name}")
-        client.images.pull(docker_image_name)
-    except Exception as e:
-        print(
-            f"Error comparing docker container {docker_image_name} against web version. "
-            f"Attempting to run using local image"
-        )
-
-    dual_graph_parent_path = Path(dual_graph_path).parent
-    dual_graph_name = Path(dual_graph_path).name
+    reben_cmd = ["reben", Path(dual_graph_path), "-m", "json", "-k", key]
+
+    if verbose:
+        reben_cmd.append("-v")
 
     if output_file_path is not None:
-        output_parent_path = Path(output_file_path).parent
-        output_file_name = Path(output_file_path).name
-    else:
-        output_parent_path = dual_graph_parent_path
-        output_file_name = None
-
-    os.makedirs(output_parent_path, exist_ok=True)
-
-    config_args = {
-        "name": "reben_runner",
-        "image": docker_image_name,
-        "detach": True,
-        "auto_remove": True,
-        "tty": True,
-        "stdin_open": True,
-        "network_mode": "none",
-    }
-
-    if dual_graph_parent_path == output_parent_path:
-        config_args["volumes"] = {
-            dual_graph_parent_path.resolve(): {
-                "bind": "/home/ben/io",
-                "mode": "rw",
-            },
-        }
-        docker_output_path = "/home/ben/io"
-        docker_dual_graph_path = "/home/ben/io"
-
-    else:
-        config_args["volumes"] = {
-            output_parent_path.resolve(): {
-                "bind": "/home/ben/output",
-                "mode": "rw",
-            },
-            dual_graph_parent_path.resolve(): {
-                "bind": "/home/ben/dual_graph",
-                "mode": "rw",
-            },
-        }
-
-        docker_output_path = "/home/ben/output"
-        docker_dual_graph_path = "/home/ben/dual_graph"
-
-    with managed_docker_container(client, config_args) as container:
-        reben_cmd = f"reben {docker_dual_graph_path}/{dual_graph_name} -m json -k {key}"
-
-        if verbose:
-            reben_cmd += " -v"
-
-        if output_file_name is not None:
-            reben_cmd += f" -o {docker_output_path}/{output_file_name}"
-
-        cmd = ["sh", "-c", f"{reben_cmd}"]
-
-        logging.debug(f"Running command: {cmd}")
-        exec_id = client.api.exec_create(
-            container.id, cmd=cmd, tty=False, stdout=True, stderr=True, stdin=False
-        )
-
-        output_generator = client.api.exec_start(
-            exec_id=exec_id, stream=True, detach=False
-        )
-
-        for output in output_generator:
-            print(output.decode("utf-8"), end="")
-
-    client.close()
+        os.makedirs(Path(output_file_path).parent, exist_ok=True)
+        reben_cmd += ["-o", Path(output_file_path)]
+
+    backend = get_backend(
+        backend, [reben_cmd[0]], docker_image_name, docker_client_args
+    )
+
+    logger.debug(f"Running command: {reben_cmd}")
+    backend.run(reben_cmd)
 
 
 def relabel_ben_file_by_key(
     key: str,
     dual_graph_path: str,
-    input_file_path: str,
+    input_file_path: Union[str, os.PathLike, Stream],
     output_file_path: Optional[str] = None,
     verbose: bool = True,
     docker_image_name: str = "mgggdev/replicate:v0.2",
     docker_client_args: Optional[dict] = None,
+    backend: Union[str, Backend, None] = None,
 ):
     """
     Runs the REBEN CLI tool from the
     `binary-ensemble <https://crates.io/crates/binary-ensemble>`_
-    crate in a Docker container. This function is specifically designed to run the
-    REBEN tool in its relabeling mode.
+    crate in a Docker container (or locally, if it's installed). This function is
+    specifically designed to run the REBEN tool in its relabeling mode.
 
     This function expects the input file to be a BEN file will relabel the input dual-graph
     according to the key value provided and output a new dual-graph file together with a map
@@ -279,178 +162,71 @@ def relabel_ben_file_by_key(
         key (str): The key to relabel the dual-graph with. This should appear as an
             attribute of the nodes in the dual-graph file.
         dual_graph_path (str): The path to the dual-graph file to read from.
-        input_file_path (str, optional): The path to the input file to read from. Only
-            required if running in 'ben' mode. Defaults to None.
+        input_file_path (str or Stream): The path to the input file to read from, or the
+            input itself (as bytes, a binary file object, or an iterable of chunks of
+            bytes, like the output of :func:`ben`), which is streamed to the program's
+            stdin.
         output_file_path (str, optional): The path to the output file to write to. If not
-            given, the output will be determined according to a set of heuristics. Defaults
-            to None.
-        verbose (bool, optional): Whether to run the program in verbose mode. Defaults to True.
+            given, the output will be determined according to a set of heuristics, or
+            streamed if the input is. If "-", the output is streamed. Defaults to None.
+        verbose (bool, optional): Whether to run the program in verbose mode. Ignored when
+            the output is streamed. Defaults to True.
         docker_image_name (str, optional): The name of the Docker image to run the program in.
             Defaults to "mgggdev/replicate:v0.2".
         docker_client_args (dict, optional): Additional arguments to pass to the Docker client.
+        backend (str or Backend, optional): Where to run the program: ``"local"``,
+            ``"docker"``, ``"auto"``, or a :class:`Backend`. Defaults to None, which
+            runs the program locally if it's on the ``PATH`` and in the shared pool of
+            Docker containers otherwise (see :func:`get_backend`).
+
+    Returns:
+        Optional[Iterator[bytes]]: If the output is streamed, an iterator over chunks of
+        the program's output, which runs the program as it's consumed. Otherwise, None.
     """
-    if docker_client_args is not None:
-        client = docker.DockerClient(**docker_client_args)
-    else:
-        client = docker.from_env()
-
-    try:
-        print(f"Pulling Docker image {docker_image_name}")
-        client.images.pull(docker_image_name)
-    except Exception as e:
-        print(
-            f"Error comparing docker container {docker_image_name} against web version. "
-            f"Attempting to run using local image"
-        )
-
-    # Set up the input and output paths
-    input_parent_path = Path(input_file_path).parent
-    input_file_name = Path(input_file_path).name
-
-    dual_graph_parent_path = Path(dual_graph_path).parent
-    dual_graph_name = Path(dual_graph_path).name
+    source, output, stdin = tool_io(input_file_path, output_file_path)
+    reben_cmd = [
+        "reben",
+        source,
+        "-m",
+        "ben",
+        "-k",
+        key,
+        "-s",
+        Path(dual_graph_path),
+    ]
 
-    if output_file_path is not None:
-        output_parent_path = Path(output_file_path).parent
-        output_file_name = Path(output_file_path).name
-    else:
-        output_parent_path = input_parent_path
-        output_file_name = None
-
-    os.makedirs(output_parent_path, exist_ok=True)
-
-    config_args = {
-        "name": "reben_runner",
-        "image": docker_image_name,
-        "detach": True,
-        "auto_remove": True,
-        "tty": True,
-        "stdin_open": True,
-        "network_mode": "none",
-    }
-
-    if (
-        input_parent_path == output_parent_path
-        and input_parent_path == dual_graph_parent_path
-    ):
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/io",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/io"
-        docker_output_path = "/home/ben/io"
-        docker_dual_graph_path = "/home/ben/io"
-
-    # Now the dual graph path is different from the input path
-    elif input_parent_path == output_parent_path:
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/io",
-                "mode": "rw",
-            },
-            dual_graph_parent_path.resolve(): {
-                "bind": "/home/ben/dual_graph",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/io"
-        docker_output_path = "/home/ben/io"
-        docker_dual_graph_path = "/home/ben/dual_graph"
-
-    # Now the dual graph path might be the same as one of the paths, but
-    # the input and output paths are different
-    elif dual_graph_parent_path == input_parent_path:
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/input",
-                "mode": "rw",
-            },
-            output_parent_path.resolve(): {
-                "bind": "/home/ben/output",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/input"
-        docker_output_path = "/home/ben/output"
-        docker_dual_graph_path = "/home/ben/input"
-
-    elif dual_graph_parent_path == output_parent_path:
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/input",
-                "mode": "rw",
-            },
-            output_parent_path.resolve(): {
-                "bind": "/home/ben/output",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/input"
-        docker_output_path = "/home/ben/output"
-        docker_dual_graph_path = "/home/ben/output"
-
-    # Now all the paths are different
-    else:
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/input",
-                "mode": "rw",
-            },
-            output_parent_path.resolve(): {
-                "bind": "/home/ben/output",
-                "mode": "rw",
-            },
-            dual_graph_parent_path.resolve(): {
-                "bind": "/home/ben/dual_graph",
-                "mode": "rw",
-            },
-        }
-
-        docker_input_path = "/home/ben/input"
-        docker_output_path = "/home/ben/output"
-        docker_dual_graph_path = "/home/ben/dual_graph"
-
-    with managed_docker_container(client, config_args) as container:
-        reben_cmd = f"reben {docker_input_path}/{input_file_name} -m ben -k {key} -s {docker_dual_graph_path}/{dual_graph_name}"
-
-        if verbose:
-            reben_cmd += " -v"
-
-        if output_file_name is not None:
-            reben_cmd += f" -o {docker_output_path}/{output_file_name}"
-
-        cmd = ["sh", "-c", f"{reben_cmd}"]
-
-        logging.debug(f"Running command: {cmd}")
-        exec_id = client.api.exec_create(
-            container.id, cmd=cmd, tty=False, stdout=True, stderr=True, stdin=False
-        )
-
-        output_generator = client.api.exec_start(
-            exec_id=exec_id, stream=True, detach=False
-        )
-
-        for output in output_generator:
-            print(output.decode("utf-8"), end="")
-
-    client.close()
+    # Progress messages mustn't end up in streamed output.
+    if verbose and output != STDOUT:
+        reben_cmd.append("-v")
+
+    if output is not None:
+        reben_cmd += ["-o", output]
+
+    backend = get_backend(
+        backend, [reben_cmd[0]], docker_image_name, docker_client_args
+    )
+
+    logger.debug(f"Running command: {reben_cmd}")
+    if output == STDOUT:
+        return backend.pipe(reben_cmd, stdin)
+
+    backend.run(reben_cmd, stdin=stdin)
 
 
 def relabel_ben_file_with_map(
     map_file_path: str,
-    input_file_path: str,
+    input_file_path: Union[str, os.PathLike, Stream],
     output_file_path: Optional[str] = None,
     verbose: bool = True,
     docker_image_name: str = "mgggdev/replicate:v0.2",
     docker_client_args: Optional[dict] = None,
+    backend: Union[str, Backend, None] = None,
 ):
     """
     Runs the REBEN CLI tool from the
     `binary-ensemble <https://crates.io/crates/binary-ensemble>`_
-    crate in a Docker container. This function is specifically designed to run the
-    REBEN tool in its map-file mode.
+    crate in a Docker container (or locally, if it's installed). This function is
+    specifically designed to run the REBEN tool in its map-file mode.
 
     This function expects the input file to be a BEN file and will use the map file to
     relabel the assignment vectors in the BEN file according to the new ordering of the
@@ -461,160 +237,43 @@ def relabel_ben_file_with_map(
             appears as the output of running REBEN in the 'json' mode, or as an output
             of the :func:`relabel_json_file_by_key` or :func:`relabel_ben_file_by_key`
             functions.
-        input_file_path (str): The path to the input file to read from. This is expected
-            to be a BEN file.
+        input_file_path (str or Stream): The path to the input file to read from, or the
+            input itself (as bytes, a binary file object, or an iterable of chunks of
+            bytes, like the output of :func:`ben`), which is streamed to the program's
+            stdin. This is expected to be a BEN file.
         output_file_path (str, optional): The path to the output file to write to. If not
-            given, the output will be determined according to a set of heuristics. Defaults
-            to None.
-        verbose (bool, optional): Whether to run the program in verbose mode. Defaults to True.
+            given, the output will be determined according to a set of heuristics, or
+            streamed if the input is. If "-", the output is streamed. Defaults to None.
+        verbose (bool, optional): Whether to run the program in verbose mode. Ignored when
+            the output is streamed. Defaults to True.
         docker_image_name (str, optional): The name of the Docker image to run the program in.
             Defaults to "mgggdev/replicate:v0.2".
         docker_client_args (dict, optional): Additional arguments to pass to the Docker client.
+        backend (str or Backend, optional): Where to run the program: ``"local"``,
+            ``"docker"``, ``"auto"``, or a :class:`Backend`. Defaults to None, which
+            runs the program locally if it's on the ``PATH`` and in the shared pool of
+            Docker containers otherwise (see :func:`get_backend`).
+
+    Returns:
+        Optional[Iterator[bytes]]: If the output is streamed, an iterator over chunks of
+        the program's output, which runs the program as it's consumed. Otherwise, None.
     """
-    if docker_client_args is not None:
-        client = docker.DockerClient(**docker_client_args)
-    else:
-        client = docker.from_env()
-
-    try:
-        print(f"Pulling Docker image {docker_image_name}")
-        client.images.pull(docker_image_name)
-    except Exception as e:
-        print(
-            f"Error comparing docker container {docker_image_name} against web version. "
-            f"Attempting to run using local image"
-        )
-
-    # Set up the input and output paths
-    input_parent_path = Path(input_file_path).parent
-    input_file_name = Path(input_file_path).name
-
-    map_file_parent_path = Path(map_file_path).parent
-    map_file_name = Path(map_file_path).name
+    source, output, stdin = tool_io(input_file_path, output_file_path)
+    reben_cmd = ["reben", source, "-m", "ben", "-p", Path(map_file_path)]
 
-    if output_file_path is not None:
-        output_parent_path = Path(output_file_path).parent
-        output_file_name = Path(output_file_path).name
-    else:
-        output_parent_path = input_parent_path
-        output_file_name = None
-
-    os.makedirs(output_parent_path, exist_ok=True)
-
-    config_args = {
-        "name": "reben_runner",
-        "image": docker_image_name,
-        "detach": True,
-        "auto_remove": True,
-        "tty": True,
-        "stdin_open": True,
-        "network_mode": "none",
-    }
-
-    if (
-        input_parent_path == output_parent_path
-        and input_parent_path == map_file_parent_path
-    ):
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/io",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/io"
-        docker_output_path = "/home/ben/io"
-        docker_map_file_path = "/home/ben/io"
-
-    # Now the map file path is different from the input path
-    elif input_parent_path == output_parent_path:
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/io",
-                "mode": "rw",
-            },
-            map_file_parent_path.resolve(): {
-                "bind": "/home/ben/map_file",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/io"
-        docker_output_path = "/home/ben/io"
-        docker_map_file_path = "/home/ben/map_file"
-
-    # Now the map file path might be the same as one of the paths, but
-    # the input and output paths are different
-    elif map_file_parent_path == input_parent_path:
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/input",
-                "mode": "rw",
-            },
-            output_parent_path.resolve(): {
-                "bind": "/home/ben/output",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/input"
-        docker_output_path = "/home/ben/output"
-        docker_map_file_path = "/home/ben/input"
-
-    elif map_file_parent_path == output_parent_path:
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/input",
-                "mode": "rw",
-            },
-            output_parent_path.resolve(): {
-                "bind": "/home/ben/output",
-                "mode": "rw",
-            },
-        }
-        docker_input_path = "/home/ben/input"
-        docker_output_path = "/home/ben/output"
-        docker_map_file_path = "/home/ben/output"
-
-    # Now all the paths are different
-    else:
-        config_args["volumes"] = {
-            input_parent_path.resolve(): {
-                "bind": "/home/ben/input",
-                "mode": "rw",
-            },
-            output_parent_path.resolve(): {
-                "bind": "/home/ben/output",
-                "mode": "rw",
-            },
-            map_file_parent_path.resolve(): {
-                "bind": "/home/ben/map_file",
-                "mode": "rw",
-            },
-        }
-
-        docker_input_path = "/home/ben/input"
-        docker_output_path = "/home/ben/output"
-        docker_map_file_path = "/home/ben/map_file"
-
-    with managed_docker_container(client, config_args) as container:
-        reben_cmd = f"reben {docker_input_path}/{input_file_name} -m ben -p {docker_map_file_path}/{map_file_name}"
-
-        if verbose:
-            reben_cmd += " -v"
-
-        if output_file_name is not None:
-            reben_cmd += f" -o {docker_output_path}/{output_file_name}"
-
-        cmd = ["sh", "-c", f"{reben_cmd}"]
-
-        logging.debug(f"Running command: {cmd}")
-        exec_id = client.api.exec_create(
-            container.id, cmd=cmd, tty=False, stdout=True, stderr=True, stdin=False
-        )
-
-        output_generator = client.api.exec_start(
-            exec_id=exec_id, stream=True, detach=False
-        )
-
-        for output in output_generator:
-            print(output.decode("utf-8"), end="")
-
-    client.close()
+    # Progress messages mustn't end up in streamed output.
+    if verbose and output != STDOUT:
+        reben_cmd.append("-v")
+
+    if output is not None:
+        reben_cmd += ["-o", output]
+
+    backend = get_backend(
+        backend, [reben_cmd[0]], docker_image_name, docker_client_args
+    )
+
+    logger.debug(f"Running command: {reben_cmd}")
+    if output == STDOUT:
+        return backend.pipe(reben_cmd, stdin)
+
+    backend.run(reben_cmd, stdin=stdin)
@@ -0,0 +1,135 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .codec import XZ_MAGIC, BenIndex, _ben_frames, _read_header
+
+
+def ben_shards(index: BenIndex, shards: int) -> List[Tuple[int, int]]:
+    """
+    Splits an indexed BEN file into contiguous ranges of samples, each starting
+    and ending on a frame boundary, with about the same number of frames in each.
+
+    Args:
+        index (BenIndex): The file's index.
+        shards (int): The number of ranges. Files with fewer frames are split into
+            fewer ranges.
+
+    Returns:
+        List[Tuple[int, int]]: ``(start, stop)`` sample ranges, in order; each
+        range includes ``start`` but not ``stop``.
+    """
+    frames = len(index.offsets)
+    bounds = np.unique(np.linspace(0, frames, min(shards, frames) + 1).astype(int))
+    starts = index.starts[bounds].tolist()
+
+    return list(zip(starts[:-1], starts[1:]))
+
+
+def _scoreshard(
+    path: str, offset: int, frames: int, score: Callable, dtype
+) -> List[Tuple[Any, int]]:
+    """
+    Decodes ``frames`` consecutive frames of a BEN file, starting at the byte
+    offset ``offset``, and scores each of them once.
+
+    Returns:
+        A list of ``(score, count)`` pairs, one per frame.
+    """
+    results = []
+
+    with open(path, "rb") as stream:
+        mkv = _read_header(stream)
+        stream.seek(offset)
+
+        for assignment, count in _ben_frames(stream, mkv, dtype):
+            results.append((score(assignment), count))
+            if len(results) == frames:
+                break
+
+    return results
+
+
+def ben_score(
+    input_file_path: Union[str, Path],
+    score: Callable[[np.ndarray], Any],
+    processes: Optional[int] = None,
+    shards: Optional[int] = None,
+    dtype=np.int32,
+) -> Iterator[Any]:
+    """
+    Replays a BEN file in parallel, scoring every sample. The file is split into
+    ranges of samples (using its :class:`BenIndex`, which is built if it doesn't
+    exist), and each range is decoded and scored by a worker process. Scores are
+    yielded in sample order, so the results line up with :func:`ben_replay`.
+
+    In Markov chain files, repeated samples are stored once, so each is scored
+    once and its score is yielded once for every repetition.
+
+    Example:
+        .. code-block:: python
+
+            index = PerimeterIndex.from_graph(graph)
+            scores = list(ben_score("ensemble.jsonl.ben", index.polsby_popper))
+
+    Args:
+        input_file_path (str or Path): The path of the BEN file to score. XBEN
+            files have to be decompressed first, since they can't be split.
+        score (Callable): A function taking a sample's assignment vector (as a
+            NumPy array) and returning its score. The function and its scores
+            are sent between processes, so they have to be picklable: module-level
+            functions, ``functools.partial`` objects, and methods of picklable
+            objects all work, but lambdas don't.
+        processes (int, optional): The number of worker processes. Defaults to
+            None, which uses every core. If ``1``, the file is scored in this
+            process.
+        shards (int, optional): The number of ranges to split the file into.
+            Defaults to four per process, to keep workers busy when some ranges
+            take longer than others.
+        dtype (optional): The dtype of the decoded assignment vectors. Defaults
+            to ``np.int32``.
+
+    Yields:
+        The score of each sample, in order.
+    """
+    path = str(input_file_path)
+    with open(path, "rb") as stream:
+        if stream.read(len(XZ_MAGIC)) == XZ_MAGIC:
+            raise ValueError(
+                "XBEN files can't be split for parallel scoring; decompress them to "
+                "BEN files first."
+            )
+
+    index = BenIndex.for_file(path)
+    processes = processes or os.cpu_count() or 1
+    shards = shards or 4 * processes
+
+    # Describe each range by the offset of its first frame and its frame count.
+    ranges = ben_shards(index, shards)
+    firsts = [index.frame(start) for start, _ in ranges]
+    lasts = [index.frame(stop - 1) for _, stop in ranges]
+    tasks = [
+        (path, int(index.offsets[first]), last - first + 1, score, dtype)
+        for first, last in zip(firsts, lasts)
+    ]
+
+    if processes <= 1 or len(tasks) <= 1:
+        yield from _expand(_scoreshard(*task) for task in tasks)
+        return
+
+    # pool.map() yields shards in the order they were submitted.
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        yield from _expand(pool.map(_scoreshard, *zip(*tasks)))
+
+
+def _expand(shards: Iterator[List[Tuple[Any, int]]]) -> Iterator[Any]:
+    """
+    Repeats each frame's score once for every sample the frame holds.
+    """
+    for shard in shards:
+        for value, count in shard:
+            for _ in range(count):
+                yield value
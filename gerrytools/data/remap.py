@@ -1,6 +1,8 @@
 import ast
 from typing import Callable
 
+from ..geometry import UnitMap
+
 
 def remap(plans, unitmaps, popmap=None) -> Callable:
     """
@@ -13,7 +15,8 @@ def remap(plans, unitmaps, popmap=None) -> Callable:
             mapping unique identifiers of one set of geometries to unique
             identifiers (or lists of unique identifiers) of another set of
             geometries; these correspond to mappings generated by `unitmap()`
-            and the inverse mapping generated by `invert()`.
+            and the inverse mapping generated by `invert()`. `UnitMap` objects
+            are converted to dictionaries.
         popmap (dict, optional): A mapping from unit unique identifiers to
             population values. Only applies when we are mapping from smaller
             units to larger ones.
@@ -21,6 +24,12 @@ def remap(plans, unitmaps, popmap=None) -> Callable:
     Returns:
         A function
     """
+    # Convert any array-backed unit maps to dictionaries once, rather than
+    # once per row.
+    unitmaps = {
+        unitsType: (mapping.to_dict() if isinstance(mapping, UnitMap) else mapping)
+        for unitsType, mapping in unitmaps.items()
+    }
 
     def _(row):
         # Get the assignment for the row.
@@ -2,33 +2,61 @@
 Provides ease-of-use functionality for geographic and geometric operations.
 """
 
-from .dataframe import dataframe
+from .binarygraph import GraphArrays, loadarrays, loadgraph, savegraph
+from .dataframe import dataframe, nodeframe
 from .dissolve import dissolve
-from .dualgraph import dualgraph
+from .dualgraph import adjacencymatrix, dualgraph
 from .optimize import (
     arealoverlap,
     calculate_dispersion,
+    calculate_dispersion_per_district,
+    calculate_dispersion_per_district_many,
     minimize_dispersion,
     minimize_dispersion_with_parity,
     minimize_parity,
     optimalrelabeling,
     populationoverlap,
+    relabelensemble,
 )
-from .unitmap import invert, unitmap
-from .updater import dispersion_updater_closure
+from .perimeter import AssignmentArray, PerimeterIndex, compactness_updaters
+from .pointindex import PointIndex
+from .simplify import levelsofdetail, simplify
+from .spatialindex import SpatialIndexRegistry, spatialindexes
+from .unitmap import UnitMap, invert, unitmap
+from .updater import DispersionOverlap, dispersion_updater_closure, dispersion_updaters
 
 __all__ = [
     "minimize_dispersion",
     "minimize_dispersion_with_parity",
     "minimize_parity",
     "calculate_dispersion",
+    "calculate_dispersion_per_district",
+    "calculate_dispersion_per_district_many",
     "dispersion_updater_closure",
+    "dispersion_updaters",
+    "DispersionOverlap",
     "dissolve",
     "dualgraph",
+    "adjacencymatrix",
+    "savegraph",
+    "loadgraph",
+    "loadarrays",
+    "GraphArrays",
     "unitmap",
+    "UnitMap",
     "invert",
     "dataframe",
+    "nodeframe",
     "populationoverlap",
     "optimalrelabeling",
+    "relabelensemble",
     "arealoverlap",
+    "SpatialIndexRegistry",
+    "spatialindexes",
+    "simplify",
+    "levelsofdetail",
+    "PerimeterIndex",
+    "AssignmentArray",
+    "compactness_updaters",
+    "PointIndex",
 ]
@@ -0,0 +1,499 @@
+import json
+import os
+import pickle
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import Any, Dict, Union
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from gerrychain import Graph
+from scipy.sparse import csr_matrix
+
+FORMAT = "gerrytools-graph"
+VERSION = 1
+
+# Marks attributes which a node or edge doesn't have, as opposed to attributes
+# whose value is None.
+_ABSENT = object()
+
+
+def _encode(values: list):
+    """
+    Encodes a list of attribute values as a NumPy array.
+
+    Args:
+        values (list): Attribute values, one per node (or edge).
+
+    Returns:
+        A triple `(array, kind, mask)`. `kind` records how the values were
+        encoded: `"native"` arrays hold the values as-is, with placeholders
+        (`False`, `0`, `NaN`, or `""`) for missing values; `"json"` arrays
+        hold JSON-encoded values; and `"pickle"` arrays hold pickled values.
+        Only columns whose values all have the same boolean, integer, float,
+        or string type are stored natively, and only columns which survive a
+        JSON round trip unchanged are stored as JSON, so mixed columns are
+        never coerced to a common type. `mask` is `None` if no values are
+        missing; otherwise, it's `1` where values are `None`, `2` where
+        values are absent, and `0` elsewhere.
+    """
+    mask = np.array(
+        [1 if v is None else 2 if v is _ABSENT else 0 for v in values], dtype=np.uint8
+    )
+    missing = mask.astype(bool).tolist()
+    present = [v for v, m in zip(values, missing) if not m]
+    mask = mask if any(missing) else None
+
+    if not present:
+        return np.full(len(values), "", dtype=str), "native", mask
+
+    dtype = _native(present)
+    if dtype is not None:
+        placeholder = _PLACEHOLDERS[dtype.kind]
+        array = np.asarray([placeholder if m else v for v, m in zip(values, missing)])
+        return array.astype(dtype, copy=False), "native", mask
+
+    values = [None if m else v for v, m in zip(values, missing)]
+
+    try:
+        encoded = [json.dumps(v) for v in values]
+        if _unchanged(values, [json.loads(v) for v in encoded]):
+            return np.asarray(encoded, dtype=str), "json", mask
+    except (TypeError, ValueError):
+        pass
+
+    # Pickles end with a STOP opcode, so NumPy doesn't strip any trailing null
+    # bytes from them.
+    return np.asarray([pickle.dumps(v) for v in values], dtype=bytes), "pickle", mask
+
+
+# The Python types of the values each kind of NumPy array can hold natively,
+# and the placeholders written in place of missing values.
+_TYPES = {
+    "b": (bool, np.bool_),
+    "i": (int, np.integer),
+    "u": (int, np.integer),
+    "f": (float, np.floating),
+    "U": (str, np.str_),
+}
+_PLACEHOLDERS = {"b": False, "i": 0, "u": 0, "f": np.nan, "U": ""}
+
+
+def _native(values: list):
+    """
+    Finds the NumPy dtype which holds `values` without changing their type, if
+    they all have the same boolean, integer, float, or string type.
+    """
+    try:
+        dtype = np.asarray(values).dtype
+    except ValueError:
+        return None
+
+    types = _TYPES.get(dtype.kind)
+    if types is None:
+        return None
+
+    booleans = dtype.kind == "b"
+    for v in values:
+        if not isinstance(v, types) or (
+            not booleans and isinstance(v, (bool, np.bool_))
+        ):
+            return None
+
+    return dtype
+
+
+def _unchanged(values: list, decoded: list) -> bool:
+    """
+    Checks whether decoded values are equal to, and have the same types as, the
+    original values.
+    """
+    if len(values) != len(decoded):
+        return False
+
+    for v, d in zip(values, decoded):
+        if type(v) is not type(d):
+            return False
+        if isinstance(v, dict):
+            if list(v) != list(d) or not _unchanged(list(v.values()), list(d.values())):
+                return False
+        elif isinstance(v, list):
+            if not _unchanged(v, d):
+                return False
+        elif v != d and not (v != v and d != d):
+            return False
+
+    return True
+
+
+def _decode(array: np.ndarray, kind: str, mask: np.ndarray = None) -> list:
+    """
+    Decodes an array written by `_encode()` back into a list of Python values.
+    """
+    if kind == "json":
+        values = [json.loads(v) for v in array.tolist()]
+    elif kind == "pickle":
+        values = [pickle.loads(v) for v in array.tolist()]
+    else:
+        values = array.tolist()
+
+    if mask is not None:
+        restore = {1: None, 2: _ABSENT}
+        values = [restore.get(m, v) for v, m in zip(values, mask.tolist())]
+
+    return values
+
+
+def _labels(nodes: list) -> np.ndarray:
+    """
+    Creates an array of node labels. Labels which don't all have the same
+    boolean, integer, float, or string type are kept in an object array, rather
+    than being converted to a common type.
+    """
+    dtype = _native(nodes) if nodes else None
+    if dtype is not None:
+        return np.asarray(nodes, dtype=dtype)
+
+    # Labels are assigned one at a time, so tuples aren't unpacked.
+    labels = np.empty(len(nodes), dtype=object)
+    for i, node in enumerate(nodes):
+        labels[i] = node
+
+    return labels
+
+
+def _records(names: list, columns: list):
+    """
+    Zips attribute columns into one dictionary per row, skipping absent
+    attributes.
+    """
+    if not names:
+        return repeat({})
+
+    return (
+        {name: v for name, v in zip(names, row) if v is not _ABSENT}
+        for row in zip(*columns)
+    )
+
+
+@dataclass
+class GraphArrays:
+    """
+    Columnar representation of a dual graph: the adjacency structure in
+    compressed sparse row (CSR) form, edge attributes aligned with the CSR
+    column indices, and node attributes as one array per column. This is the
+    in-memory form of the binary graph format written by `savegraph()`; when
+    loaded with `mmap=True`, arrays are memory-mapped rather than read.
+    """
+
+    nodes: np.ndarray
+    """Node labels, in the order of the adjacency matrix's rows."""
+    indptr: np.ndarray
+    """CSR row pointers."""
+    indices: np.ndarray
+    """CSR column indices; the neighbors of node `i` are `indices[indptr[i]:indptr[i+1]]`."""
+    edges: Dict[str, np.ndarray] = field(default_factory=dict)
+    """Edge attributes (e.g. `shared_perim`), aligned with `indices`."""
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+    """Node attributes, aligned with `nodes`."""
+    masks: Dict[str, np.ndarray] = field(default_factory=dict)
+    """Masks for attributes with missing values: `1` marks `None`, `2` absent."""
+    kinds: Dict[str, str] = field(default_factory=dict)
+    """How each node and edge attribute was encoded."""
+    graph: Dict[str, Any] = field(default_factory=dict)
+    """Graph-level attributes, like the CRS."""
+
+    @classmethod
+    def from_graph(cls, graph: nx.Graph) -> "GraphArrays":
+        """
+        Creates a columnar representation of a graph. Attributes which can't be
+        stored as arrays or JSON (e.g. geometries) are pickled; see `_encode()`.
+
+        Args:
+            graph (Graph): Graph to convert.
+
+        Returns:
+            `GraphArrays` equivalent to `graph`.
+        """
+        nodes = list(graph.nodes)
+        position = {node: i for i, node in enumerate(nodes)}
+
+        # Walk each node's neighbors in index order, collecting the CSR structure
+        # and the edge data as we go.
+        indptr, indices, edgedata = [0], [], []
+        for node in nodes:
+            neighbors = sorted(
+                (position[neighbor], data) for neighbor, data in graph.adj[node].items()
+            )
+            indices.extend(i for i, _ in neighbors)
+            edgedata.extend(data for _, data in neighbors)
+            indptr.append(len(indices))
+
+        names = sorted({k for data in edgedata for k in data})
+        edges = {name: [data.get(name, _ABSENT) for data in edgedata] for name in names}
+
+        # Node attributes.
+        names = sorted({k for _, data in graph.nodes(data=True) for k in data})
+        columns = {
+            name: [data.get(name, _ABSENT) for _, data in graph.nodes(data=True)]
+            for name in names
+        }
+
+        arrays = cls(
+            nodes=_labels(nodes),
+            indptr=np.asarray(indptr, dtype=np.int64),
+            indices=np.asarray(indices, dtype=np.int64),
+            graph={k: v for k, v in graph.graph.items() if isinstance(v, str)},
+        )
+        arrays._add(columns, arrays.columns)
+        arrays._add(edges, arrays.edges)
+
+        return arrays
+
+    @classmethod
+    def from_adjacency(cls, adjacency, frame: pd.DataFrame) -> "GraphArrays":
+        """
+        Creates a columnar graph directly from an adjacency matrix (e.g. one
+        produced by `gerrytools.geometry.adjacencymatrix()`) and the data for
+        each node, without building a `networkx` graph.
+
+        Args:
+            adjacency (scipy.sparse matrix): Symmetric adjacency matrix whose
+                entries are shared perimeters.
+            frame (DataFrame): Node data, one row per row of `adjacency`. The
+                index provides node labels; geometry columns are dropped.
+
+        Returns:
+            `GraphArrays` with the `shared_perim` edge attribute and `frame`'s
+            columns as node attributes.
+        """
+        adjacency = csr_matrix(adjacency)
+        adjacency.sort_indices()
+
+        arrays = cls(
+            nodes=frame.index.to_numpy(),
+            indptr=adjacency.indptr.astype(np.int64),
+            indices=adjacency.indices.astype(np.int64),
+        )
+
+        crs = getattr(frame, "crs", None)
+        if crs is not None:
+            arrays.graph["crs"] = crs.to_json()
+
+        columns = {
+            name: frame[name].tolist()
+            for name in frame.columns
+            if str(frame[name].dtype) != "geometry"
+        }
+        arrays._add(columns, arrays.columns)
+        arrays._add({"shared_perim": adjacency.data.tolist()}, arrays.edges)
+
+        return arrays
+
+    def _add(self, attributes: Dict[str, list], into: Dict[str, np.ndarray]):
+        """
+        Encodes attribute lists and adds them to `into`, recording how each was
+        encoded.
+        """
+        for name, values in attributes.items():
+            array, kind, mask = _encode(values)
+            into[name] = array
+            self.kinds[name] = kind
+            if mask is not None:
+                self.masks[name] = mask
+
+    @property
+    def adjacency(self) -> csr_matrix:
+        """
+        The adjacency matrix, weighted by shared perimeter if available.
+        """
+        N = len(self.nodes)
+        weights = self.edges.get("shared_perim", np.ones(len(self.indices)))
+
+        return csr_matrix((weights, self.indices, self.indptr), shape=(N, N))
+
+    def to_graph(self) -> Graph:
+        """
+        Creates a gerrychain `Graph` from the columnar representation.
+
+        Returns:
+            A gerrychain `Graph` with node and edge attributes attached.
+        """
+        nodes = self.nodes.tolist()
+        names = list(self.columns)
+        columns = [
+            _decode(self.columns[n], self.kinds[n], self.masks.get(n)) for n in names
+        ]
+
+        graph = Graph()
+        graph.add_nodes_from(zip(nodes, _records(names, columns)))
+
+        # Add each edge once.
+        rows = np.repeat(np.arange(len(nodes)), np.diff(self.indptr))
+        upper = rows <= self.indices
+        names = list(self.edges)
+        columns = [
+            _decode(self.edges[n][upper], self.kinds[n], self._mask(n, upper))
+            for n in names
+        ]
+        graph.add_edges_from(
+            zip(
+                self.nodes[rows[upper]].tolist(),
+                self.nodes[self.indices[upper]].tolist(),
+                _records(names, columns),
+            )
+        )
+        graph.graph.update(self.graph)
+
+        return graph
+
+    def _mask(self, name: str, selection: np.ndarray) -> Union[np.ndarray, None]:
+        mask = self.masks.get(name)
+        return None if mask is None else mask[selection]
+
+    def save(self, path: str):
+        """
+        Writes the graph to the directory `path` as a set of `.npy` files and a
+        `meta.json` file describing them.
+
+        Args:
+            path (str): Directory to write to; created if it doesn't exist.
+        """
+        os.makedirs(os.path.join(path, "columns"), exist_ok=True)
+        os.makedirs(os.path.join(path, "edges"), exist_ok=True)
+
+        # Node labels are encoded like attributes, so labels of different types
+        # (e.g. `1` and `"1"`) stay distinct.
+        if self.nodes.dtype == object:
+            nodes, nodekind, _ = _encode(self.nodes.tolist())
+        else:
+            nodes, nodekind = self.nodes, "native"
+        np.save(os.path.join(path, "nodes.npy"), nodes)
+        np.save(os.path.join(path, "indptr.npy"), self.indptr)
+        np.save(os.path.join(path, "indices.npy"), self.indices)
+
+        for directory, arrays in (("columns", self.columns), ("edges", self.edges)):
+            for i, (name, array) in enumerate(arrays.items()):
+                np.save(os.path.join(path, directory, f"{i}.npy"), array)
+                if name in self.masks:
+                    mask = os.path.join(path, directory, f"{i}.mask.npy")
+                    np.save(mask, self.masks[name])
+
+        meta = {
+            "format": FORMAT,
+            "version": VERSION,
+            "nodes": len(self.nodes),
+            "nodekind": nodekind,
+            "columns": list(self.columns),
+            "edges": list(self.edges),
+            "kinds": self.kinds,
+            "masks": list(self.masks),
+            "graph": self.graph,
+        }
+
+        with open(os.path.join(path, "meta.json"), "w") as w:
+            json.dump(meta, w)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "GraphArrays":
+        """
+        Reads a graph written by `GraphArrays.save()` or `savegraph()`.
+
+        Args:
+            path (str): Directory to read from.
+            mmap (bool, optional): Whether to memory-map the arrays rather than
+                reading them into memory. Defaults to `True`.
+
+        Returns:
+            The stored `GraphArrays`.
+        """
+        with open(os.path.join(path, "meta.json")) as r:
+            meta = json.load(r)
+
+        if meta.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a binary graph directory.")
+
+        if meta["version"] > VERSION:
+            raise ValueError(
+                f"Binary graph version {meta['version']} is newer than the "
+                f"supported version, {VERSION}."
+            )
+
+        mode = "r" if mmap else None
+
+        def read(*parts):
+            return np.load(os.path.join(path, *parts), mmap_mode=mode)
+
+        nodes = read("nodes.npy")
+        if meta.get("nodekind", "native") != "native":
+            nodes = _labels(_decode(nodes, meta["nodekind"]))
+
+        arrays = cls(
+            nodes=nodes,
+            indptr=read("indptr.npy"),
+            indices=read("indices.npy"),
+            kinds=meta["kinds"],
+            graph=meta["graph"],
+        )
+
+        for directory, into in (("columns", arrays.columns), ("edges", arrays.edges)):
+            for i, name in enumerate(meta[directory]):
+                into[name] = read(directory, f"{i}.npy")
+                if name in meta["masks"]:
+                    arrays.masks[name] = read(directory, f"{i}.mask.npy")
+
+        return arrays
+
+
+def savegraph(graph: Union[nx.Graph, GraphArrays], path: str):
+    """
+    Writes a dual graph to disk in a compact binary format: a directory of
+    `.npy` files holding the adjacency structure in CSR form, edge attributes,
+    and one array per node attribute. Unlike `networkx` JSON, the format can be
+    read (or memory-mapped) without parsing.
+
+    Args:
+        graph (Graph): The graph to write, e.g. the output of
+            `gerrytools.geometry.dualgraph()`. May also be `GraphArrays`, e.g.
+            built with `GraphArrays.from_adjacency()`.
+        path (str): Directory to write to.
+    """
+    if not isinstance(graph, GraphArrays):
+        graph = GraphArrays.from_graph(graph)
+
+    graph.save(path)
+
+
+def loadgraph(path: str) -> Graph:
+    """
+    Reads a dual graph written by `savegraph()`. If `path` is a JSON file
+    instead, it's read with `Graph.from_json()`. Attributes which can't be
+    stored as arrays or JSON are pickled, so only read graphs you trust.
+
+    Args:
+        path (str): Path to the binary graph directory or JSON file.
+
+    Returns:
+        A gerrychain `Graph`.
+    """
+    if not os.path.isdir(path):
+        return Graph.from_json(path)
+
+    return GraphArrays.load(path).to_graph()
+
+
+def loadarrays(path: str, mmap: bool = True) -> GraphArrays:
+    """
+    Reads a dual graph written by `savegraph()` as arrays, without building a
+    `networkx` graph.
+
+    Args:
+        path (str): Path to the binary graph directory.
+        mmap (bool, optional): Whether to memory-map the arrays. Defaults to
+            `True`.
+
+    Returns:
+        The stored `GraphArrays`.
+    """
+    return GraphArrays.load(path, mmap=mmap)
@@ -2,19 +2,16 @@ from math import pi, sqrt
 
 import geopandas as gpd
 import numpy as np
+import shapely
 from cv2 import minEnclosingCircle
 from geopandas import GeoDataFrame
 from gerrychain import Graph, Partition
-from gerrychain.updaters import (
-    Tally,
-    boundary_nodes,
-    cut_edges_by_part,
-    exterior_boundaries,
-    interior_boundaries,
-    perimeter,
-)
+from gerrychain.updaters import Tally
 from shapely.ops import unary_union
 
+from .perimeter import PerimeterIndex
+from .spatialindex import spatialindexes
+
 
 def _reock(dissolved_gdf: GeoDataFrame):
     """
@@ -26,27 +23,19 @@ def _reock(dissolved_gdf: GeoDataFrame):
         Dictionary of reock scores by district.
     """
     gdf_graph = Graph.from_geodataframe(dissolved_gdf, ignore_errors=True)
-    geo_partition = Partition(
-        graph=gdf_graph,
-        assignment={n: n for n in gdf_graph.nodes},
-        updaters={
-            "boundary_nodes": boundary_nodes,
-            "area": Tally("area", alias="area"),
-        },
-    )
+    index = PerimeterIndex.from_graph(gdf_graph)
+    areas = index.areas(index.nodes)
     geometries = dict(dissolved_gdf.geometry.apply(lambda p: p.convex_hull))
 
-    boundary = set.union(*(set(e) for e in geo_partition["cut_edges"])).union(
-        geo_partition["boundary_nodes"]
-    )
+    # Each district is its own part, so only districts on the boundary of the
+    # map or of another district contribute to their hulls.
+    boundary = set(index.nodes[index.boundarynodes(index.nodes)].tolist())
     part_scores = {}
-    for part, nodes in geo_partition.parts.items():
-        geom = unary_union(
-            [geometries[node] for node in nodes if node in boundary]
-        ).convex_hull
+    for part in index.nodes.tolist():
+        geom = unary_union([geometries[part]] if part in boundary else []).convex_hull
         coords = np.array(geom.exterior.coords.xy).T.astype(np.float32)
         _, radius = minEnclosingCircle(coords)
-        score = float(geo_partition["area"][part] / (pi * radius**2))
+        score = float(areas[part] / (pi * radius**2))
         assert 0 < score < 1
         part_scores[part] = score
     return part_scores
@@ -62,24 +51,8 @@ def _polsby_popper(dissolved_gdf: GeoDataFrame):
         Dictionary of polsby popper scores by district.
     """
     gdf_graph = Graph.from_geodataframe(dissolved_gdf, ignore_errors=True)
-    geo_partition = Partition(
-        graph=gdf_graph,
-        assignment={n: n for n in gdf_graph.nodes},
-        updaters={
-            "area": Tally("area", alias="area"),
-            "perimeter": perimeter,
-            "exterior_boundaries": exterior_boundaries,
-            "interior_boundaries": interior_boundaries,
-            "boundary_nodes": boundary_nodes,
-            "cut_edges_by_part": cut_edges_by_part,
-        },
-    )
-    part_scores = {}
-    for part, _ in geo_partition.parts.items():
-        part_scores[part] = (4 * pi * geo_partition["area"][part]) / (
-            geo_partition["perimeter"][part] ** 2
-        )
-    return part_scores
+    index = PerimeterIndex.from_graph(gdf_graph)
+    return index.polsby_popper(index.nodes)
 
 
 def _schwartzberg(dissolved_gdf: GeoDataFrame):
@@ -87,6 +60,7 @@ def _schwartzberg(dissolved_gdf: GeoDataFrame):
     Arguments:
         dissolved_gdf (GeoDataFrame): GeoDataFrame corresponding to
             the plan's districts.
+
     Returns:
         Dictionary of schwartzberg scores by district.
     """
@@ -100,6 +74,7 @@ def _convex_hull(dissolved_gdf: GeoDataFrame):
     Arguments:
         dissolved_gdf (GeoDataFrame): GeoDataFrame corresponding to
             the plan's districts.
+
     Returns:
         Dictionary of convex hull scores by district.
     """
@@ -141,13 +116,18 @@ def _pop_polygon(dissolved_gdf: GeoDataFrame, block_gdf: GeoDataFrame, pop_col:
         updaters={"population": Tally(pop_col, alias="population")},
     )
 
-    district_hulls = dict(dissolved_gdf.geometry.apply(lambda p: p.convex_hull))
+    # Find the population of the blocks intersecting each district's convex
+    # hull, using a cached spatial index over the blocks.
+    hulls = shapely.convex_hull(np.asarray(dissolved_gdf.geometry.values, dtype=object))
+    tree = spatialindexes.tree(block_gdf)
+    districts, blocks = tree.query(hulls, predicate="intersects")
+    hull_pops = np.bincount(
+        districts, weights=block_gdf[pop_col].to_numpy()[blocks], minlength=len(hulls)
+    )
+    hull_pops = dict(zip(dissolved_gdf.index, hull_pops.tolist()))
 
     pop_polygon_scores = {}
     for part in geo_partition.parts:
-        hull_gdf = gpd.clip(block_gdf, district_hulls[part - 1])
-        pop_polygon_scores[part] = geo_partition["population"][part] / sum(
-            hull_gdf[pop_col]
-        )
+        pop_polygon_scores[part] = geo_partition["population"][part] / hull_pops[part]
 
     return pop_polygon_scores
@@ -1,9 +1,83 @@
+import weakref
+
+import numpy as np
 import pandas as pd
 from gerrychain import Partition
+from gerrychain.graph import FrozenGraph
+
+# Node-attribute frames, keyed by graph and then by index column name. Graphs
+# are held weakly, so frames are discarded along with their graphs.
+_NODEFRAMES = weakref.WeakKeyDictionary()
+
+# Positions of node labels in their graph's node order, keyed by graph.
+_NODEINDEXES = weakref.WeakKeyDictionary()
+
+
+def nodeframe(graph, index: str = "id", cache: bool = True) -> pd.DataFrame:
+    """
+    Creates a column-oriented view of a graph's node attributes. The view is
+    built once per graph and cached, so repeated calls (e.g. once for every
+    plan in an ensemble) don't re-read the node data. Because the cache is
+    keyed on the graph itself, the graph's node data shouldn't be modified
+    after the first call; pass `cache=False` if it may have been.
+
+    Args:
+        graph (Graph): The graph whose node data is framed. May also be the
+            `FrozenGraph` attached to a `Partition`.
+        index (str, optional): Column name for node labels. The `networkx`
+            default name is `"id"`.
+        cache (bool, optional): Whether to use (and populate) the cache.
+            Defaults to `True`.
+
+    Returns:
+        `DataFrame` with one row per node, in the graph's node order. This is the
+        cached frame itself, so it shouldn't be modified.
+    """
+    # Partitions wrap their graphs; the underlying graph is shared by every
+    # partition created from it.
+    if isinstance(graph, FrozenGraph):
+        graph = graph.graph
+
+    frames = _NODEFRAMES.get(graph, {}) if cache else {}
+    frame = frames.get(index)
+
+    if frame is None or len(frame) != graph.number_of_nodes():
+        frame = pd.DataFrame.from_records(
+            {index: v, **d} for v, d in graph.nodes(data=True)
+        )
+
+        if cache:
+            frames[index] = frame
+            _NODEFRAMES[graph] = frames
+
+    return frame
+
+
+def _nodeindex(graph, cache: bool = True) -> pd.Index:
+    """
+    Creates an index of a graph's node labels, in the graph's node order (the
+    order of the rows of `nodeframe()`), so labels can be located in bulk.
+    """
+    if isinstance(graph, FrozenGraph):
+        graph = graph.graph
+
+    nodes = _NODEINDEXES.get(graph) if cache else None
+
+    if nodes is None or len(nodes) != graph.number_of_nodes():
+        nodes = pd.Index(list(graph.nodes))
+
+        if cache:
+            _NODEINDEXES[graph] = nodes
+
+    return nodes
 
 
 def dataframe(
-    P: Partition, index: str = "id", assignment: str = "DISTRICT", columns: list = None
+    P: Partition,
+    index: str = "id",
+    assignment: str = "DISTRICT",
+    columns: list = None,
+    cache: bool = True,
 ) -> pd.DataFrame:
     """
     Converts a `Partition` into a `DataFrame`.
@@ -16,20 +90,26 @@ def dataframe(
         columns (list, optional): List of columns to add to the dataframe, not
             including the index. If `None` (or another falsy value), gets all
             columns.
+        cache (bool, optional): Whether to reuse the graph's cached node data;
+            see `nodeframe()`. Defaults to `True`.
 
     Returns:
         `DataFrame` with attached graph data.
     """
-    # Create dataframe.
-    gdf = pd.DataFrame.from_records(
-        {index: v, **d} for v, d in P.graph.nodes(data=True)
-    )
+    # Get the graph's node data, copying only the columns we need.
+    nodes = nodeframe(P.graph, index=index, cache=cache)
+    gdf = nodes[[index] + columns].copy() if columns else nodes.copy()
 
-    # Assign vertices.
-    assignedvertices = P.assignment.to_dict()
-    gdf[assignment] = gdf[index].map(assignedvertices)
+    # Assign vertices by locating each part's nodes in the node order, rather
+    # than building a node-to-part dictionary for every plan.
+    nodes = _nodeindex(P.graph, cache=cache)
+    parts = P.assignment.parts
+    codes = np.empty(len(nodes), dtype=np.intp)
+    for code, part in enumerate(parts.values()):
+        codes[nodes.get_indexer(list(part))] = code
+    gdf[assignment] = pd.Index(list(parts)).take(codes)
 
-    # Drop columns if necessary.
+    # Reorder columns if necessary.
     if columns:
         gdf = gdf[[assignment, index] + columns]
 
@@ -1,4 +1,178 @@
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapely
 from gerrychain.graph import Graph
+from gerrychain.graph.geo import GeometryError
+from scipy.sparse import csr_matrix, issparse
+from shapely.strtree import STRtree
+
+
+def _tileadjacency(owned, candidates, ownedgeometries, candidategeometries):
+    """
+    Finds the pairs of intersecting geometries within a single spatial tile, and
+    the lengths of their intersections. Pairs are reported once, with the lower
+    index first.
+
+    Args:
+        owned (np.ndarray): Indices of the geometries belonging to this tile.
+        candidates (np.ndarray): Indices of the geometries which could intersect
+            geometries in this tile.
+        ownedgeometries (np.ndarray): Geometries belonging to this tile.
+        candidategeometries (np.ndarray): Geometries which could intersect
+            geometries in this tile.
+
+    Returns:
+        A tuple of arrays `(i, j, length, overlapping)`, where `i` and `j` are
+        the indices of intersecting geometries, `length` the length of their
+        intersections, and `overlapping` whether the intersection has positive
+        area.
+    """
+    tree = STRtree(candidategeometries)
+    left, right = tree.query(ownedgeometries, predicate="intersects")
+
+    # Only report each pair once.
+    i, j = owned[left], candidates[right]
+    keep = i < j
+    left, right, i, j = left[keep], right[keep], i[keep], j[keep]
+
+    # Compute all the intersections at once.
+    shared = shapely.intersection(ownedgeometries[left], candidategeometries[right])
+
+    return i, j, shapely.length(shared), shapely.area(shared) > 0
+
+
+def _tiles(geometries, tiles):
+    """
+    Splits geometries into `tiles` vertical strips, each containing roughly the
+    same number of geometries.
+
+    Args:
+        geometries (np.ndarray): Geometries to split.
+        tiles (int): Number of strips.
+
+    Returns:
+        A list of index arrays, one for each strip.
+    """
+    x = shapely.get_x(shapely.point_on_surface(geometries))
+    order = np.argsort(x, kind="stable")
+
+    return [tile for tile in np.array_split(order, tiles) if len(tile)]
+
+
+def adjacencymatrix(
+    geometries,
+    geometrycolumn="geometry",
+    adjacency="rook",
+    processes=1,
+    tiles=None,
+) -> csr_matrix:
+    """
+    Computes the adjacency matrix of the provided geometric data, weighted by
+    the length of the boundary shared by each pair of adjacent geometries.
+    Candidate neighbors are found using an STRtree, and shared boundaries are
+    computed in bulk.
+
+    Args:
+        geometries (GeoDataFrame): Geometric data represented as a GeoDataFrame.
+        geometrycolumn (str, optional): Column containing geometries.
+        adjacency (str, optional): Adjacency rule; `"rook"` geometries must share
+            a boundary of positive length to be adjacent, while `"queen"`
+            geometries need only touch. Defaults to `"rook"`.
+        processes (int, optional): Number of worker processes. If greater than
+            1, geometries are split into spatial tiles which are processed in
+            parallel. Defaults to `1`.
+        tiles (int, optional): Number of spatial tiles. Defaults to four times
+            the number of processes.
+
+    Returns:
+        A symmetric `scipy.sparse.csr_matrix` whose rows and columns correspond
+        to the rows of `geometries`, and whose entries are shared perimeters.
+        Queen-adjacent geometries which only meet at points are stored as
+        explicit zeros.
+    """
+    if adjacency not in {"rook", "queen"}:
+        raise ValueError(
+            f'Adjacency rule "{adjacency}" not supported; use "rook" or "queen".'
+        )
+
+    shapes = np.asarray(geometries[geometrycolumn].values, dtype=object)
+    N = len(shapes)
+    indices = np.arange(N)
+
+    if tiles is None:
+        tiles = 4 * processes if processes > 1 else 1
+
+    # If we only have one tile, do everything in this process.
+    if tiles <= 1 or N == 0:
+        results = [_tileadjacency(indices, indices, shapes, shapes)]
+    else:
+        # Otherwise, figure out which geometries could intersect each tile's
+        # geometries, and send each tile off to a worker.
+        tree = STRtree(shapes)
+        owned = _tiles(shapes, tiles)
+        candidates = [
+            np.unique(tree.query(shapely.box(*shapely.total_bounds(shapes[tile]))))
+            for tile in owned
+        ]
+
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(
+                pool.map(
+                    _tileadjacency,
+                    owned,
+                    candidates,
+                    [shapes[tile] for tile in owned],
+                    [shapes[candidate] for candidate in candidates],
+                )
+            )
+
+    i, j, lengths, overlapping = (np.concatenate(r) for r in zip(*results))
+
+    # Warn about overlaps, like GerryChain does.
+    if overlapping.any():
+        warnings.warn(
+            "Found overlaps among the given polygons. Indices of overlaps: "
+            f"{set(zip(i[overlapping].tolist(), j[overlapping].tolist()))}"
+        )
+
+    # Rook adjacency requires a shared boundary of positive length.
+    if adjacency == "rook":
+        keep = lengths > 0
+        i, j, lengths = i[keep], j[keep], lengths[keep]
+
+    # Build the CSR matrix directly so explicit zeros are kept.
+    rows = np.concatenate([i, j])
+    columns = np.concatenate([j, i])
+    weights = np.concatenate([lengths, lengths])
+    order = np.lexsort((columns, rows))
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=N))))
+
+    return csr_matrix((weights[order], columns[order], indptr), shape=(N, N))
+
+
+def _perimeters(shapes, adjacency):
+    """
+    Finds the geometries on the boundary of the whole map, and the perimeter
+    each shares with that boundary.
+
+    Args:
+        shapes (np.ndarray): Geometries.
+        adjacency (csr_matrix): Adjacency matrix of `shapes`, weighted by
+            shared perimeter.
+
+    Returns:
+        A pair of arrays `(boundarynodes, boundaryperims)`, aligned with
+        `shapes`.
+    """
+    exterior = shapely.boundary(shapely.union_all(shapes))
+    shapely.prepare(exterior)
+    boundaries = shapely.boundary(shapes)
+    boundarynodes = shapely.intersects(exterior, boundaries)
+    shared = np.asarray(adjacency.sum(axis=1)).ravel()
+
+    return boundarynodes, shapely.length(boundaries) - shared
 
 
 def dualgraph(
@@ -9,6 +183,10 @@ def dualgraph(
     buffer=0,
     edges_to_add=[],
     edges_to_cut=[],
+    adjacency="rook",
+    processes=1,
+    tiles=None,
+    perimeters=True,
 ) -> Graph:
     """
     Generates a graph dual to the provided geometric data.
@@ -26,11 +204,25 @@ def dualgraph(
         edges_to_cut (list, optional): Edges to cut from the graph object. Assumed
             to be a list of pairs of objects, e.g. `[(u, v), ...]` where `u` and
             `v` are vertex labels consistent with `index`.
+        adjacency (str, optional): Adjacency rule, `"rook"` or `"queen"`; or an
+            adjacency matrix previously computed by `adjacencymatrix()` for these
+            geometries, which is used as-is. Defaults to `"rook"`.
+        processes (int, optional): Number of worker processes used to compute
+            adjacencies; passed to `adjacencymatrix()`.
+        tiles (int, optional): Number of spatial tiles; passed to
+            `adjacencymatrix()`.
+        perimeters (bool, optional): If `True`, annotates nodes with
+            `boundary_node` and `boundary_perim` attributes, which compactness
+            scores (and `PerimeterIndex`) rely on. Computing them requires the
+            boundary of the whole map, so pass `False` to skip it when they
+            aren't needed. Defaults to `True`.
 
     Returns:
-        A gerrychain `Graph` object dual to the geometric data.
+        A gerrychain `Graph` object dual to the geometric data. Edges carry
+        `shared_perim` attributes, and nodes `area` attributes.
     """
-    # Buffer geometries by default.
+    # Buffer geometries by default, without modifying the caller's data.
+    geometries = geometries.copy()
     geometries[geometrycolumn] = geometries[geometrycolumn].buffer(buffer)
 
     # Set indices and rename columns.
@@ -39,8 +231,60 @@ def dualgraph(
     if colmap:
         geometries = geometries.rename(colmap, axis=1)
 
-    # Generate the dual graph.
-    dg = Graph.from_geodataframe(geometries, adjacency="rook")
+    shapes = np.asarray(geometries[geometrycolumn].values, dtype=object)
+    invalid = np.flatnonzero(~shapely.is_valid(shapes))
+    if len(invalid):
+        raise GeometryError(
+            f"Invalid geometries at rows {geometries.index[invalid].tolist()}. "
+            "Consider repairing the affected geometries with `.buffer(0)`."
+        )
+
+    # Compute adjacencies if we weren't given them.
+    if not issparse(adjacency):
+        adjacency = adjacencymatrix(
+            geometries,
+            geometrycolumn=geometrycolumn,
+            adjacency=adjacency,
+            processes=processes,
+            tiles=tiles,
+        )
+
+    # Generate the dual graph, using each adjacency once.
+    adjacency = csr_matrix(adjacency)
+    labels = geometries.index.to_numpy()
+    rows = np.repeat(np.arange(adjacency.shape[0]), np.diff(adjacency.indptr))
+    upper = rows < adjacency.indices
+
+    dg = Graph()
+    dg.add_nodes_from(labels)
+    dg.add_weighted_edges_from(
+        zip(
+            labels[rows[upper]].tolist(),
+            labels[adjacency.indices[upper]].tolist(),
+            adjacency.data[upper].tolist(),
+        ),
+        weight="shared_perim",
+    )
+    dg.geometry = geometries[geometrycolumn]
+    dg.issue_warnings()
+
+    # Add "exterior" perimeters to the boundary nodes.
+    if perimeters:
+        boundarynodes, boundaryperims = _perimeters(shapes, adjacency)
+
+        for label, isboundary, perim in zip(
+            labels.tolist(), boundarynodes.tolist(), boundaryperims.tolist()
+        ):
+            dg.nodes[label]["boundary_node"] = isboundary
+            if isboundary:
+                dg.nodes[label]["boundary_perim"] = perim
+
+    # Add areas and the remaining data.
+    for label, area in zip(labels.tolist(), shapely.area(shapes).tolist()):
+        dg.nodes[label]["area"] = area
+
+    dg.add_data(geometries)
+    dg.graph["crs"] = geometries.crs.to_json() if geometries.crs else None
 
     # Add and remove extraneous edges.
     for add in edges_to_add:
@@ -1,12 +1,21 @@
+import json
 import math
-from typing import Any, Callable, Dict, List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Union
 
 import geopandas as gpd
 import gurobipy as gp
+import numpy as np
 import pandas as pd
+import shapely
 import tqdm
 from gurobipy import GRB
 from scipy.optimize import linear_sum_assignment as lsa
+from scipy.sparse import coo_matrix, csr_matrix
+
+from .spatialindex import spatialindexes
 
 
 def arealoverlap(
@@ -14,6 +23,7 @@ def arealoverlap(
     right: gpd.GeoDataFrame,
     assignment: str = "DISTRICT",
     crs=None,
+    sparse: bool = False,
 ) -> pd.DataFrame:
     r"""
     Given two GeoDataFrames, each encoding districting plans, computes the areal
@@ -27,6 +37,10 @@ def arealoverlap(
     the labels in `left`, and are the preimage of the label mapping; column indices
     are the labels in `right`, and are the image of the label mapping.
 
+    Only pairs of districts whose geometries intersect (found using an STRtree
+    built on `right`, which is cached for reuse) have their intersections
+    computed; all other entries are zero.
+
     Args:
         left (pd.DataFrame): GeoDataFrame whose labels are the preimage of the
             relabeling.
@@ -34,6 +48,9 @@ def arealoverlap(
             relabeling.
         assignment (str): Column on `left` and `right` which contains the district
             identifier.
+        sparse (bool, optional): If `True`, the returned DataFrame is backed by
+            sparse arrays, which is useful when most pairs of districts don't
+            overlap. Defaults to `False`.
 
     Returns:
         Cost matrix :math:`C`, represented as a DataFrame.
@@ -45,28 +62,24 @@ def arealoverlap(
     else:
         right = right.to_crs(left.crs)
 
-    # An empty list of records for everything.
-    records = []
-
-    # Figure out the image as we go along.
-    image = []
-
-    # Now, iterate over each dissolved district, finding the areal overlap with
-    # enacted districts.
-    for pid, pdistrict in zip(left[assignment], left["geometry"]):
-        image.append(pid)
-        records.append(
-            {
-                eid: pdistrict.intersection(edistrict).area
-                for eid, edistrict in zip(right[assignment], right["geometry"])
-            }
-        )
+    lshapes = np.asarray(left["geometry"].values, dtype=object)
+    rshapes = np.asarray(right["geometry"].values, dtype=object)
+
+    # Find the pairs of districts which intersect, and compute all their
+    # intersections at once.
+    i, j = spatialindexes.tree(right).query(lshapes, predicate="intersects")
+    areas = shapely.area(shapely.intersection(lshapes[i], rshapes[j]))
+    overlaps = coo_matrix((areas, (i, j)), shape=(len(lshapes), len(rshapes)))
 
     # Create a dataframe from that!
-    weighted = pd.DataFrame.from_records(records)
-    weighted.index = image
+    image, preimage = list(right[assignment]), list(left[assignment])
 
-    return weighted
+    if sparse:
+        return pd.DataFrame.sparse.from_spmatrix(
+            overlaps, index=preimage, columns=image
+        )
+
+    return pd.DataFrame(overlaps.toarray(), index=preimage, columns=image)
 
 
 def populationoverlap(
@@ -103,38 +116,42 @@ def populationoverlap(
         A DataFrame whose row names are the preimage of the relabeling, column names
         are the image of the relabeling, and values edge weights; a cost matrix.
     """
-    # Make sure types are appropriate.
-    right[assignment] = right[assignment].astype(str)
-    right[identifier] = right[identifier].astype(str)
-
-    left[assignment] = left[assignment].astype(str)
-    left[identifier] = left[identifier].astype(str)
-
-    # The preimage is the set of proposed-plan labels.
-    preimage = list(left[assignment].unique())
-
-    # Create a list of records from which we'll make a dataframe!
-    records = []
-
-    # For each label in the preimage, find the district which shares the most
-    # population; this is the cost matrix.
-    for fromlabel in preimage:
-        # Find the blocks in the "from" district and see how much population each
-        # district shares with each enacted district.
-        subleft = left[left[assignment] == fromlabel]
-        subright = right[right[identifier].isin(subleft[identifier])]
-
-        # Aggregate shared blocks based on district label.
-        agg = subright.groupby(assignment, as_index=False).sum()
-
-        # Now figure out the shared populations.
-        records.append(
-            {i: shared for i, shared in zip(agg[assignment], agg[population])}
-        )
+    # Make sure types are appropriate, without modifying the inputs.
+    leftlabels = left[assignment].astype(str)
+    rightlabels = right[assignment].astype(str)
+
+    # The preimage is the set of proposed-plan labels, and the image the set of
+    # enacted-plan labels; assign each an integer code.
+    leftcodes, preimage = pd.factorize(leftlabels)
+    rightcodes, image = pd.factorize(rightlabels)
+    n, m = len(preimage), len(image)
+
+    # Find the proposed-plan district for each unit in the enacted plan.
+    positions = pd.Index(left[identifier].astype(str)).get_indexer(
+        right[identifier].astype(str)
+    )
+    matched = positions >= 0
+
+    # Cross-tabulate the population shared by each pair of districts.
+    pairs = leftcodes[positions[matched]] * m + rightcodes[matched]
+    weights = right[population].to_numpy()[matched]
+    shared = np.bincount(pairs, weights=weights, minlength=n * m).reshape(n, m)
+    found = np.bincount(pairs, minlength=n * m).reshape(n, m) > 0
+
+    # Keep the enacted-plan districts which share units with a proposed-plan
+    # district, ordered by the first proposed-plan district they're found in.
+    columns = sorted(
+        (found[:, j].argmax(), image[j], j) for j in range(m) if found[:, j].any()
+    )
+    columns = [j for _, _, j in columns]
 
     # Create the cost matrix!
-    C = pd.DataFrame.from_records(records).fillna(0)
-    C.index = preimage
+    C = pd.DataFrame(
+        shared[:, columns], index=list(preimage), columns=list(image[columns])
+    )
+
+    if pd.api.types.is_integer_dtype(right[population]):
+        C = C.astype(right[population].dtype)
 
     return C
 
@@ -225,6 +242,179 @@ def optimalrelabeling(
     return dict(zip(preimage, image))
 
 
+def _assignmentarray(plan: Any) -> np.ndarray:
+    """
+    Converts a plan to an array of district assignments, in unit order.
+
+    Args:
+        plan (Any): A sequence of district assignments; a dictionary mapping unit
+            indices to district assignments (like those yielded by
+            `gerrytools.ben.ben_replay()`); or a dictionary with an `"assignment"`
+            key (like the lines of a JSONL ensemble file).
+
+    Returns:
+        The plan's district assignments as a NumPy array.
+    """
+    if isinstance(plan, dict):
+        if "assignment" in plan:
+            return np.asarray(plan["assignment"])
+
+        return np.asarray([plan[i] for i in range(len(plan))])
+
+    return np.asarray(plan)
+
+
+def _jsonlplans(path: str) -> Iterator[list]:
+    """
+    Reads plans from a JSONL ensemble file, one plan per line.
+    """
+    with open(path) as r:
+        for line in r:
+            if line.strip():
+                yield json.loads(line)["assignment"]
+
+
+class _Relabeler:
+    """
+    Relabels plans to best match a reference plan. Kept at the top level of the
+    module so it can be sent to worker processes.
+    """
+
+    def __init__(
+        self,
+        reference: np.ndarray,
+        population: np.ndarray,
+        maximize: bool,
+        mappings: bool,
+    ):
+        self.codes, self.labels = pd.factorize(reference)
+        self.population = population
+
+        if len(population) != len(reference):
+            raise ValueError(
+                f"Got {len(population)} populations for {len(reference)} units."
+            )
+        if (self.codes < 0).any():
+            raise ValueError("Every unit in the reference plan must be assigned.")
+        self.maximize = maximize
+        self.mappings = mappings
+
+    def __call__(self, plan: Any) -> Union[np.ndarray, dict]:
+        codes, labels = pd.factorize(_assignmentarray(plan))
+        n, m = len(labels), len(self.labels)
+
+        # Unassigned units get code -1, which would be counted as part of the
+        # last district.
+        if len(codes) != len(self.codes):
+            raise ValueError(
+                f"Got a plan with {len(codes)} units, but the reference plan has "
+                f"{len(self.codes)}."
+            )
+        if (codes < 0).any():
+            raise ValueError("Every unit in each plan must be assigned.")
+
+        # Cross-tabulate the population shared by each pair of districts, then
+        # find the best matching.
+        shared = np.bincount(
+            codes * m + self.codes, weights=self.population, minlength=n * m
+        ).reshape(n, m)
+        rows, columns = lsa(shared, maximize=self.maximize)
+
+        # Districts which aren't matched (if the plans have different numbers of
+        # districts) keep their labels.
+        relabeled = np.asarray(labels, dtype=object)
+        relabeled[rows] = np.asarray(self.labels, dtype=object)[columns]
+
+        if self.mappings:
+            return dict(zip(labels.tolist(), relabeled.tolist()))
+
+        return np.asarray(relabeled.tolist())[codes]
+
+    def many(self, plans: List[Any]) -> List[Union[np.ndarray, dict]]:
+        """
+        Relabels a batch of plans, so workers receive many plans at a time.
+        """
+        return [self(plan) for plan in plans]
+
+
+def relabelensemble(
+    plans: Union[Iterable[Any], str],
+    reference: Any,
+    population: Any = None,
+    maximize: bool = True,
+    mappings: bool = False,
+    processes: int = 1,
+    chunksize: int = 64,
+) -> Iterator[Union[np.ndarray, dict]]:
+    """
+    Relabels every plan in an ensemble to best match a reference plan (e.g. an
+    enacted plan), so district labels are consistent across the ensemble. This
+    solves the same problem as `optimalrelabeling()` with `populationoverlap()`
+    as the cost matrix, but the reference plan is only processed once, and plans
+    are represented as arrays of district assignments in a fixed unit order.
+
+    Args:
+        plans (Union[Iterable, str]): The plans to relabel. Each plan may be a
+            sequence of district assignments (one per unit), a dictionary mapping
+            unit indices to assignments (e.g. the output of
+            `gerrytools.ben.ben_replay()`), or a dictionary with an `"assignment"`
+            key. May also be the path to a JSONL ensemble file.
+        reference (Any): Sequence of reference-plan district assignments, in the
+            same unit order as `plans`.
+        population (Any, optional): Sequence of unit populations, in the same unit
+            order as `plans`. If not provided, each unit has weight 1.
+        maximize (bool, optional): Whether to maximize (rather than minimize) the
+            population shared by matched districts. Defaults to `True`.
+        mappings (bool, optional): If `True`, yields dictionaries mapping each
+            plan's labels to reference labels rather than relabeled plans.
+            Defaults to `False`.
+        processes (int, optional): Number of worker processes. Defaults to `1`.
+        chunksize (int, optional): Number of plans sent to a worker at a time
+            when `processes` is greater than 1. At most `2 * processes` batches
+            of plans are read ahead of the plans yielded. Defaults to `64`.
+
+    Yields:
+        Relabeled plans as NumPy arrays (or label mappings), in the same order
+        as `plans`.
+
+    Raises:
+        ValueError: If a plan, the reference plan, and the populations don't all
+            have the same number of units, or if any units are unassigned (e.g.
+            `None` or `NaN`).
+    """
+    if isinstance(plans, str):
+        plans = _jsonlplans(plans)
+
+    reference = _assignmentarray(reference)
+    population = (
+        np.ones(len(reference))
+        if population is None
+        else np.asarray(population, dtype=float)
+    )
+
+    relabeler = _Relabeler(reference, population, maximize, mappings)
+
+    if processes <= 1:
+        yield from map(relabeler, plans)
+        return
+
+    # Batches are submitted a few at a time rather than all at once (as
+    # pool.map() would), so streamed ensembles aren't read into memory ahead of
+    # the plans being yielded.
+    plans = iter(plans)
+    batches = iter(lambda: list(islice(plans, chunksize)), [])
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(relabeler.many, batch))
+            if len(pending) >= 2 * processes:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
 def ensure_column_types(
     units: gpd.GeoDataFrame,
     columns: List[str],
@@ -246,6 +436,37 @@ def ensure_column_types(
     return all([expression(x.name) for x in units[columns].dtypes])
 
 
+def _dispersionoverlaps(
+    proposed: Any, enacted: Any, population: Any, n: int
+) -> np.ndarray:
+    """
+    Computes the population shared by each pair of proposed and enacted
+    districts, where district labels are 1-indexed.
+
+    Args:
+        proposed: Proposed district labels, one per unit.
+        enacted: Enacted district labels, one per unit.
+        population: Population of each unit.
+        n: Number of districts.
+
+    Returns:
+        An `n` by `n` array whose `(i, j)`th entry is the population shared by
+        proposed district `i+1` and enacted district `j+1`.
+    """
+    proposed = np.asarray(proposed, dtype=np.int64) - 1
+    enacted = np.asarray(enacted, dtype=np.int64) - 1
+
+    if ((proposed < 0) | (proposed >= n) | (enacted < 0) | (enacted >= n)).any():
+        raise ValueError(
+            "District labels must be 1-indexed, and no greater than the number "
+            "of districts."
+        )
+
+    return np.bincount(
+        proposed * n + enacted, weights=np.asarray(population), minlength=n * n
+    ).reshape(n, n)
+
+
 def minimize_dispersion(
     units: gpd.GeoDataFrame,
     enacted_col: str,
@@ -259,6 +480,10 @@ def minimize_dispersion(
     and a column with proposed numberings. Returns a dictionary relabeling the
     proposed cols. Used in WI. Assumes that district labels are 1-indexed.
 
+    Without extra constraints, this is a linear assignment problem, and it's
+    solved directly with `scipy.optimize.linear_sum_assignment`; Gurobi is only
+    used when `extra_constraints` are provided.
+
     Args:
         units: The units to optimize on. E.g. Census blocks.
         enacted_col: The column in the GeoDataFrame with the enacted districts.
@@ -279,6 +504,17 @@ def minimize_dispersion(
         raise TypeError("Your pop col must be an int or float type!")
 
     districts = list(set(units[proposed_col].astype(int)))
+
+    overlaps = _dispersionoverlaps(
+        units[proposed_col], units[enacted_col], units[pop_col], len(districts)
+    )
+
+    # Without extra constraints, maximizing overlap is an assignment problem.
+    if extra_constraints is None:
+        rows, columns = lsa(overlaps, maximize=True)
+
+        return {districts[i]: districts[j] for i, j in zip(rows, columns)}
+
     model = gp.Model("state_model")
     model.setParam("OutputFlag", int(verbose))
 
@@ -298,21 +534,13 @@ def minimize_dispersion(
             return x
 
     for district in wrapper(districts):  # iter over proposed
-        enacted_intersection = (
-            units[units[proposed_col] == district]
-            .groupby(enacted_col)
-            .sum()[pop_col]
-            .to_dict()
-        )
-
-        for (
-            enacted,
-            overlap_pop,
-        ) in enacted_intersection.items():  # maximize overlap; minimize dispersion
-            exprs.append(numbering[district - 1, enacted - 1] * overlap_pop)
+        # Maximize overlap; minimize dispersion.
+        for enacted in np.flatnonzero(overlaps[district - 1]).tolist():
+            exprs.append(
+                numbering[district - 1, enacted] * overlaps[district - 1, enacted]
+            )
 
-        if extra_constraints is not None:
-            extra_constraints(model, numbering, district, districts)
+        extra_constraints(model, numbering, district, districts)
 
     model.addConstrs(
         (numbering.sum("*", v) == 1 for v in range(len(districts))), name="v"
@@ -349,12 +577,18 @@ def minimize_parity(
     and a column with proposed numberings. Returns a dictionary with the parity of the
     proposed cols. Used in WI. Assumes that district labels are 1-indexed.
 
+    Half the districts (rounded down) are made even, and the objective is the
+    odd-enacted population of the even districts. Since each district
+    contributes to the objective independently, the optimum is found exactly by
+    aggregating odd-enacted population per district and choosing the districts
+    with the least; no solver is needed.
+
     Args:
         units: The units to optimize on. E.g. Census blocks.
         enacted_col: The column in the GeoDataFrame with the enacted districts.
         proposed_col: The column in the GeoDataFrame with the proposed districts.
         pop_col: The column in the GeoDataFrame with population counts.
-        verbose: If true, do not suppress solver output. Otherwise, stay quiet.
+        verbose: Retained for compatibility; there's no solver output.
 
     Returns:
         A dictionary mapping proposed labels to booleans values representing the optimal parity.
@@ -368,41 +602,26 @@ def minimize_parity(
     ):
         raise TypeError("Your pop col must be an int or float type!")
 
-    model = gp.Model("parity_model")
-    model.setParam("OutputFlag", int(verbose))
-
     districts = list(set(units[proposed_col].astype(int)))
-    districts_even = model.addVars(
-        len(districts), vtype=GRB.BINARY, name="districts_even"
-    )
-
-    exprs = []
-    if verbose:
-
-        def wrapper(x):
-            return tqdm.tqdm(x)
-
-    else:
 
-        def wrapper(x):
-            return x
-
-    for i, block in wrapper(units[[enacted_col, proposed_col, pop_col]].iterrows()):
-        district = districts.index(int(block[proposed_col]))
-        isOdd = bool((int(block[enacted_col]) % 2) == 1)
-        exprs.append(isOdd * districts_even[district] * block[pop_col])
-
-    obj = gp.quicksum(exprs)
-    model.addConstr(gp.quicksum(districts_even) == math.floor(len(districts) / 2), "c0")
-
-    model.setObjective(obj, GRB.MINIMIZE)
-    model.optimize()
+    # Find the population of each proposed district which was in an odd-numbered
+    # enacted district.
+    odd = units[enacted_col].astype(int) % 2 == 1
+    oddpop = (
+        units.loc[odd, pop_col]
+        .groupby(units.loc[odd, proposed_col].astype(int))
+        .sum()
+        .reindex(districts, fill_value=0)
+        .to_numpy()
+    )
 
-    mapping = {}
-    for i, v in enumerate(model.getVars()):
-        mapping[districts[i]] = bool(v.x)
+    # Each district contributes its odd-enacted population to the objective
+    # only if it's even, so the districts with the least odd-enacted population
+    # are made even.
+    even = np.zeros(len(districts), dtype=bool)
+    even[np.argsort(oddpop, kind="stable")[: math.floor(len(districts) / 2)]] = True
 
-    return mapping
+    return dict(zip(districts, even.tolist()))
 
 
 def minimize_dispersion_with_parity(
@@ -441,7 +660,8 @@ def minimize_dispersion_with_parity(
                 == 1
             )
 
-        extra_constraints(model, numbering, district, districts)
+        if extra_constraints is not None:
+            extra_constraints(model, numbering, district, districts)
 
     return minimize_dispersion(
         units, enacted_col, proposed_col, pop_col, parity_constraint
@@ -470,6 +690,41 @@ def calculate_dispersion(
     return units[units[enacted_col] != units[proposed_col]][pop_col].sum()
 
 
+def _dispersionmatrix(
+    enacted: np.ndarray, proposed: np.ndarray, population: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the population displaced from each enacted district by each of a
+    batch of proposed plans.
+
+    Args:
+        enacted: Enacted district labels, one per unit.
+        proposed: Proposed district labels, one row per plan and one column per
+            unit.
+        population: Population of each unit.
+
+    Returns:
+        A pair `(districts, displaced)`, where `districts` holds the sorted
+        enacted district labels and `displaced` is a (plans by districts) array
+        whose entries are the number of people displaced from each district.
+    """
+    codes, districts = pd.factorize(enacted, sort=True)
+    assigned = codes >= 0
+
+    # Zero out the population of units which stay in their enacted districts,
+    # then sum what's left by enacted district.
+    displaced = np.where(proposed != enacted, population, 0)[:, assigned]
+    indicator = csr_matrix(
+        (
+            np.ones(assigned.sum(), dtype=displaced.dtype),
+            (np.arange(assigned.sum()), codes[assigned]),
+        ),
+        shape=(assigned.sum(), len(districts)),
+    )
+
+    return np.asarray(districts), np.asarray((indicator.T @ displaced.T).T)
+
+
 def calculate_dispersion_per_district(
     units: gpd.GeoDataFrame, enacted_col: str, proposed_col: str, pop_col: str
 ) -> Dict[int, int]:
@@ -490,13 +745,48 @@ def calculate_dispersion_per_district(
     if units[enacted_col].dtype != units[proposed_col].dtype:
         raise TypeError("Your enacted and proposed columns must have the same type!")
 
-    dispersion_dict = {
-        district: sum(
-            units[pop_col][
-                (units[enacted_col] == district) & (units[proposed_col] != district)
-            ]
-        )
-        for district in sorted(units[enacted_col].unique())
-    }
+    districts, displaced = _dispersionmatrix(
+        units[enacted_col].to_numpy(),
+        units[proposed_col].to_numpy()[np.newaxis, :],
+        units[pop_col].to_numpy(),
+    )
+
+    return dict(zip(districts.tolist(), displaced[0].tolist()))
+
+
+def calculate_dispersion_per_district_many(
+    units: gpd.GeoDataFrame,
+    enacted_col: str,
+    proposed: Union[List[str], np.ndarray],
+    pop_col: str,
+) -> pd.DataFrame:
+    """
+    Calculates dispersion per district for many proposed plans at once, given a
+    column with enacted districts.
+
+    Args:
+        units: The units to optimize on. E.g. census blocks.
+        enacted_col: The column in the GeoDataFrame with the enacted districts.
+        proposed: Proposed district assignments: either a list of columns in
+            the GeoDataFrame, or an array with one row per plan whose columns
+            correspond to the rows of `units`.
+        pop_col: The column in the GeoDataFrame with population counts.
+
+    Returns:
+        A DataFrame with one row per proposed plan (indexed by column name, if
+        `proposed` is a list of columns) and one column per enacted district,
+        whose entries are the number of people displaced from each enacted
+        district.
+    """
+    if isinstance(proposed, list) and all(isinstance(c, str) for c in proposed):
+        index = proposed
+        proposed = units[proposed].to_numpy().T
+    else:
+        proposed = np.asarray(proposed)
+        index = None
+
+    districts, displaced = _dispersionmatrix(
+        units[enacted_col].to_numpy(), proposed, units[pop_col].to_numpy()
+    )
 
-    return dispersion_dict
+    return pd.DataFrame(displaced, index=index, columns=districts)
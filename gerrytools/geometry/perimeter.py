@@ -0,0 +1,322 @@
+from dataclasses import dataclass
+from math import pi, sqrt
+from typing import Callable, Dict, Union
+
+import networkx as nx
+import numpy as np
+from gerrychain import Partition
+from gerrychain.graph import FrozenGraph
+
+from .binarygraph import GraphArrays
+
+
+def _labels(values: list) -> np.ndarray:
+    """
+    Creates a one-dimensional array of labels. Labels which NumPy would treat as
+    sequences (like the tuples labeling grid graphs' nodes) are kept as objects.
+    """
+    labels = np.asarray(values)
+
+    if labels.ndim != 1:
+        labels = np.empty(len(values), dtype=object)
+        for i, value in enumerate(values):
+            labels[i] = value
+
+    return labels
+
+
+@dataclass
+class PerimeterIndex:
+    """
+    Array representation of the geometric data compactness scores need: each
+    node's area, exterior (state boundary) perimeter, and the perimeter shared
+    by each pair of adjacent nodes. Built once from a graph annotated by
+    `dualgraph()` (or `Graph.from_geodataframe()`), after which areas and
+    perimeters of any assignment are array reductions rather than geometric
+    operations or walks over the graph.
+
+    Methods taking an `assignment` expect an array of district labels aligned
+    with `nodes`; results are dictionaries keyed by district label.
+    """
+
+    nodes: np.ndarray
+    """Node labels."""
+    area: np.ndarray
+    """Area of each node."""
+    boundary: np.ndarray
+    """Whether each node is on the boundary of the whole map."""
+    exterior: np.ndarray
+    """Perimeter each node shares with the boundary of the whole map; `0` for
+    nodes which aren't on the boundary."""
+    head: np.ndarray
+    """Positions (in `nodes`) of the first endpoint of each edge."""
+    tail: np.ndarray
+    """Positions (in `nodes`) of the second endpoint of each edge."""
+    shared: np.ndarray
+    """Perimeter shared by the endpoints of each edge."""
+
+    @classmethod
+    def from_graph(
+        cls, graph: Union[nx.Graph, FrozenGraph, GraphArrays]
+    ) -> "PerimeterIndex":
+        """
+        Creates an index from a graph with `area`, `boundary_node`, and
+        `boundary_perim` node attributes and `shared_perim` edge attributes.
+
+        Args:
+            graph (Graph): Annotated graph. May also be the `FrozenGraph` attached
+                to a `Partition`, or `GraphArrays`.
+
+        Returns:
+            A `PerimeterIndex` for `graph`.
+        """
+        if isinstance(graph, GraphArrays):
+            return cls.from_arrays(graph)
+        if isinstance(graph, FrozenGraph):
+            graph = graph.graph
+
+        nodes = list(graph.nodes)
+        position = {node: i for i, node in enumerate(nodes)}
+        data = [graph.nodes[node] for node in nodes]
+        edges = list(graph.edges(data="shared_perim", default=0))
+
+        boundary = np.array([d["boundary_node"] for d in data], dtype=bool)
+        exterior = np.array([d.get("boundary_perim", 0) for d in data], dtype=float)
+
+        return cls(
+            nodes=_labels(nodes),
+            area=np.array([d["area"] for d in data], dtype=float),
+            boundary=boundary,
+            exterior=np.where(boundary, exterior, 0),
+            head=np.array([position[u] for u, _, _ in edges], dtype=np.int64),
+            tail=np.array([position[v] for _, v, _ in edges], dtype=np.int64),
+            shared=np.array([s for _, _, s in edges], dtype=float),
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: GraphArrays) -> "PerimeterIndex":
+        """
+        Creates an index from a columnar graph (e.g. one loaded with
+        `loadarrays()`) without building a `networkx` graph.
+
+        Args:
+            arrays (GraphArrays): Columnar graph with `area`, `boundary_node`,
+                and `boundary_perim` node attributes and `shared_perim` edge
+                attributes.
+
+        Returns:
+            A `PerimeterIndex` for `arrays`.
+        """
+        N = len(arrays.nodes)
+        rows = np.repeat(np.arange(N), np.diff(arrays.indptr))
+        upper = rows <= arrays.indices
+
+        boundary = np.asarray(arrays.columns["boundary_node"], dtype=bool)
+        exterior = np.asarray(
+            arrays.columns.get("boundary_perim", np.zeros(N)), dtype=float
+        )
+
+        return cls(
+            nodes=_labels(arrays.nodes),
+            area=np.asarray(arrays.columns["area"], dtype=float),
+            boundary=boundary,
+            exterior=np.where(boundary, np.nan_to_num(exterior), 0),
+            head=rows[upper],
+            tail=np.asarray(arrays.indices)[upper],
+            shared=np.asarray(
+                arrays.edges.get("shared_perim", np.zeros(len(arrays.indices))),
+                dtype=float,
+            )[upper],
+        )
+
+    def assignment(self, partition: Partition) -> np.ndarray:
+        """
+        Gets a partition's assignment as an array aligned with `nodes`.
+
+        Args:
+            partition (Partition): Partition of the indexed graph.
+
+        Returns:
+            An array of district labels.
+        """
+        return _labels([partition.assignment[node] for node in self.nodes.tolist()])
+
+    def cutedges(self, assignment: np.ndarray) -> np.ndarray:
+        """
+        Finds the edges whose endpoints are assigned to different districts.
+
+        Args:
+            assignment (np.ndarray): District labels aligned with `nodes`.
+
+        Returns:
+            A boolean array aligned with `head` and `tail`.
+        """
+        assignment = np.asarray(assignment)
+        return assignment[self.head] != assignment[self.tail]
+
+    def boundarynodes(self, assignment: np.ndarray) -> np.ndarray:
+        """
+        Finds the nodes on the boundary of their district: those on the boundary
+        of the whole map, or with a neighbor in another district.
+
+        Args:
+            assignment (np.ndarray): District labels aligned with `nodes`.
+
+        Returns:
+            A boolean array aligned with `nodes`.
+        """
+        cut = self.cutedges(assignment)
+        onboundary = self.boundary.copy()
+        onboundary[self.head[cut]] = True
+        onboundary[self.tail[cut]] = True
+
+        return onboundary
+
+    def areas(self, assignment: np.ndarray) -> Dict:
+        """
+        Computes the area of each district.
+
+        Args:
+            assignment (np.ndarray): District labels aligned with `nodes`.
+
+        Returns:
+            A dictionary mapping district labels to areas.
+        """
+        labels, codes = np.unique(assignment, return_inverse=True)
+        areas = np.bincount(codes, weights=self.area, minlength=len(labels))
+
+        return dict(zip(labels.tolist(), areas.tolist()))
+
+    def perimeters(self, assignment: np.ndarray) -> Dict:
+        """
+        Computes the perimeter of each district: the perimeter its nodes share
+        with the boundary of the whole map, plus the perimeter of its cut edges.
+
+        Args:
+            assignment (np.ndarray): District labels aligned with `nodes`.
+
+        Returns:
+            A dictionary mapping district labels to perimeters.
+        """
+        labels, codes = np.unique(assignment, return_inverse=True)
+        cut = codes[self.head] != codes[self.tail]
+
+        perimeters = np.bincount(codes, weights=self.exterior, minlength=len(labels))
+        perimeters += np.bincount(
+            np.concatenate([codes[self.head[cut]], codes[self.tail[cut]]]),
+            weights=np.concatenate([self.shared[cut], self.shared[cut]]),
+            minlength=len(labels),
+        )
+
+        return dict(zip(labels.tolist(), perimeters.tolist()))
+
+    def polsby_popper(self, assignment: np.ndarray) -> Dict:
+        """
+        Computes the Polsby-Popper score of each district.
+
+        Args:
+            assignment (np.ndarray): District labels aligned with `nodes`.
+
+        Returns:
+            A dictionary mapping district labels to Polsby-Popper scores.
+        """
+        return _polsbypopper(self.areas(assignment), self.perimeters(assignment))
+
+    def schwartzberg(self, assignment: np.ndarray) -> Dict:
+        """
+        Computes the Schwartzberg score of each district.
+
+        Args:
+            assignment (np.ndarray): District labels aligned with `nodes`.
+
+        Returns:
+            A dictionary mapping district labels to Schwartzberg scores.
+        """
+        return _schwartzberg(self.polsby_popper(assignment))
+
+
+def _polsbypopper(areas: Dict, perimeters: Dict) -> Dict:
+    return {part: 4 * pi * areas[part] / perimeters[part] ** 2 for part in areas}
+
+
+def _schwartzberg(polsbypopper: Dict) -> Dict:
+    return {part: 1 / sqrt(score) for part, score in polsbypopper.items()}
+
+
+class AssignmentArray:
+    """
+    An updater which keeps a partition's assignment as an array aligned with a
+    `PerimeterIndex`'s nodes. The array is built once, and afterwards updated
+    from each partition's flips.
+
+    :ivar alias: The key corresponding to this updater in the Partition's
+        updaters dictionary.
+    """
+
+    __slots__ = ["index", "positions", "alias"]
+
+    def __init__(self, index: PerimeterIndex, alias: str = "assignment_array"):
+        """
+        Args:
+            index (PerimeterIndex): Index whose nodes the array is aligned with.
+            alias (str, optional): The key corresponding to this updater in the
+                Partition's updaters dictionary.
+        """
+        self.index = index
+        self.positions = {node: i for i, node in enumerate(index.nodes.tolist())}
+        self.alias = alias
+
+    def __call__(self, partition: Partition) -> np.ndarray:
+        if partition.parent is None or not partition.flips:
+            return self.index.assignment(partition)
+
+        assignment = partition.parent[self.alias].copy()
+        positions = [self.positions[node] for node in partition.flips]
+        assignment[positions] = _labels(list(partition.flips.values()))
+
+        return assignment
+
+
+def compactness_updaters(
+    graph: Union[nx.Graph, GraphArrays, PerimeterIndex]
+) -> Dict[str, Callable]:
+    """
+    Updaters to calculate district areas, perimeters, and Polsby-Popper and
+    Schwartzberg scores for a `gerrychain.Partition` as a chain runs. The
+    geometric data is read from the graph once; afterwards, each step is a
+    handful of array reductions over the partition's assignment.
+
+    Args:
+        graph (Graph): Graph annotated by `dualgraph()`, the corresponding
+            `GraphArrays`, or a `PerimeterIndex` built from either.
+
+    Returns:
+        A dictionary of updaters, keyed by `"assignment_array"`, `"area"`,
+        `"perimeter"`, `"polsby_popper"`, and `"schwartzberg"`. The `"area"` and
+        `"perimeter"` updaters compute the same values as GerryChain's
+        `Tally("area")` and `perimeter` updaters, so they can replace them.
+    """
+    index = (
+        graph if isinstance(graph, PerimeterIndex) else PerimeterIndex.from_graph(graph)
+    )
+    assignment = AssignmentArray(index)
+
+    def area(partition: Partition) -> Dict:
+        return index.areas(partition[assignment.alias])
+
+    def perimeter(partition: Partition) -> Dict:
+        return index.perimeters(partition[assignment.alias])
+
+    def polsby_popper(partition: Partition) -> Dict:
+        return _polsbypopper(partition["area"], partition["perimeter"])
+
+    def schwartzberg(partition: Partition) -> Dict:
+        return _schwartzberg(partition["polsby_popper"])
+
+    return {
+        assignment.alias: assignment,
+        "area": area,
+        "perimeter": perimeter,
+        "polsby_popper": polsby_popper,
+        "schwartzberg": schwartzberg,
+    }
@@ -0,0 +1,313 @@
+from typing import Mapping, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import shapely
+from geopandas import GeoDataFrame, GeoSeries
+from pyproj import CRS
+from shapely.strtree import STRtree
+
+from .simplify import _packshapes, _unpackshapes
+from .unitmap import UnitMap
+
+# Grid cell values which aren't unit codes: cells outside every unit, and cells
+# crossed by a unit boundary (whose points are located exactly).
+OUTSIDE = -1
+MIXED = -2
+
+# Rough bounds on the number of cells in a grid, and in each batch of cells
+# classified at once.
+_MAXCELLS = 2**24
+_BATCHCELLS = 2**18
+
+
+class PointIndex:
+    """
+    Raster index for locating points in a layer of units (e.g. blocks). The
+    units' bounding box is split into a grid of square cells, and each cell
+    records the unit containing it; cells crossed by a unit boundary are marked
+    as mixed. Points in ordinary cells are located by looking up their cell, and
+    only points in mixed cells are located geometrically, so millions of points
+    (addresses, residences, polling places) can be mapped to units in bulk.
+
+    :ivar units: Unique identifiers of the units.
+    :ivar grid: Integer array of cell values: the index (into `units`) of the
+        unit containing each cell, `-1` for cells outside every unit, or `-2`
+        for cells crossed by a boundary. Row `0` is the bottom of the grid.
+    :ivar origin: Coordinates of the grid's lower-left corner.
+    :ivar cellsize: Width (and height) of each cell, in the units' CRS.
+    :ivar shapes: The units' geometries, used to locate points in mixed cells.
+        They're prepared the first time they're used.
+    :ivar crs: The units' CRS, if any.
+    """
+
+    def __init__(self, units, grid, origin, cellsize, shapes, crs=None):
+        """
+        Args:
+            units (array-like): Unique identifiers of the units.
+            grid (np.ndarray): Two-dimensional array of cell values.
+            origin (tuple): Coordinates of the grid's lower-left corner.
+            cellsize (float): Width (and height) of each cell.
+            shapes (array-like): The units' geometries.
+            crs (optional): The units' CRS.
+        """
+        self.units = np.asarray(units)
+        self.grid = np.asarray(grid, dtype=np.int32)
+        self.origin = tuple(float(c) for c in origin)
+        self.cellsize = float(cellsize)
+        self.shapes = np.asarray(shapes, dtype=object)
+        self.crs = CRS.from_user_input(crs) if crs is not None else None
+
+    @classmethod
+    def from_geometries(
+        cls,
+        geometries: GeoDataFrame,
+        index: str = None,
+        cellsize: float = None,
+        cellsperunit: int = 64,
+    ) -> "PointIndex":
+        """
+        Rasterizes a layer of units.
+
+        Args:
+            geometries (GeoDataFrame): Units to index. Units shouldn't overlap.
+            index (str, optional): Column of unique identifiers for the units. If
+                not provided, the index of `geometries` is used.
+            cellsize (float, optional): Width (and height) of each cell, in the
+                units of `geometries`' CRS. Smaller cells leave fewer points to
+                be located exactly, at the expense of memory.
+            cellsperunit (int, optional): If `cellsize` isn't provided, cells are
+                sized so the average unit covers about this many cells. Defaults
+                to `64`.
+
+        Returns:
+            A `PointIndex` over `geometries`.
+        """
+        units = geometries[index] if index else geometries.index
+        shapes = np.asarray(geometries.geometry.values, dtype=object)
+        minx, miny, maxx, maxy = shapely.total_bounds(shapes)
+
+        if cellsize is None:
+            cellsize = np.sqrt(
+                shapely.area(shapes).sum() / (cellsperunit * len(shapes))
+            )
+
+        # Don't let the grid grow too large.
+        cellsize = max(cellsize, np.sqrt((maxx - minx) * (maxy - miny) / _MAXCELLS))
+        rows = int((maxy - miny) // cellsize) + 1
+        columns = int((maxx - minx) // cellsize) + 1
+
+        grid = _rasterize(shapes, (minx, miny), cellsize, (rows, columns))
+
+        return cls(
+            units.to_numpy(), grid, (minx, miny), cellsize, shapes, geometries.crs
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "PointIndex":
+        """
+        Loads a `PointIndex` written by `PointIndex.save()`.
+
+        Args:
+            path (str): Path to the `.npz` file.
+
+        Returns:
+            The stored `PointIndex`.
+        """
+        with np.load(path, allow_pickle=False) as stored:
+            crs = stored["crs"].item()
+            return cls(
+                stored["units"],
+                stored["grid"],
+                stored["origin"],
+                stored["cellsize"].item(),
+                _unpackshapes(stored["wkb"], stored["offsets"]),
+                crs if crs else None,
+            )
+
+    def save(self, path: str):
+        """
+        Saves the `PointIndex` to an uncompressed `.npz` file. As with
+        `UnitMap.save()`, object-typed unique identifiers are stored as strings,
+        and geometries are stored as WKB, so no pickling is required to load
+        them.
+
+        Args:
+            path (str): Path to the `.npz` file.
+        """
+        units = self.units.astype(str) if self.units.dtype == object else self.units
+        buffer, offsets = _packshapes(self.shapes)
+
+        np.savez(
+            path,
+            units=units,
+            grid=self.grid,
+            origin=np.asarray(self.origin),
+            cellsize=np.asarray(self.cellsize),
+            wkb=buffer,
+            offsets=offsets,
+            crs=np.asarray(self.crs.to_wkt() if self.crs else ""),
+        )
+
+    def codes(self, points) -> np.ndarray:
+        """
+        Locates points in the units.
+
+        Args:
+            points: Points to locate: a `GeoSeries` or `GeoDataFrame` of points
+                (reprojected to the units' CRS if necessary), an array of
+                `shapely.Point`s, or an `(N, 2)` array of coordinates in the
+                units' CRS.
+
+        Returns:
+            An integer array with the index (into `units`) of the unit containing
+            each point, or `-1` if the point isn't in any unit.
+        """
+        x, y = self._coordinates(points)
+
+        # Find each point's cell, and look it up.
+        column = np.floor((x - self.origin[0]) / self.cellsize)
+        row = np.floor((y - self.origin[1]) / self.cellsize)
+        rows, columns = self.grid.shape
+        inside = (row >= 0) & (row < rows) & (column >= 0) & (column < columns)
+
+        codes = np.full(len(x), OUTSIDE, dtype=np.int64)
+        codes[inside] = self.grid[
+            row[inside].astype(np.int64), column[inside].astype(np.int64)
+        ]
+
+        # Points in cells crossed by boundaries are located exactly, by testing
+        # them against the (prepared) units. Points on a boundary shared by
+        # several units go to the first of them.
+        exact = np.flatnonzero(codes == MIXED)
+        codes[exact] = OUTSIDE
+
+        shapely.prepare(self.shapes)
+        tree = STRtree(shapely.points(x[exact], y[exact]))
+        units, found = tree.query(self.shapes, predicate="intersects")
+        order = np.lexsort((units, found))
+        found, first = np.unique(found[order], return_index=True)
+        codes[exact[found]] = units[order][first]
+
+        return codes
+
+    def locate(self, points, ids=None) -> UnitMap:
+        """
+        Locates points in the units, producing a `UnitMap` from points to units.
+        Compose it with a `UnitMap` from units to districts (or use `assign()`)
+        to map points to districts.
+
+        Args:
+            points: Points to locate; see `codes()`.
+            ids (array-like, optional): Unique identifiers for the points. If not
+                provided, the index of `points` is used if it's a `GeoSeries` or
+                `GeoDataFrame`, and the points' positions otherwise.
+
+        Returns:
+            A `UnitMap` taking points to units. Points outside every unit are
+            unassigned.
+        """
+        codes = self.codes(points)
+
+        if ids is None:
+            if isinstance(points, (GeoSeries, GeoDataFrame)):
+                ids = points.index.to_numpy()
+            else:
+                ids = np.arange(len(codes))
+
+        return UnitMap(ids, self.units, codes)
+
+    def assign(self, points, assignment: Union[Mapping, pd.Series, np.ndarray]):
+        """
+        Maps points to districts through an assignment of units to districts.
+
+        Args:
+            points: Points to locate; see `codes()`.
+            assignment: Assignment of units to districts: a dictionary or `Series`
+                keyed by the units' unique identifiers, or an array aligned with
+                `units` (e.g. a plan from an ensemble).
+
+        Returns:
+            An array with the district containing each point, or `NaN` for
+            points outside every unit (or in unassigned units).
+        """
+        if isinstance(assignment, Mapping):
+            assignment = pd.Series(assignment)
+        if isinstance(assignment, pd.Series):
+            assignment = assignment.reindex(self.units)
+
+        assignment = np.asarray(assignment)
+        codes = self.codes(points)
+        districts = assignment[np.maximum(codes, 0)]
+
+        if (codes < 0).any():
+            if districts.dtype.kind in "biu":
+                districts = districts.astype(float)
+            elif districts.dtype.kind != "f":
+                districts = districts.astype(object)
+            districts[codes < 0] = np.nan
+
+        return districts
+
+    def _coordinates(self, points) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gets the coordinates of points, reprojecting them if necessary.
+        """
+        if isinstance(points, (GeoSeries, GeoDataFrame)):
+            if self.crs is not None and points.crs is not None:
+                points = points.to_crs(self.crs)
+            points = np.asarray(points.geometry.values, dtype=object)
+
+        points = np.asarray(points)
+        if points.dtype == object:
+            return shapely.get_x(points), shapely.get_y(points)
+
+        points = points.reshape(-1, 2).astype(float)
+        return points[:, 0], points[:, 1]
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+
+def _rasterize(shapes, origin, cellsize, shape) -> np.ndarray:
+    """
+    Computes the grid of cell values for a set of units. Cells crossed by a
+    unit's boundary are mixed; every other cell lies entirely within one unit
+    (or outside all of them), so it takes the value of its center.
+
+    Args:
+        shapes (np.ndarray): The units' geometries.
+        origin (tuple): Coordinates of the grid's lower-left corner.
+        cellsize (float): Width (and height) of each cell.
+        shape (tuple): Number of rows and columns in the grid.
+
+    Returns:
+        A two-dimensional array of cell values.
+    """
+    rows, columns = shape
+    grid = np.full(shape, OUTSIDE, dtype=np.int32)
+    units = STRtree(shapes)
+    boundaries = STRtree(shapely.boundary(shapes))
+
+    # Classify the cells a batch of rows at a time, to bound memory use.
+    batch = max(_BATCHCELLS // columns, 1)
+    x = origin[0] + cellsize * np.arange(columns)
+
+    for start in range(0, rows, batch):
+        stop = min(start + batch, rows)
+        y = origin[1] + cellsize * np.arange(start, stop)
+        left, bottom = (a.ravel() for a in np.meshgrid(x, y))
+
+        cells = shapely.box(left, bottom, left + cellsize, bottom + cellsize)
+        values = np.full(len(cells), OUTSIDE, dtype=np.int32)
+
+        centers = shapely.points(left + cellsize / 2, bottom + cellsize / 2)
+        found, unit = units.query(centers, predicate="within")
+        values[found] = unit
+
+        mixed, _ = boundaries.query(cells, predicate="intersects")
+        values[mixed] = MIXED
+
+        grid[start:stop] = values.reshape(stop - start, columns)
+
+    return grid
@@ -0,0 +1,235 @@
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+import numpy as np
+import shapely
+from geopandas import GeoDataFrame, GeoSeries
+from shapely.strtree import STRtree
+
+from .spatialindex import _fingerprint
+
+
+def _simplifyshapes(shapes: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Simplifies a tiling of polygons without opening gaps or overlaps between
+    neighbors. Boundaries are split into arcs at the points where three or more
+    units meet, each arc is simplified once (so both units sharing it see the
+    same simplified boundary), and the simplified arcs are polygonized back into
+    faces which are reassigned to the original units. Arcs around units which
+    would collapse entirely are left as they are, so every unit keeps an area.
+
+    Args:
+        shapes (np.ndarray): Polygons to simplify.
+        tolerance (float): Simplification tolerance, in the units of the
+            polygons' coordinates.
+
+    Returns:
+        An array of simplified polygons, one for each of `shapes`.
+    """
+    # Node the boundaries and merge them into arcs which run between junctions.
+    arcs = shapely.line_merge(shapely.union_all(shapely.boundary(shapes)))
+    arcs = shapely.get_parts(arcs)
+    arctree = STRtree(arcs)
+    tree = STRtree(shapes)
+
+    keep = np.zeros(len(arcs), dtype=bool)
+    while True:
+        faces = _faces(arcs, keep, tolerance)
+        owners = _owners(faces, shapes, tree)
+
+        # Units without faces collapsed; keep their arcs and try again.
+        collapsed = np.setdiff1d(
+            np.flatnonzero(~shapely.is_empty(shapes)), owners[owners >= 0]
+        )
+        _, kept = arctree.query(shapely.boundary(shapes[collapsed]), predicate="covers")
+        if not len(collapsed) or keep[kept].all():
+            break
+        keep[kept] = True
+
+    # Combine each unit's faces. Units which still have no faces are left empty
+    # rather than overlapping their neighbors.
+    result = np.full(len(shapes), shapely.Polygon(), dtype=object)
+    found = np.flatnonzero(owners >= 0)
+    order = np.argsort(owners[found], kind="stable")
+    units, starts = np.unique(owners[found][order], return_index=True)
+
+    for unit, group in zip(units, np.split(faces[found][order], starts[1:])):
+        result[unit] = group[0] if len(group) == 1 else shapely.union_all(group)
+
+    return result
+
+
+def _faces(arcs: np.ndarray, keep: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Simplifies the arcs which aren't kept, re-nodes them in case simplified arcs
+    cross, and polygonizes them into faces.
+    """
+    simplified = arcs.copy()
+    simplified[~keep] = shapely.simplify(arcs[~keep], tolerance, preserve_topology=True)
+    noded = shapely.get_parts(shapely.union_all(simplified))
+
+    return shapely.get_parts(shapely.polygonize(noded))
+
+
+def _owners(faces: np.ndarray, shapes: np.ndarray, tree: STRtree) -> np.ndarray:
+    """
+    Assigns each face to the unit it overlaps most. Faces which lie mostly
+    outside every unit (holes in the original tiling) are assigned `-1`.
+    """
+    i, j = tree.query(faces, predicate="intersects")
+    areas = shapely.area(shapely.intersection(faces[i], shapes[j]))
+
+    # Sort each face's candidates by decreasing overlap, and take the first.
+    order = np.lexsort((-areas, i))
+    i, j, areas = i[order], j[order], areas[order]
+    first = np.unique(i, return_index=True)[1]
+
+    owners = np.full(len(faces), -1)
+    owners[i[first]] = j[first]
+
+    covered = np.bincount(i, weights=areas, minlength=len(faces))
+    owners[covered <= shapely.area(faces) / 2] = -1
+
+    return owners
+
+
+# Bumped whenever the simplification algorithm changes, so geometries cached by
+# earlier versions aren't read back.
+_CACHEVERSION = 2
+
+
+def _cachepath(cache: str, fingerprint: str, tolerance: float) -> str:
+    return os.path.join(
+        cache, f"simplify-v{_CACHEVERSION}-{fingerprint}-{tolerance!r}.npz"
+    )
+
+
+def _packshapes(shapes: np.ndarray):
+    """
+    Encodes geometries as a single buffer of concatenated WKB, with an array of
+    offsets into the buffer, so they can be stored without pickling.
+    """
+    wkbs = shapely.to_wkb(shapes)
+    offsets = np.concatenate(([0], np.cumsum([len(wkb) for wkb in wkbs])))
+
+    return np.frombuffer(b"".join(wkbs), dtype=np.uint8), offsets
+
+
+def _unpackshapes(buffer: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Decodes geometries encoded by `_packshapes()`.
+    """
+    buffer = buffer.tobytes()
+    return shapely.from_wkb(
+        [buffer[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+    )
+
+
+def _writeshapes(path: str, shapes: np.ndarray):
+    """
+    Writes geometries to disk, encoded by `_packshapes()`.
+    """
+    buffer, offsets = _packshapes(shapes)
+    np.savez(path, wkb=buffer, offsets=offsets)
+
+
+def _readshapes(path: str) -> np.ndarray:
+    """
+    Reads geometries written by `_writeshapes()`.
+    """
+    with np.load(path) as stored:
+        return _unpackshapes(stored["wkb"], stored["offsets"])
+
+
+# Recently simplified geometries, keyed by the fingerprint of the layer they were
+# simplified from and the tolerance, so simplifying the same layer again (e.g.
+# once for every plan scored) doesn't repeat the work.
+_SIMPLIFIED = OrderedDict()
+_MAXSIMPLIFIED = 8
+
+
+def simplify(
+    geometries: GeoDataFrame, tolerance: float, cache: str = None
+) -> GeoDataFrame:
+    """
+    Simplifies the geometries of a layer of units (e.g. blocks, VTDs, or
+    districts) while preserving its topology: boundaries shared by two units are
+    simplified once, so neighboring units still meet without gaps or overlaps.
+    This makes statewide maps much cheaper to draw, and geometric scores cheaper
+    to approximate.
+
+    Args:
+        geometries (GeoDataFrame): Units to simplify.
+        tolerance (float): Simplification tolerance, in the units of the CRS of
+            `geometries` (e.g. meters for a projected CRS). Larger tolerances give
+            coarser geometries.
+        cache (str, optional): Directory in which simplified geometries are
+            cached. Simplified geometries are keyed by a hash of the contents of
+            `geometries`, the tolerance, and the version of the algorithm, so
+            simplifying the same layer again reads them from disk. The most
+            recently simplified layers are also kept in memory, whether or not
+            `cache` is provided.
+
+    Returns:
+        A copy of `geometries` with simplified geometries.
+    """
+    fingerprint = _fingerprint(geometries)
+    key = (fingerprint, tolerance)
+    simplified = _SIMPLIFIED.get(key)
+
+    if simplified is not None:
+        _SIMPLIFIED.move_to_end(key)
+    else:
+        path = None
+        if cache is not None:
+            os.makedirs(cache, exist_ok=True)
+            path = _cachepath(cache, fingerprint, tolerance)
+
+        if path is not None and os.path.exists(path):
+            simplified = _readshapes(path)
+        else:
+            shapes = np.asarray(geometries.geometry.values, dtype=object)
+            simplified = _simplifyshapes(shapes, tolerance)
+
+            if path is not None:
+                _writeshapes(path, simplified)
+
+        _SIMPLIFIED[key] = simplified
+        while len(_SIMPLIFIED) > _MAXSIMPLIFIED:
+            _SIMPLIFIED.popitem(last=False)
+
+    simplified = GeoSeries(
+        simplified.copy(), index=geometries.index, crs=geometries.crs
+    )
+
+    if isinstance(geometries, GeoSeries):
+        return simplified
+
+    geometries = geometries.copy()
+    geometries[geometries.geometry.name] = simplified
+
+    return geometries
+
+
+def levelsofdetail(
+    geometries: GeoDataFrame, tolerances: Iterable[float], cache: str = None
+) -> Dict[float, GeoDataFrame]:
+    """
+    Produces several levels of detail for a layer of units by simplifying it
+    (with `simplify()`) at each of the provided tolerances.
+
+    Args:
+        geometries (GeoDataFrame): Units to simplify.
+        tolerances (Iterable[float]): Simplification tolerances, in the units of
+            the CRS of `geometries`.
+        cache (str, optional): Directory in which simplified geometries are
+            cached; see `simplify()`.
+
+    Returns:
+        A dictionary mapping each tolerance to the simplified units.
+    """
+    return {
+        tolerance: simplify(geometries, tolerance, cache=cache)
+        for tolerance in tolerances
+    }
@@ -0,0 +1,197 @@
+import hashlib
+import weakref
+from collections import OrderedDict
+from typing import Callable, Union
+
+import numpy as np
+import shapely
+from geopandas import GeoDataFrame, GeoSeries
+from shapely.strtree import STRtree
+
+# Rough per-geometry memory costs, in bytes, used to enforce memory limits.
+_TREEBYTES = 64
+_POINTBYTES = 128
+
+
+class SpatialIndexRegistry:
+    """
+    Caches spatial indexes (STRtrees) and representative points for geometric
+    data, so repeated operations over the same layer (e.g. mapping many plans
+    onto the same blocks) don't rebuild them. Entries are keyed by a fingerprint
+    of the geometries themselves and their CRS, so equivalent copies of a
+    GeoDataFrame (e.g. reprojected to the same CRS again) share entries.
+    Fingerprints are computed once per geometry array and remembered for as long
+    as the array exists, so a cache hit doesn't re-read the geometries; layers
+    modified in place after being indexed should be passed to `invalidate()`.
+    Least-recently-used entries are evicted when the registry holds more than
+    `maxentries` entries or more than `maxbytes` (estimated) bytes.
+    """
+
+    def __init__(self, maxentries: int = 32, maxbytes: int = 2**30):
+        """
+        Args:
+            maxentries (int, optional): Maximum number of cached entries. Defaults
+                to `32`.
+            maxbytes (int, optional): Maximum estimated size of cached entries,
+                in bytes. Entries larger than this aren't cached. Defaults to 1GB.
+        """
+        self.maxentries = maxentries
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def fingerprint(geometries: Union[GeoDataFrame, GeoSeries]) -> str:
+        """
+        Computes a fingerprint identifying a set of geometries.
+
+        Args:
+            geometries (GeoDataFrame): Geometries to fingerprint.
+
+        Returns:
+            A hexadecimal digest of the geometries' WKB and CRS.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(geometries.crs).encode())
+
+        # WKB is self-delimiting, so the concatenated WKB identifies the
+        # geometries exactly; missing geometries get a marker of their own.
+        for wkb in shapely.to_wkb(_shapes(geometries)):
+            digest.update(b"\x00" if wkb is None else wkb)
+
+        return digest.hexdigest()
+
+    def tree(self, geometries: Union[GeoDataFrame, GeoSeries]) -> STRtree:
+        """
+        Gets an STRtree over the provided geometries, building it if it isn't
+        cached. Query results are positions in `geometries`.
+
+        Args:
+            geometries (GeoDataFrame): Geometries to index.
+
+        Returns:
+            A `shapely.strtree.STRtree`.
+        """
+        return self._get(geometries, "tree", STRtree, _TREEBYTES)
+
+    def points(self, geometries: Union[GeoDataFrame, GeoSeries]) -> np.ndarray:
+        """
+        Gets representative points for the provided geometries (points
+        guaranteed to be within each geometry), computing them if they aren't
+        cached.
+
+        Args:
+            geometries (GeoDataFrame): Geometries to get points for.
+
+        Returns:
+            An array of `shapely.Point`s, one for each geometry.
+        """
+        return self._get(geometries, "points", shapely.point_on_surface, _POINTBYTES)
+
+    def _get(
+        self,
+        geometries: Union[GeoDataFrame, GeoSeries],
+        kind: str,
+        build: Callable,
+        size: int,
+    ):
+        key = (_fingerprint(geometries), kind)
+
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+        self.misses += 1
+        shapes = _shapes(geometries)
+        value = build(shapes)
+        nbytes = size * len(shapes)
+
+        if nbytes <= self.maxbytes:
+            self._entries[key] = (value, nbytes)
+            self._evict()
+
+        return value
+
+    def _evict(self):
+        """
+        Evicts least-recently-used entries until the registry is within its
+        limits.
+        """
+        while len(self._entries) > self.maxentries or self.nbytes > self.maxbytes:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, geometries: Union[GeoDataFrame, GeoSeries] = None):
+        """
+        Removes cached entries for the provided geometries, or all entries if no
+        geometries are provided.
+
+        Args:
+            geometries (GeoDataFrame, optional): Geometries whose entries are
+                removed.
+        """
+        if geometries is None:
+            self._entries.clear()
+            return
+
+        # Entries are found by the fingerprint they were stored under, which may
+        # predate changes made to the geometries in place.
+        fingerprint = _fingerprint(geometries)
+        _FINGERPRINTS.pop(id(geometries.geometry.values), None)
+        for key in [key for key in self._entries if key[0] == fingerprint]:
+            del self._entries[key]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Estimated size of the cached entries, in bytes.
+        """
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Fingerprints of geometry arrays, keyed by the arrays' ids. Each entry holds a
+# weak reference to its array, and is removed when the array is.
+_FINGERPRINTS = {}
+
+
+def _fingerprint(geometries: Union[GeoDataFrame, GeoSeries]) -> str:
+    """
+    Gets the fingerprint of a set of geometries (see
+    `SpatialIndexRegistry.fingerprint()`), computing it only if the geometries'
+    array hasn't been fingerprinted before. The array's length and CRS are
+    checked in case it was modified in place.
+    """
+    array = geometries.geometry.values
+    key = id(array)
+    remembered = _FINGERPRINTS.get(key)
+
+    if remembered is not None:
+        ref, length, crs, fingerprint = remembered
+        if ref() is array and length == len(array) and crs == array.crs:
+            return fingerprint
+
+    fingerprint = SpatialIndexRegistry.fingerprint(geometries)
+
+    def forget(ref, key=key):
+        if _FINGERPRINTS.get(key, (None,))[0] is ref:
+            del _FINGERPRINTS[key]
+
+    ref = weakref.ref(array, forget)
+    _FINGERPRINTS[key] = (ref, len(array), array.crs, fingerprint)
+
+    return fingerprint
+
+
+def _shapes(geometries: Union[GeoDataFrame, GeoSeries]) -> np.ndarray:
+    """
+    Gets the geometries of a GeoDataFrame or GeoSeries as an array.
+    """
+    return np.asarray(geometries.geometry.values, dtype=object)
+
+
+spatialindexes = SpatialIndexRegistry()
+"""The registry used by `gerrytools` functions which opt into caching."""
@@ -1,13 +1,204 @@
 import warnings
-from typing import Dict, List, TypeVar
+from typing import Dict, List, Tuple, TypeVar, Union
 
 import maup
+import numpy as np
+import pandas as pd
+import shapely
+
+from .spatialindex import spatialindexes
 
 A = TypeVar("A")
 B = TypeVar("B")
 
 
-def unitmap(source, target) -> dict:
+class UnitMap:
+    """
+    Compact, array-backed mapping from source units to target units. Rather than
+    storing one dictionary entry per source unit, a `UnitMap` stores the source
+    and target unique identifiers once and an integer array `codes`, where
+    `codes[i]` is the index (into `target`) of the target unit to which the
+    `i`th source unit is assigned, or `-1` if the source unit is unassigned.
+
+    The inverse mapping (target units to lists of source units) is stored in
+    compressed sparse row (CSR) form and is built lazily the first time it's
+    requested, so inverting a map is a single sort rather than a Python loop.
+    """
+
+    def __init__(self, source, target, codes):
+        """
+        Args:
+            source (array-like): Unique identifiers of the source units.
+            target (array-like): Unique identifiers of the target units.
+            codes (array-like): Integer array of the same length as `source`;
+                the `i`th entry is the index of the `i`th source unit's target
+                unit in `target`, or `-1` if the source unit is unassigned.
+        """
+        self.source = np.asarray(source)
+        self.target = np.asarray(target)
+        self.codes = np.asarray(codes, dtype=np.int64)
+
+        if len(self.codes) != len(self.source):
+            raise ValueError(
+                f"Expected {len(self.source)} codes (one per source unit); "
+                f"got {len(self.codes)}."
+            )
+
+        if len(self.codes) and self.codes.max(initial=-1) >= len(self.target):
+            raise ValueError("Codes must index into the array of target units.")
+
+        self._inverse = None
+        self._sourceindex = None
+
+    @classmethod
+    def from_dict(cls, unitmap: Dict[A, B]) -> "UnitMap":
+        """
+        Creates a `UnitMap` from a dictionary like the ones produced by `unitmap()`.
+
+        Args:
+            unitmap (dict): Dictionary taking source unique identifiers to target
+                unique identifiers.
+
+        Returns:
+            A `UnitMap` equivalent to `unitmap`.
+        """
+        source = np.asarray(list(unitmap.keys()))
+        codes, target = pd.factorize(pd.Series(list(unitmap.values())), sort=True)
+
+        return cls(source, np.asarray(target), codes)
+
+    @classmethod
+    def load(cls, path: str) -> "UnitMap":
+        """
+        Loads a `UnitMap` written by `UnitMap.save()`.
+
+        Args:
+            path (str): Path to the `.npz` file.
+
+        Returns:
+            The stored `UnitMap`.
+        """
+        with np.load(path, allow_pickle=False) as stored:
+            return cls(stored["source"], stored["target"], stored["codes"])
+
+    def save(self, path: str):
+        """
+        Saves the `UnitMap` to an uncompressed `.npz` file. Object-typed unique
+        identifiers (e.g. `GEOID20` strings read from a shapefile) are stored
+        as strings, so no pickling is required to load them.
+
+        Args:
+            path (str): Path to the `.npz` file.
+        """
+        source, target = (
+            labels.astype(str) if labels.dtype == object else labels
+            for labels in (self.source, self.target)
+        )
+        np.savez(path, source=source, target=target, codes=self.codes)
+
+    @property
+    def inverse(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The inverse mapping in CSR form: a pair `(indptr, indices)` such that
+        the indices of the source units assigned to the `j`th target unit are
+        `indices[indptr[j]:indptr[j+1]]`.
+        """
+        if self._inverse is None:
+            assigned = np.flatnonzero(self.codes >= 0)
+            order = assigned[np.argsort(self.codes[assigned], kind="stable")]
+            counts = np.bincount(self.codes[assigned], minlength=len(self.target))
+            indptr = np.concatenate(([0], np.cumsum(counts)))
+            self._inverse = (indptr, order)
+
+        return self._inverse
+
+    def members(self, target: B) -> np.ndarray:
+        """
+        Retrieves the source units assigned to the provided target unit.
+
+        Args:
+            target: Unique identifier of a target unit.
+
+        Returns:
+            An array of the source unique identifiers assigned to `target`.
+        """
+        j = pd.Index(self.target).get_loc(target)
+        indptr, indices = self.inverse
+
+        return self.source[indices[indptr[j] : indptr[j + 1]]]
+
+    def invert(self) -> Dict[B, List[A]]:
+        """
+        Inverts the mapping, for compatibility with `invert()`.
+
+        Returns:
+            A dictionary mapping target unique identifiers to _lists_ of source
+            unique identifiers. Target units with no source units are omitted.
+        """
+        indptr, indices = self.inverse
+        members = self.source[indices].tolist()
+
+        return {
+            t: members[indptr[j] : indptr[j + 1]]
+            for j, t in enumerate(self.target.tolist())
+            if indptr[j + 1] > indptr[j]
+        }
+
+    def compose(self, other: "UnitMap") -> "UnitMap":
+        """
+        Composes this mapping with another: if this `UnitMap` takes blocks to
+        VTDs and `other` takes VTDs to districts, the result takes blocks to
+        districts.
+
+        Args:
+            other (UnitMap): Mapping whose source units are this mapping's target
+                units.
+
+        Returns:
+            A `UnitMap` from this mapping's source units to `other`'s target
+            units. Source units whose targets are unassigned (or absent) in
+            `other` are unassigned in the result.
+        """
+        lookup = pd.Index(other.source).get_indexer(self.target)
+        lookup = np.where(lookup >= 0, other.codes[lookup], -1)
+        codes = np.where(self.codes >= 0, lookup[self.codes], -1)
+
+        return UnitMap(self.source, other.target, codes)
+
+    def to_dict(self) -> Dict[A, B]:
+        """
+        Converts the mapping to a dictionary, for compatibility with
+        `gerrytools.data.remap()` and other dictionary-consuming functions.
+
+        Returns:
+            A dictionary mapping source unique identifiers to target unique
+            identifiers. Unassigned source units are omitted.
+        """
+        assigned = self.codes >= 0
+
+        return dict(
+            zip(
+                self.source[assigned].tolist(),
+                self.target[self.codes[assigned]].tolist(),
+            )
+        )
+
+    def __len__(self) -> int:
+        return len(self.source)
+
+    def __getitem__(self, source: A) -> B:
+        if self._sourceindex is None:
+            self._sourceindex = pd.Index(self.source)
+
+        code = self.codes[self._sourceindex.get_loc(source)]
+
+        if code < 0:
+            raise KeyError(source)
+
+        return self.target[code].item()
+
+
+def unitmap(source, target, compact: bool = False) -> Union[dict, UnitMap]:
     """
     Creates a mapping from source units to target units.
 
@@ -18,9 +209,12 @@ def unitmap(source, target) -> dict:
         target (tuple): 2-tuple containing a `GeoDataFrame` and an index name corresponding
             to the unique identifiers of the units, e.g. `(districts, "DISTRICTN")`.
             Unique identifiers will be values in the resulting dictionary.
+        compact (bool, optional): If `True`, returns an array-backed `UnitMap`
+            rather than a dictionary. Defaults to `False`.
 
     Returns:
-        A dictionary mapping `_from` unique identifiers to `_to` unique identifiers.
+        A dictionary (or `UnitMap`) mapping `_from` unique identifiers to `_to`
+        unique identifiers.
     """
     # Explode each of the tuples.
     source_shapes, source_index = source
@@ -34,39 +228,68 @@ def unitmap(source, target) -> dict:
     # Ensure we're in the same CRS.
     target_shapes = target_shapes.to_crs(source_shapes.crs)
 
-    # Set a progress bar; filter out all warnings; create the mapping.
-    maup.progress.enabled = True
-    warnings.simplefilter("ignore", UserWarning)
-    warnings.simplefilter("ignore", FutureWarning)
-    mapping = maup.assign(source_shapes, target_shapes)
+    # Find the target containing each source unit's representative point. If
+    # that target covers the whole source unit, the source unit is assigned to
+    # it. Spatial indexes and points are cached, since the same layers are
+    # often mapped repeatedly.
+    sourcegeometries = np.asarray(source_shapes.geometry.values, dtype=object)
+    targetgeometries = np.asarray(target_shapes.geometry.values, dtype=object)
+    points = spatialindexes.points(source_shapes)
+    tree = spatialindexes.tree(target_shapes)
+
+    sources, targets = tree.query(points, predicate="within")
+    covered = shapely.covers(targetgeometries[targets], sourcegeometries[sources])
+    sources, first = np.unique(sources[covered], return_index=True)
 
-    # Reset the mapping's index, zip, and return.
-    mapping = mapping.reset_index()
-    l, r = "l", "r"
-    mapping.columns = [l, r]
+    codes = np.full(len(source_shapes), -1)
+    codes[sources] = targets[covered][first]
 
-    return dict(zip(mapping[l], mapping[r]))
+    # Assign the remaining source units with maup. Set a progress bar and filter
+    # out all warnings.
+    remainder = np.flatnonzero(codes < 0)
 
+    if len(remainder):
+        maup.progress.enabled = True
+        warnings.simplefilter("ignore", UserWarning)
+        warnings.simplefilter("ignore", FutureWarning)
+        remaining = source_shapes.iloc[remainder]
+        assigned = maup.assign(remaining, target_shapes).reindex(remaining.index)
+        codes[remainder] = target_shapes.index.get_indexer(assigned)
 
-def invert(unitmap: Dict[A, B]) -> Dict[B, List[A]]:
+    # If we want a compact mapping, we're done; unassigned units get -1.
+    targets = target_shapes.index.to_numpy()
+
+    if compact:
+        return UnitMap(source_shapes.index.to_numpy(), targets, codes)
+
+    # Otherwise, zip and return; unassigned units are mapped to NaN.
+    targets = targets.tolist()
+
+    return {
+        s: targets[c] if c >= 0 else np.nan
+        for s, c in zip(source_shapes.index.tolist(), codes.tolist())
+    }
+
+
+def invert(unitmap: Union[Dict[A, B], UnitMap]) -> Dict[B, List[A]]:
     """
     Inverts the provided unit mapping.
 
     Args:
-        unitmap: Dictionary taking source unique identifiers to target unique
-            identifiers.
+        unitmap: Dictionary (or `UnitMap`) taking source unique identifiers to
+            target unique identifiers.
 
     Returns:
         A dictionary mapping target unique identifiers to _lists_ of source
         unique identifiers.
     """
+    if isinstance(unitmap, UnitMap):
+        return unitmap.invert()
+
     # Invert the dictionary.
     inverse: Dict[B, List[A]] = {}
 
     for s, t in unitmap.items():
-        if inverse.get(t, None):
-            inverse[t].append(s)
-        else:
-            inverse[t] = [s]
+        inverse.setdefault(t, []).append(s)
 
     return inverse
@@ -1,35 +1,147 @@
+from typing import Callable, Dict
+
 import geopandas as gpd
 import gerrychain
+import numpy as np
+from scipy.optimize import linear_sum_assignment as lsa
+
+from .optimize import _dispersionoverlaps
+
+
+class DispersionOverlap:
+    """
+    An updater for keeping track of the population shared by each pair of
+    proposed and enacted districts. The enacted district and population of each
+    unit are read once; afterwards, the overlap matrix is updated from each
+    partition's flips rather than recomputed. Assumes that district labels are
+    1-indexed integers, and that `units` is indexed by the graph's node labels.
+
+    :ivar alias: The key corresponding to this updater in the Partition's
+        updaters dictionary.
+    """
+
+    __slots__ = ["positions", "enacted", "population", "alias"]
+
+    def __init__(
+        self,
+        units: gpd.GeoDataFrame,
+        enacted_col: str,
+        pop_col: str,
+        alias: str = "dispersion_overlap",
+    ):
+        """
+        Args:
+            units: The units to optimize on. E.g. Census blocks.
+            enacted_col: The column in the GeoDataFrame with the enacted districts.
+            pop_col: The column in the GeoDataFrame with population counts.
+            alias: The key corresponding to this updater in the Partition's
+                updaters dictionary.
+        """
+        self.positions = {node: i for i, node in enumerate(units.index)}
+        self.enacted = units[enacted_col].astype(int).to_numpy()
+        self.population = units[pop_col].to_numpy(dtype=float)
+        self.alias = alias
+
+    def __call__(self, partition: gerrychain.Partition) -> np.ndarray:
+        if partition.parent is None or not partition.flips:
+            return self._initialize(partition)
+        return self._update(partition)
+
+    def _initialize(self, partition: gerrychain.Partition) -> np.ndarray:
+        """
+        Computes the overlap matrix from scratch.
+        """
+        proposed = np.array([partition.assignment[node] for node in self.positions])
+        n = max(len(partition.parts), self.enacted.max())
+
+        return _dispersionoverlaps(proposed, self.enacted, self.population, n)
+
+    def _update(self, partition: gerrychain.Partition) -> np.ndarray:
+        """
+        Updates the parent partition's overlap matrix with the units that moved.
+        """
+        overlaps = partition.parent[self.alias].copy()
+
+        nodes = list(partition.flips)
+        positions = np.array([self.positions[node] for node in nodes])
+        before = np.array([partition.parent.assignment[node] for node in nodes]) - 1
+        after = np.array([partition.flips[node] for node in nodes]) - 1
+        enacted = self.enacted[positions] - 1
+        population = self.population[positions]
+
+        np.subtract.at(overlaps, (before, enacted), population)
+        np.add.at(overlaps, (after, enacted), population)
+
+        return overlaps
 
-from .optimize import calculate_dispersion, minimize_dispersion
+
+def _mindispersion(overlaps: np.ndarray) -> float:
+    """
+    Computes the least possible core dispersion over all relabelings of the
+    proposed districts, given the proposed-by-enacted overlap matrix.
+    """
+    rows, columns = lsa(overlaps, maximize=True)
+    return overlaps.sum() - overlaps[rows, columns].sum()
+
+
+def dispersion_updaters(
+    units: gpd.GeoDataFrame,
+    enacted_col: str,
+    pop_col: str,
+    alias: str = "dispersion",
+) -> Dict[str, Callable]:
+    """
+    Updaters to calculate the best possible dispersion for a `gerrychain.Partition`
+    object as a chain runs. The proposed-by-enacted overlap matrix is kept up to
+    date from each step's flips, and only the assignment problem is re-solved.
+    `units` isn't modified.
+
+    Args:
+        units: The units to optimize on. E.g. Census blocks. Must be indexed by
+            the graph's node labels.
+        enacted_col: The column in the GeoDataFrame with the enacted districts.
+        pop_col: The column in the GeoDataFrame with population counts.
+        alias: Name of the dispersion updater; the overlap matrix is stored under
+            `f"{alias}_overlap"`.
+
+    Returns:
+        A dictionary of updaters to add to a Partition's updaters, e.g. with
+        `updaters={**other_updaters, **dispersion_updaters(...)}`.
+    """
+    overlap = DispersionOverlap(units, enacted_col, pop_col, alias=f"{alias}_overlap")
+    dtype = int if units[pop_col].dtype.kind in "iu" else float
+
+    def dispersion(partition: gerrychain.Partition):
+        return dtype(_mindispersion(partition[overlap.alias]))
+
+    return {overlap.alias: overlap, alias: dispersion}
 
 
 def dispersion_updater_closure(
-    units: gpd.GeoDataFrame, enacted_col: str, pop_col: str, verbose: bool = False
+    units: gpd.GeoDataFrame,
+    enacted_col: str,
+    pop_col: str,
+    verbose: bool = False,
 ):
     """
     An updater to calculate best possible dispersion for a `gerrychain.Partition` object.
+    `units` isn't modified. To keep track of dispersion over a chain run, prefer
+    `dispersion_updaters()`, which avoids recomputing the overlap matrix at each
+    step.
 
     Args:
         units: The units to optimize on. E.g. Census blocks.
         enacted_col: The column in the GeoDataFrame with the enacted districts.
-        proposed_col: The column in the GeoDataFrame with the proposed districts.
-        extra_constraints: Optional; A function that can add extra constraints
-            to the model, such as parity (in the case of WI).
-        verbose: If true, do not suppress solver output. Otherwise, stay quiet.
+        pop_col: The column in the GeoDataFrame with population counts.
+        verbose: Retained for compatibility; there's no solver output.
 
     Returns:
         An updater that calculates the minimal core dispersion of a Partition object.
     """
+    overlap = DispersionOverlap(units, enacted_col, pop_col)
+    dtype = int if units[pop_col].dtype.kind in "iu" else float
 
     def updater(partition: gerrychain.Partition):
-        units["partition"] = partition.assignment.to_series()
-
-        relabeling = minimize_dispersion(
-            units, enacted_col, "partition", pop_col, verbose=verbose
-        )
-        units["partition"] = units["partition"].apply(lambda x: relabeling[x])
-
-        return calculate_dispersion(units, enacted_col, "partition", pop_col)
+        return dtype(_mindispersion(overlap._initialize(partition)))
 
     return updater
@@ -2,6 +2,7 @@ from .run_container import RunContainer, RunnerConfig
 from .runners.recom import RecomRunnerConfig, RecomRunInfo
 from .runners.forest import ForestRunnerConfig, ForestRunInfo
 from .runners.smc import SMCRunnerConfig, SMCMapInfo, SMCRedistInfo
+from .launcher import RunLauncher, RunResult
 import warnings
 
 # There is a bug in the docker SDK package that causes this error to be thrown
@@ -18,4 +19,6 @@ __all__ = [
     "SMCMapInfo",
     "SMCRedistInfo",
     "RunContainer",
+    "RunLauncher",
+    "RunResult",
 ]
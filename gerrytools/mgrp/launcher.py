@@ -0,0 +1,354 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from ..ben.backends import Backend
+from ..ben.framing import LineFramer
+from .run_container import RunContainer, RunnerConfig
+
+
+@dataclass
+class RunResult:
+    """
+    The status and results of one of the runs launched by a :class:`RunLauncher`.
+    Results are updated while their runs progress, so they can be inspected from
+    progress callbacks or other threads.
+    """
+
+    index: int
+    """The position of the run in the list of runs."""
+    args: tuple = ()
+    """The positional arguments for the runner's ``run_command`` method (e.g.
+        ``(run_info,)``)."""
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    """The keyword arguments for the runner's ``run_command`` method."""
+    threads: int = 1
+    """The number of cores reserved for the run."""
+    status: str = "pending"
+    """One of "pending", "running", "succeeded", or "failed"."""
+    container: Optional[str] = None
+    """The name of the container the run ran in, if it ran in one."""
+    log_file: Optional[str] = None
+    """The path to the file holding the run's stderr."""
+    exit_code: Optional[int] = None
+    """The exit code of the run's command."""
+    error: Optional[BaseException] = None
+    """The exception that stopped the run, if there was one."""
+    output: Optional[bytes] = None
+    """The run's stdout, if it was captured."""
+    started: Optional[float] = None
+    """When the run started, as a UNIX timestamp."""
+    finished: Optional[float] = None
+    """When the run finished, as a UNIX timestamp."""
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        """The number of seconds the run has been running (or ran) for."""
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def ok(self) -> bool:
+        """Whether the run succeeded."""
+        return self.status == "succeeded"
+
+
+class _Cores:
+    """
+    Counts the cores which aren't reserved by running runs.
+    """
+
+    def __init__(self, total: int):
+        self.free = total
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def reserve(self, count: int):
+        with self.condition:
+            self.condition.wait_for(lambda: self.free >= count)
+            self.free -= count
+
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.free += count
+                self.condition.notify_all()
+
+
+def _print_status(result: RunResult, line: Optional[str]):
+    """
+    The default progress callback, which prints the runs' status changes.
+    """
+    if line is not None:
+        return
+
+    where = f" in {result.container}" if result.container else ""
+    if result.status == "running":
+        print(f"Run {result.index} started{where}")
+    elif result.error is not None:
+        print(f"Run {result.index} failed: {result.error}")
+    else:
+        print(
+            f"Run {result.index} {result.status} with exit code {result.exit_code} "
+            f"after {result.elapsed:.1f}s (log: {result.log_file})"
+        )
+
+
+class RunLauncher:
+    """
+    Launches many runs of a runner (e.g. the same chain with different seeds),
+    spread over a bounded number of containers. Each container is started once
+    and runs its share of the runs one after another. Runs reserve ``n_threads``
+    cores (or one, for runners without threads) and wait until enough of the
+    host's cores are free, so multithreaded runs don't oversubscribe the host.
+
+    Runs never stop each other: a run which fails (or raises) is marked as failed,
+    and the rest carry on.
+
+    Example:
+        .. code-block:: python
+
+            recom_config = RecomRunnerConfig(json_file_path="./50x50.json")
+            runs = [
+                RecomRunInfo(
+                    pop_col="TOTPOP",
+                    assignment_col="district",
+                    variant="A",
+                    n_steps=1000,
+                    n_threads=2,
+                    rng_seed=seed,
+                )
+                for seed in range(16)
+            ]
+
+            results = RunLauncher(recom_config, max_containers=4).run(runs)
+            failed = [result for result in results if not result.ok]
+
+    Args:
+        configuration (RunnerConfig): The runner to run.
+        max_containers (int, optional): The largest number of containers to run at
+            once, which is also the largest number of runs running at once. Defaults
+            to the number of cores.
+        cores (int, optional): The number of cores the runs may use at once.
+            Defaults to the number of cores on the host.
+        docker_image_name (str, optional): The Docker image to run the runs in.
+            Defaults to "mgggdev/replicate:v0.2".
+        docker_client_args (dict, optional): Additional arguments to pass to the
+            Docker client. Defaults to None.
+        backend (str or Backend, optional): Where to run the runs; see
+            :class:`RunContainer`. Defaults to None.
+        pull (bool, optional): Whether to pull the Docker image even if it's
+            available locally. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        configuration: RunnerConfig,
+        max_containers: Optional[int] = None,
+        cores: Optional[int] = None,
+        docker_image_name: str = "mgggdev/replicate:v0.2",
+        docker_client_args: Optional[dict] = None,
+        backend: Union[str, Backend, None] = None,
+        pull: bool = False,
+    ):
+        self.config = configuration
+        self.cores = cores or os.cpu_count() or 1
+        self.max_containers = max_containers or self.cores
+        self.image_name = docker_image_name
+        self.docker_client_args = docker_client_args
+        self.backend = backend
+        self.pull = pull
+
+        # Containers are named after the runner, with a suffix unique to each run
+        # of the launcher.
+        self.name = self.config.configure_vols_and_name().get("name", "runner")
+
+    def run(
+        self,
+        runs: Iterable[Any],
+        progress: Optional[Callable[[RunResult, Optional[str]], None]] = None,
+        capture_output: bool = False,
+    ) -> List[RunResult]:
+        """
+        Runs the runs and waits for them to finish.
+
+        Args:
+            runs (Iterable): The runs. Each is the argument for the runner's
+                ``run_command`` method (like a ``RecomRunInfo``), a tuple of
+                positional arguments, or a dictionary of keyword arguments (like
+                ``{"map_info": map_info, "redist_info": redist_info}`` for SMC).
+            progress (Callable, optional): Called with a run's result and each line
+                the run writes to its log (its stderr) as it's written, and with
+                the result and None when the run's status changes. Called from the
+                launcher's threads. Defaults to None, which prints status changes.
+            capture_output (bool, optional): Whether to keep each run's stdout in
+                its result rather than printing it. Defaults to False.
+
+        Returns:
+            List[RunResult]: The results, in the same order as the runs.
+        """
+        results = []
+        for index, run in enumerate(runs):
+            if isinstance(run, dict):
+                args, kwargs = (), run
+            elif isinstance(run, tuple):
+                args, kwargs = run, {}
+            else:
+                args, kwargs = (run,), {}
+
+            results.append(
+                RunResult(index, args, kwargs, threads=self._threads(args, kwargs))
+            )
+
+        pending = queue.Queue()
+        for result in results:
+            pending.put(result)
+
+        cores = _Cores(self.cores)
+        progress = progress or _print_status
+        launch = uuid.uuid4().hex[:8]
+
+        workers = [
+            threading.Thread(
+                target=self._work,
+                args=(f"{self.name}_{launch}_{number}", pending, cores, progress),
+                kwargs={"capture_output": capture_output},
+                daemon=True,
+            )
+            for number in range(min(self.max_containers, len(results)))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        return results
+
+    def _threads(self, args: tuple, kwargs: dict) -> int:
+        """
+        Finds the number of cores a run needs from its ``n_threads`` setting.
+        """
+        threads = [
+            getattr(arg, "n_threads", None)
+            for arg in list(args) + list(kwargs.values())
+        ]
+        threads = max((count for count in threads if count), default=1)
+
+        return max(1, min(int(threads), self.cores))
+
+    def _work(
+        self,
+        name: str,
+        pending: queue.Queue,
+        cores: _Cores,
+        progress: Callable,
+        capture_output: bool = False,
+    ):
+        """
+        Runs pending runs, one after another, in a container of its own.
+        """
+        result = self._next(pending)
+        if result is None:
+            return
+
+        try:
+            container = RunContainer(
+                self.config,
+                self.image_name,
+                self.docker_client_args,
+                backend=self.backend,
+                pull=self.pull,
+                name=name,
+            )
+        except Exception as error:
+            # Without a container, none of this worker's runs can run.
+            while result is not None:
+                self._finish(result, progress, error=error)
+                result = self._next(pending)
+            return
+
+        with container:
+            while result is not None:
+                with cores.reserve(result.threads):
+                    self._launch(container, result, progress, capture_output)
+                result = self._next(pending)
+
+    @staticmethod
+    def _next(pending: queue.Queue) -> Optional[RunResult]:
+        try:
+            return pending.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _launch(
+        self,
+        container: RunContainer,
+        result: RunResult,
+        progress: Callable,
+        capture_output: bool,
+    ):
+        """
+        Runs one run in a container, updating its result as it goes.
+        """
+        result.status = "running"
+        result.started = time.time()
+        if container.container is not None:
+            result.container = container.container.name
+
+        try:
+            progress(result, None)
+            if container.backend is None:
+                raise RuntimeError(f"The container {container.name} didn't start.")
+
+            cmd = self.config.run_command(*result.args, **result.kwargs)
+            result.log_file = self.config.log_file(*result.args, **result.kwargs)
+
+            output = bytearray() if capture_output else None
+            framer = LineFramer()
+            output_generator = container._logged(cmd, result.log_file)
+            while True:
+                try:
+                    stdout, stderr = next(output_generator)
+                except StopIteration as stop:
+                    result.exit_code = stop.value
+                    break
+
+                if stdout is not None:
+                    if output is not None:
+                        output += stdout
+                    else:
+                        print(stdout.decode("utf-8"), end="")
+                if stderr is not None:
+                    for line in framer.feed(stderr):
+                        progress(result, line.decode("utf-8", "replace"))
+
+            last = framer.flush()
+            if last is not None:
+                progress(result, last.decode("utf-8", "replace"))
+            if output is not None:
+                result.output = bytes(output)
+        except Exception as error:
+            self._finish(result, progress, error=error)
+            return
+
+        self._finish(result, progress)
+
+    @staticmethod
+    def _finish(
+        result: RunResult, progress: Callable, error: Optional[BaseException] = None
+    ):
+        result.error = error
+        result.finished = time.time()
+        if result.started is None:
+            result.started = result.finished
+
+        ok = error is None and result.exit_code == 0
+        result.status = "succeeded" if ok else "failed"
+        progress(result, None)
@@ -1,11 +1,15 @@
-import docker
 import traceback
 from abc import ABC, abstractmethod
-from typing import Union, Optional, Type
+from typing import Generator, Tuple, Union, Optional, Type
 from types import TracebackType
 import json
+import numpy as np
 from gerrychain import Graph, Partition
 import os
+from ..ben.backends import Backend, LocalBackend, backend_name
+from ..ben.docker_manager import PooledContainer, resolve_image
+from ..ben.framing import LineFramer, parse_assignment_line
+from ..geometry.binarygraph import loadgraph
 
 
 class RunnerConfig(ABC):
@@ -14,6 +18,11 @@ class RunnerConfig(ABC):
     variant must implement to be used with the RunContainer
     """
 
+    local_tools: Tuple[str, ...] = ()
+    """Executables which, when they're all on the ``PATH``, let the runner run
+    without Docker. Runners whose commands need files from the Docker image leave
+    this empty."""
+
     @abstractmethod
     def configure_vols_and_name(self):
         """
@@ -56,6 +65,9 @@ class RunContainer:
         configuration: RunnerConfig,
         docker_image_name="mgggdev/replicate:v0.2",
         docker_client_args: dict = None,
+        backend: Union[str, Backend, None] = None,
+        pull: bool = False,
+        name: Optional[str] = None,
     ):
         """
         Sets up the replicator class
@@ -64,6 +76,20 @@ class RunContainer:
             variant (RunnerConfig): Type of runner with setup to use
             docker_image_name (str, optional): Override for the docker image to
                 use when building the Docker container. Defaults to None.
+            docker_client_args (dict, optional): Additional arguments to pass to the
+                Docker client. Defaults to None.
+            backend (str or Backend, optional): Where to run the runner's commands:
+                ``"docker"``, ``"local"`` (for runners whose tools are installed,
+                like ``frcw``), ``"auto"``, or a ``Backend`` such as
+                ``gerrytools.ben.FakeBackend``. Defaults to None, which runs locally
+                if the runner's ``local_tools`` are all on the ``PATH`` and in a
+                Docker container otherwise.
+            pull (bool, optional): Whether to pull the Docker image even if it's
+                available locally. Defaults to False, which only pulls images that
+                aren't.
+            name (str, optional): The name of the Docker container, which has to be
+                unique among running containers. Defaults to None, which uses the
+                runner's name.
 
         Raises:
             ValueError: When the type of runner is not RecomRunnerConfig, ForestRunner,
@@ -81,12 +107,39 @@ class RunContainer:
                 f"and found {type(configuration)}",
             )
 
-        if docker_client_args is not None:
-            self.client = docker.DockerClient(**docker_client_args)
-        else:
-            self.client = docker.from_env()
+        self.client = None
         self.container = None
         self.image_name = docker_image_name
+        self.graph = None
+        self.pull = pull
+        self.name = name
+
+        # Docker backends wrap the container started by __enter__.
+        self.backend = None
+        if isinstance(backend, Backend):
+            self.backend = backend
+        elif backend_name(backend, self.config.local_tools) == "local":
+            if not self.config.local_tools:
+                raise ValueError(
+                    f"Runners of type {type(self.config)} can only run in Docker."
+                )
+            self.backend = LocalBackend(paths=self._binds())
+        else:
+            # docker-py is only imported when it's needed, so runners can run
+            # locally on machines without it.
+            import docker
+
+            if docker_client_args is not None:
+                self.client = docker.DockerClient(**docker_client_args)
+            else:
+                self.client = docker.from_env()
+
+    def _binds(self) -> dict:
+        """
+        Maps the container paths in the runner's commands to host paths.
+        """
+        volumes = self.config.configure_vols_and_name()["volumes"]
+        return {volume["bind"]: host for host, volume in volumes.items()}
 
     def __enter__(self):
         """
@@ -95,6 +148,14 @@ class RunContainer:
         Raises:
             KeyError: When the docker image is not defined properly in the runner
         """
+        if self.client is None:
+            # Local processes write to the host directories which would have been
+            # mounted, so make sure they exist.
+            if isinstance(self.backend, LocalBackend):
+                for host in self._binds().values():
+                    os.makedirs(host, exist_ok=True)
+            return self
+
         vols_and_name = self.config.configure_vols_and_name()
 
         config_args = vols_and_name | {
@@ -105,18 +166,17 @@ class RunContainer:
             "stdin_open": True,
             "network_mode": "none",
         }
+        if self.name is not None:
+            config_args["name"] = self.name
 
         try:
-            print(f"Pulling Docker image {config_args['image']}")
-            self.client.images.pull(config_args["image"])
+            resolve_image(self.client, config_args["image"], pull=self.pull)
         except Exception as e:
-            print(
-                f"Error comparing docker container {config_args['image']} against web version. "
-                f"Attempting to run using local image"
-            )
+            print(f"Error finding Docker image {config_args['image']}: {e}")
 
         try:
             self.container = self.client.containers.run(**config_args)
+            self.backend = PooledContainer(self.client, self.container, {})
             print(f"Running Docker container {self.container.name}")
         except Exception as e:
             print(f"Error running Docker container: {e}")
@@ -144,8 +204,11 @@ class RunContainer:
             False: If an exception is raised, the error message will be printed
                 and the function will return False
         """
-        self.client.close()
+        if self.client is not None:
+            self.client.close()
         if self.container:
+            import docker
+
             try:
                 self.container.remove(force=True)
             except docker.errors.APIError as e:
@@ -174,6 +237,9 @@ class RunContainer:
         Args:
             *args: Variable length argument list.
             **kwargs: Variable length keyword argument list.
+
+        Returns:
+            int: The exit code of the run's command.
         """
         if not hasattr(self.config, "run_command"):
             raise NotImplementedError(
@@ -183,30 +249,47 @@ class RunContainer:
 
         cmd = self.config.run_command(*args, **kwargs)
         log_file = self.config.log_file(*args, **kwargs)
-        exec_id = self.client.api.exec_create(
-            self.container.id,
-            cmd=cmd,
-            tty=False,
-            stdout=True,
-            stderr=True,
-            stdin=False,
-        )
+        output_generator = self._logged(cmd, log_file)
 
-        output_generator = self.client.api.exec_start(
-            exec_id,
-            stream=True,
-            detach=False,
-            demux=True,
-        )
+        while True:
+            try:
+                stdout, _ = next(output_generator)
+            except StopIteration as stop:
+                return stop.value
+
+            if stdout is not None:
+                print(stdout.decode("utf-8"), end="")
+
+    def _logged(self, cmd: list, log_file: str) -> Generator:
+        """
+        Runs a command, writing its stderr to the log file as it's produced.
+
+        Args:
+            cmd (list): The command.
+            log_file (str): The path to the log file.
+
+        Yields:
+            Tuple[bytes, bytes]: ``(stdout, stderr)`` pairs of the command's output,
+            one of which is None.
+
+        Returns:
+            int: The command's exit code, as the generator's return value.
+        """
+        output_generator = self.backend.stream(cmd, demux=True)
 
         with open(log_file, "w") as f:
-            for output in output_generator:
-                if output[0] is not None:
-                    print(output[0].decode("utf-8"), end="")
+            while True:
+                try:
+                    output = next(output_generator)
+                except StopIteration as stop:
+                    return stop.value
+
                 if output[1] is not None:
                     f.write(output[1].decode("utf-8"))
                     f.flush()  # Ensure the output is written immediately
 
+                yield output
+
     def run_iter(self, *args, **kwargs):
         """
         Calls the run method of the provided runner variant with
@@ -217,7 +300,8 @@ class RunContainer:
             **kwargs: Variable length keyword argument list.
 
         Yields:
-            Tuple[Dict, str]: Dictionary of the sample number and updater values and the
+            Tuple[Dict, str]: Each JSON line of output, parsed by
+            `parse_assignment_line()` (so assignments are NumPy arrays), and the
             error message (if any)
         """
         if not hasattr(self.config, "run_command"):
@@ -228,52 +312,35 @@ class RunContainer:
 
         cmd = self.config.run_command(*args, **kwargs)
         log_file = self.config.log_file(*args, **kwargs)
-        exec_id = self.client.api.exec_create(
-            self.container.id,
-            cmd=cmd,
-            tty=False,
-            stdout=True,
-            stderr=True,
-            stdin=False,
-        )
-
-        output_generator = self.client.api.exec_start(
-            exec_id,
-            stream=True,
-            detach=False,
-            demux=True,
-        )
+        output_generator = self.backend.stream(cmd, demux=True)
 
-        # Sometimes the output is split between multiple lines
-        # So this will take care of that issue by accumulating the
-        # output until a newline is reached
-        stdout_buffer = ""
+        # Output arrives in chunks which needn't line up with the lines of JSON,
+        # so the chunks are framed into lines first.
+        framer = LineFramer()
         for stdout, stderr in output_generator:
             if stdout:
-                stdout_buffer += stdout.decode("utf-8")
-                # Process any complete JSON objects in the buffer
-                while "\n" in stdout_buffer and "}" in stdout_buffer:
-                    newline_index = stdout_buffer.find("\n")
-                    possible_json = stdout_buffer[:newline_index]
-
-                    if "}" in possible_json:
-                        try:
-                            json_obj = json.loads(possible_json)
-                            yield (json_obj, stderr.decode("utf-8") if stderr else None)
-                        except json.JSONDecodeError:
-                            print(f"Error parsing JSON: {possible_json}")
-                            exit(1)
-
-                        stdout_buffer = stdout_buffer[newline_index + 1 :]
-                    else:
-                        # If no complete JSON object, wait for more data
-                        break
+                error = stderr.decode("utf-8") if stderr else None
+                for line in framer.feed(stdout):
+                    if not line.lstrip().startswith(b"{"):
+                        continue
+
+                    try:
+                        json_obj = parse_assignment_line(line)
+                    except json.JSONDecodeError:
+                        print(f"Error parsing JSON: {line.decode('utf-8', 'replace')}")
+                        exit(1)
+
+                    yield (json_obj, error)
 
             elif stderr:
                 yield (None, stderr.decode("utf-8"))
 
     # Need the strings here to avoid the circular import
-    def mcmc_run_with_updaters(self, run_info: "Union[RecomRunInfo, ForestRunInfo]"):
+    def mcmc_run_with_updaters(
+        self,
+        run_info: "Union[RecomRunInfo, ForestRunInfo]",
+        graph: Optional[Union[Graph, str]] = None,
+    ):
         """
         Calls the run method of the provided runner variant with
         with the given arguments and then applies the updater functions
@@ -283,6 +350,11 @@ class RunContainer:
 
         Args:
             run_info (Union[RecomRunInfo, ForestRunInfo]): Information about the run
+            graph (Union[Graph, str], optional): The dual graph used to build
+                partitions for the updaters, or a path to one written by
+                `gerrytools.geometry.savegraph()`. If not provided, the graph is
+                read from the configured JSON file the first time this method is
+                called and reused afterwards.
 
         Yields:
             Tuple[Dict, str]: Dictionary of the sample number and updater values and the
@@ -307,56 +379,36 @@ class RunContainer:
         cmd = self.config.run_command(run_info)
 
         log_file = self.config.log_file(run_info)
-        exec_id = self.client.api.exec_create(
-            self.container.id,
-            cmd=cmd,
-            tty=False,
-            stdout=True,
-            stderr=True,
-            stdin=False,
-        )
-
-        output_generator = self.client.api.exec_start(
-            exec_id,
-            stream=True,
-            detach=False,
-            demux=True,
-        )
-
-        self.graph = Graph.from_json(
-            os.path.join(self.config.json_dir, self.config.json_name)
-        )
+        output_generator = self.backend.stream(cmd, demux=True)
+
+        if isinstance(graph, Graph):
+            self.graph = graph
+        elif graph is not None:
+            self.graph = loadgraph(graph)
+        elif self.graph is None:
+            self.graph = Graph.from_json(
+                os.path.join(self.config.json_dir, self.config.json_name)
+            )
 
         updater_values = {}
 
-        stdout_buffer = ""
+        framer = LineFramer()
         for stdout, stderr in output_generator:
             if stdout:
-                stdout_buffer += stdout.decode("utf-8")
-                # Process any complete JSON objects in the buffer
-                while "\n" in stdout_buffer and "}" in stdout_buffer:
-                    newline_index = stdout_buffer.find("\n")
-                    possible_json = stdout_buffer[:newline_index]
-
-                    if "}" in possible_json:
-                        try:
-                            json_obj = json.loads(possible_json)
-                            yield from (
-                                self._process_output(
-                                    json_obj,
-                                    run_info.updaters,
-                                    updater_values,
-                                    stderr.decode("utf-8") if stderr else None,
-                                )
-                            )
-                        except json.JSONDecodeError:
-                            print(f"Error parsing JSON: {possible_json}")
-                            exit(1)
-
-                        stdout_buffer = stdout_buffer[newline_index + 1 :]
-                    else:
-                        # If no complete JSON object, wait for more data
-                        break
+                error = stderr.decode("utf-8") if stderr else None
+                for line in framer.feed(stdout):
+                    if not line.lstrip().startswith(b"{"):
+                        continue
+
+                    try:
+                        json_obj = parse_assignment_line(line)
+                    except json.JSONDecodeError:
+                        print(f"Error parsing JSON: {line.decode('utf-8', 'replace')}")
+                        exit(1)
+
+                    yield from self._process_output(
+                        json_obj, run_info.updaters, updater_values, error
+                    )
 
             elif stderr:
                 yield (None, stderr.decode("utf-8"))
@@ -373,8 +425,9 @@ class RunContainer:
 
         Args:
             canon_json_line (Dict): JSON object from the output of the run. This is expected
+                to be in the standard `{'assignment': np.ndarray, 'sample': int}` format
+                produced by `parse_assignment_line()`
             updater_dict (Dict): Dictionary of updater functions to apply
-                to be in the standart `{'assignment': List[int], 'sample': int}` format
             updater_values (Dict): Dictionary of the updater values to return
             error (str, optional): Error message if there is one. Defaults to None.
 
@@ -383,7 +436,8 @@ class RunContainer:
             error message (if any)
         """
         partition = Partition(
-            self.graph, dict(enumerate(canon_json_line["assignment"]))
+            self.graph,
+            dict(enumerate(np.asarray(canon_json_line["assignment"]).tolist())),
         )
 
         for func_name, func in updater_dict.items():
@@ -67,6 +67,9 @@ class RecomRunnerConfig(RunnerConfig):
     frcw code on a given dual graph within the docker container.
     """
 
+    # The run command times frcw with GNU time, which logs its peak memory use.
+    local_tools = ("frcw", "/usr/bin/time")
+
     def __init__(
         self,
         json_file_path: str,
@@ -136,7 +139,10 @@ class RecomRunnerConfig(RunnerConfig):
             List[str]: The command that will be passed to docker.exec_create to run frcw.
         """
 
-        rust_cmd = ". /root/.cargo/env; /usr/bin/time -v frcw"
+        # The Cargo environment only exists in the Docker image.
+        rust_cmd = (
+            "[ -f /root/.cargo/env ] && . /root/.cargo/env; /usr/bin/time -v frcw"
+        )
 
         # Process the Run data
         rust_cmd += " --graph-json /home/recom/shapefiles/" + self.json_name
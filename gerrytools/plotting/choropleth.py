@@ -4,6 +4,7 @@ import numpy as np
 from matplotlib.axes import Axes
 import geopandas as gpd
 
+from ..geometry.simplify import simplify
 from .colors import overlays as overlaycolors
 from .districtnumbers import districtnumbers
 
@@ -29,6 +30,8 @@ def choropleth(
     interval=1 / 10,
     colorbar=True,
     figsize=(10, 10),
+    tolerance=None,
+    cache=None,
 ) -> Axes:
     r"""
     Visualization of population shares or totals in a state's map.
@@ -63,6 +66,12 @@ def choropleth(
         max (float, optional): The upper limit of the data points; defaults to 1.
         interval (float, optional): The width of the interval; a bin.
         colorbar (bool, optional): Do we include the color bar?
+        tolerance (float, optional): If provided, base, overlay, and district
+            geometries are simplified to this tolerance (in the units of
+            `geometries`' CRS) before they're drawn; see
+            `gerrytools.geometry.simplify`.
+        cache (str, optional): Directory in which simplified geometries are
+            cached; see `gerrytools.geometry.simplify`.
 
     Returns:
         A matplotlib `Axes` object visualizing a choropleth map with the provided
@@ -98,6 +107,9 @@ def choropleth(
             by=assignment, aggfunc={demographic_share_col: "sum"}
         )
 
+    if tolerance is not None:
+        geometries = simplify(geometries, tolerance, cache=cache)
+
     geometries.plot(
         column=demographic_share_col,
         cmap=cmap,
@@ -125,6 +137,8 @@ def choropleth(
     # Plot each of the overlays, adjusting CRSes and applying colors as we go.
     for idx, geom in enumerate(overlays):
         geom = geom.to_crs(geometries.crs)
+        if tolerance is not None:
+            geom = simplify(geom, tolerance, cache=cache)
         geom.boundary.plot(
             edgecolor=overlaycolors[-(idx + 1)], linewidth=1 / 4, ax=base
         )
@@ -133,6 +147,10 @@ def choropleth(
     if districts is not None:
         # if assignment is not None:
         #     districts = districts.dissolve(by=assignment).reset_index()
+        if tolerance is not None:
+            districts = simplify(
+                districts.to_crs(geometries.crs), tolerance, cache=cache
+            )
         districts.plot(
             edgecolor=district_linecolor, linewidth=district_lw, ax=base, color="None"
         )
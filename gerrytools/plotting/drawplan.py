@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt
 from matplotlib.axes import Axes
 
+from ..geometry.simplify import simplify
 from .colors import districtr
 from .districtnumbers import districtnumbers
 
@@ -14,6 +15,8 @@ def drawplan(
     lw=1 / 2,
     fontsize=15,
     edgecolor="black",
+    tolerance=None,
+    cache=None,
 ) -> Axes:
     """
     Visualizes the districting plan defined by `assignment`.
@@ -30,6 +33,12 @@ def drawplan(
         lw (float, optional): Line thickness if there are more than 20 districts.
         fontsize (float, optional): District-number font size; passed to
             `districtnumbers`.
+        edgecolor (str, optional): Edge color for overlaid geometries.
+        tolerance (float, optional): If provided, district and overlay geometries
+            are simplified to this tolerance (in meters) before they're drawn;
+            see `gerrytools.geometry.simplify`.
+        cache (str, optional): Directory in which simplified geometries are
+            cached; see `gerrytools.geometry.simplify`.
 
     Returns:
         A `matplotlib` `Axes` object for the geometries attached to `districts`.
@@ -39,6 +48,8 @@ def drawplan(
     districts = districts.dissolve(by=assignment).reset_index()
     N = len(districts)
     districts = districts.to_crs("epsg:3857")
+    if tolerance is not None:
+        districts = simplify(districts, tolerance, cache=cache)
     districts[assignment] = districts[assignment].astype(int)
     districts = districts.sort_values(by=assignment)
     if colors is None:
@@ -56,6 +67,8 @@ def drawplan(
     if overlays:
         for overlay in overlays:
             overlay = overlay.to_crs(districts.crs)
+            if tolerance is not None:
+                overlay = simplify(overlay, tolerance, cache=cache)
             overlay.plot(color="None", edgecolor=edgecolor, linewidth=1 / 8, ax=base)
 
     # If the `numbers` flag is passed, plot the numbers for each district.
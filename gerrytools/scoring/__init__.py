@@ -12,6 +12,7 @@ from .scores import (
     cut_edges,
     demographic_shares,
     demographic_tallies,
+    dispersion,
     efficiency_gap,
     eguia,
     gingles_districts,
@@ -72,4 +73,5 @@ __all__ = [
     "convex_hull",
     "pop_polygon",
     "cut_edges",
+    "dispersion",
 ]
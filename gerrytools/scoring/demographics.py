@@ -1,8 +1,11 @@
 from typing import Iterable
 
+import numpy as np
 from gerrychain import Partition
 from gerrychain.updaters import Tally
 
+from ..geometry import nodeframe
+from ..geometry.optimize import _dispersionmatrix
 from .types import DistrictWideScoreValue, Numeric, PlanWideScoreValue
 
 
@@ -39,3 +42,16 @@ def _max_deviation(part: Partition, totpop_col: str, pct: bool = False) -> Numer
     ideal_population = sum(totpop_counts.values()) / len(part)
     max_deviation = max([abs(pop - ideal_population) for pop in totpop_counts.values()])
     return max_deviation / ideal_population if pct else max_deviation
+
+
+def _dispersion(
+    part: Partition, enacted_col: str, pop_col: str
+) -> DistrictWideScoreValue:
+    nodes = nodeframe(part.graph)
+    proposed = np.array([part.assignment[node] for node in part.graph.nodes])
+    districts, displaced = _dispersionmatrix(
+        nodes[enacted_col].to_numpy(),
+        proposed[np.newaxis, :],
+        nodes[pop_col].to_numpy(),
+    )
+    return dict(zip(districts.tolist(), displaced[0].tolist()))
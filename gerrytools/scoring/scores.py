@@ -15,8 +15,15 @@ from gerrytools.geometry.compactness import (
     _reock,
     _schwartzberg,
 )
-
-from .demographics import _gingles_districts, _max_deviation, _pop_shares, _tally_pop
+from gerrytools.geometry.simplify import simplify
+
+from .demographics import (
+    _dispersion,
+    _gingles_districts,
+    _max_deviation,
+    _pop_shares,
+    _tally_pop,
+)
 from .partisan import (
     _aggregate_seats,
     _competitive_contests,
@@ -74,23 +81,25 @@ def summarize(
 
         if join_on is None:
             assignment = dict(part.assignment)
-            gdf = gdf.copy(deep=False)
         else:
             assignment = {
                 part.graph.nodes[node][join_on]: label
                 for node, label in part.assignment.items()
             }
-            gdf = gdf.set_index(join_on)
 
-        gdf["assignment"] = assignment
-        dissolved_gdf = gdf.dissolve(by="assignment")
-    else:
-        dissolved_gdf = None
+    # Units are dissolved once for each tolerance. Simplified units are cached
+    # by `simplify()`, so each plan only pays for dissolving them.
+    dissolved = {}
+    for tolerance in {score.tolerance for score in scores if score.dissolved}:
+        units = gdf if tolerance is None else simplify(gdf, tolerance)
+        units = units.copy(deep=False) if join_on is None else units.set_index(join_on)
+        units["assignment"] = assignment
+        dissolved[tolerance] = units.dissolve(by="assignment")
 
     summary = {}
     for score in scores:
         if score.dissolved:
-            summary[score.name] = score.apply(dissolved_gdf)
+            summary[score.name] = score.apply(dissolved[score.tolerance])
         else:
             summary[score.name] = score.apply(part)
     return summary
@@ -692,43 +701,73 @@ def gingles_districts(
     return scores
 
 
-def reock() -> Score:
+def reock(tolerance: float = None) -> Score:
     """
     Returns the reock score for each district in a plan.
+
+    Args:
+        tolerance (float, optional): If provided, unit geometries are
+            simplified to this tolerance (in the units of their CRS) before
+            they're dissolved into districts, trading a little accuracy for
+            speed. Units are only simplified once, however many plans are
+            scored; see `gerrytools.geometry.simplify`.
+
     Returns:
         A dictionary with districts as keys and reock scores as values.
     """
-    return Score("reock", _reock, dissolved=True)
+    return Score("reock", _reock, dissolved=True, tolerance=tolerance)
 
 
-def polsby_popper() -> Score:
+def polsby_popper(tolerance: float = None) -> Score:
     """
     Returns the polsby-popper score for each district in a plan.
 
+    Args:
+        tolerance (float, optional): If provided, unit geometries are
+            simplified to this tolerance (in the units of their CRS) before
+            they're dissolved into districts, trading a little accuracy for
+            speed. Units are only simplified once, however many plans are
+            scored; see `gerrytools.geometry.simplify`.
+
     Returns:
         A dictionary with districts as keys and polsby-popper scores as values.
     """
 
-    return Score("polsby_popper", _polsby_popper, dissolved=True)
+    return Score("polsby_popper", _polsby_popper, dissolved=True, tolerance=tolerance)
 
 
-def schwartzberg() -> Score:
+def schwartzberg(tolerance: float = None) -> Score:
     """
     Returns the schwartzberg score for each district in a plan.
+
+    Args:
+        tolerance (float, optional): If provided, unit geometries are
+            simplified to this tolerance (in the units of their CRS) before
+            they're dissolved into districts, trading a little accuracy for
+            speed. Units are only simplified once, however many plans are
+            scored; see `gerrytools.geometry.simplify`.
+
     Returns:
         A dictionary with districts as keys and schwartzberg scores as values.
     """
-    return Score("schwartzberg", _schwartzberg, dissolved=True)
+    return Score("schwartzberg", _schwartzberg, dissolved=True, tolerance=tolerance)
 
 
-def convex_hull() -> Score:
+def convex_hull(tolerance: float = None) -> Score:
     """
     Returns the convex-hull score for each district in a plan.
 
+    Args:
+        tolerance (float, optional): If provided, unit geometries are
+            simplified to this tolerance (in the units of their CRS) before
+            they're dissolved into districts, trading a little accuracy for
+            speed. Units are only simplified once, however many plans are
+            scored; see `gerrytools.geometry.simplify`.
+
     Returns:
         A dictionary with districts as keys and convex-hull scores as values.
     """
-    return Score("convex_hull", _convex_hull, dissolved=True)
+    return Score("convex_hull", _convex_hull, dissolved=True, tolerance=tolerance)
 
 
 def pop_polygon(block_gdf: GeoDataFrame, pop_col: str = "TOTPOP20") -> Score:
@@ -769,3 +808,32 @@ def max_deviation(totpop_col: str, pct: bool = False) -> Score:
         f"{totpop_col}_max_deviation",
         partial(_max_deviation, totpop_col=totpop_col, pct=pct),
     )
+
+
+def dispersion(enacted_col: str, pop_col: str, alias: str = None) -> Score:
+    """
+    Score representing the number of people displaced from each enacted district:
+    the population of the units assigned to an enacted district which are assigned
+    to a different district in the plan. District labels are compared as-is, so
+    plans should be relabeled to match the enacted plan first (e.g. with
+    `gerrytools.geometry.relabelensemble()`).
+
+    Args:
+        enacted_col (str): The node attribute on the `Partition`'s dual graph with
+            the enacted districts.
+        pop_col (str): The population column on the `Partition`'s dual graph.
+        alias (str, optional): Prefix for the score's name. Defaults to
+            `enacted_col`.
+
+    Returns:
+        A score object with the name `"{alias}_dispersion"` and associated function
+        that takes a partition and returns a DistrictWideScoreValue for the
+        population displaced from each enacted district.
+    """
+    if alias is None:
+        alias = enacted_col
+
+    return Score(
+        f"{alias}_dispersion",
+        partial(_dispersion, enacted_col=enacted_col, pop_col=pop_col),
+    )
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Callable, Mapping, NamedTuple, Union
+from typing import Callable, Mapping, NamedTuple, Optional, Union
 
 from geopandas import GeoDataFrame
 from gerrychain import Partition
@@ -30,3 +30,6 @@ class Score:
     name: str
     apply: Callable[[Union[Partition, GeoDataFrame]], ScoreValue]
     dissolved: bool = False
+    tolerance: Optional[float] = None
+    """For dissolved scores, the tolerance to which unit geometries are
+    simplified (once, and reused for every plan) before they're dissolved."""
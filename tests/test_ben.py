@@ -0,0 +1,558 @@
+import io
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import docker
+import numpy as np
+import pytest
+
+from gerrytools.ben import (
+    BenIndex,
+    BenReader,
+    BenWriter,
+    ContainerPool,
+    FakeBackend,
+    LocalBackend,
+    backend_name,
+    ben,
+    ben_replay,
+    ben_score,
+    ben_shards,
+    ben_to_xben,
+    canonicalize_ben_file,
+    index_path,
+    resolve_image,
+)
+from gerrytools.ben.codec import MAX_RUN
+from gerrytools.ben.framing import LineFramer, frame_lines, parse_assignment_line
+
+# Three samples, the first two identical, as encoded by the BEN CLI tool.
+PLANS = [
+    [1, 1, 2, 2, 3, 3, 3, 3],
+    [1, 1, 2, 2, 3, 3, 3, 3],
+    [2, 1, 2, 2, 3, 3, 3, 1],
+]
+STANDARD_BEN = bytes.fromhex(
+    "5354414e444152442042454e2046494c45"
+    "020300000002"
+    "54b8"
+    "020300000002"
+    "54b8"
+    "020200000003"
+    "95af50"
+)
+MKVCHAIN_BEN = bytes.fromhex(
+    "4d4b56434841494e2042454e2046494c45"
+    "020300000002"
+    "54b8"
+    "0002"
+    "020200000003"
+    "95af50"
+    "0001"
+)
+STANDARD_XBEN = bytes.fromhex(
+    "fd377a585a000000ff12d94104c0344921011c000000000000000000c9f51c4be000480"
+    "02c5d00299504255bb19d751edf9e13fe2da21e8f443faab118bfa2d970cd59aab9a1f3"
+    "70925b49b4c7eac21e2a800000000148491289261706729e7a010000000000595a"
+)
+MKVCHAIN_XBEN = bytes.fromhex(
+    "fd377a585a000000ff12d94104c0313d21011c000000000000000000b68df2b5e0003c0"
+    "0295d002692c71183d9555f827a39c8305d490d0ac97d0ae5e889bad3bb3e6e13ff8964"
+    "3cccf42d24afc48800000000000001453d7a42e0f506729e7a010000000000595a"
+)
+
+
+@pytest.mark.parametrize(
+    "data,variant",
+    [
+        (STANDARD_BEN, "standard"),
+        (MKVCHAIN_BEN, "mkv"),
+        (STANDARD_XBEN, "standard"),
+        (MKVCHAIN_XBEN, "mkv"),
+    ],
+)
+def test_benreader(data, variant):
+    with BenReader(io.BytesIO(data)) as reader:
+        assert reader.variant == variant
+        assert [assignment.tolist() for assignment in reader] == PLANS
+
+    # Batches are two-dimensional, and the last one may be short.
+    batches = list(BenReader(io.BytesIO(data)).batches(2))
+    assert [batch.shape for batch in batches] == [(2, 8), (1, 8)]
+    assert np.concatenate(batches).tolist() == PLANS
+
+    # Markov chain files store repeated samples once.
+    counts = [count for _, count in BenReader(io.BytesIO(data)).frames()]
+    assert counts == ([2, 1] if variant == "mkv" else [1, 1, 1])
+
+
+def test_benreader__errors():
+    with pytest.raises(ValueError):
+        BenReader(io.BytesIO(b"TWODELTA BEN FILE"))
+
+    with pytest.raises(ValueError):
+        list(BenReader(io.BytesIO(STANDARD_BEN[:-1])))
+
+
+@pytest.mark.parametrize(
+    "variant,expected", [("standard", STANDARD_BEN), ("mkv", MKVCHAIN_BEN)]
+)
+def test_benwriter(variant, expected):
+    # BEN files match the BEN CLI tool's output byte-for-byte.
+    stream = io.BytesIO()
+    with BenWriter(stream, variant=variant) as writer:
+        for plan in PLANS:
+            writer.write(plan)
+    assert stream.getvalue() == expected
+    assert writer.samples == len(PLANS)
+
+    # XBEN files (and BEN files compressed after the fact) round-trip.
+    stream = io.BytesIO()
+    with BenWriter(stream, variant=variant, xben=True) as writer:
+        for plan in PLANS:
+            writer.write(np.array(plan))
+    compressed = io.BytesIO()
+    ben_to_xben(io.BytesIO(expected), compressed)
+
+    for data in (stream.getvalue(), compressed.getvalue()):
+        reader = BenReader(io.BytesIO(data))
+        assert reader.compressed and reader.variant == variant
+        assert [assignment.tolist() for assignment in reader] == PLANS
+
+
+def test_benwriter__reused_buffer():
+    # Pending samples are copied, even when runs are split across frames, so
+    # callers can reuse their arrays.
+    buffer = np.array(PLANS[0])
+    stream = io.BytesIO()
+    with BenWriter(stream, variant="mkv") as writer:
+        writer._write(buffer, 2 * MAX_RUN + 1)
+        buffer[:] = PLANS[2]
+        writer.write(buffer)
+
+    frames = list(BenReader(io.BytesIO(stream.getvalue())).frames())
+    assert [(a.tolist(), count) for a, count in frames] == [
+        (PLANS[0], MAX_RUN),
+        (PLANS[0], MAX_RUN),
+        (PLANS[0], 1),
+        (PLANS[2], 1),
+    ]
+
+
+def test_benwriter__roundtrip():
+    # Long runs, wide values, and repeated samples survive a round trip.
+    rng = np.random.default_rng(2020)
+    plans = [np.repeat([1, 2, 3], [70000, 140000, 5])] * 3
+    plans += [rng.integers(0, 400, 2000) for _ in range(5)]
+
+    for variant in ("standard", "mkv"):
+        for xben in (False, True):
+            stream = io.BytesIO()
+            with BenWriter(stream, variant=variant, xben=xben) as writer:
+                for plan in plans:
+                    writer.write(plan)
+
+            stream.seek(0)
+            decoded = list(BenReader(stream))
+            assert all(np.array_equal(a, b) for a, b in zip(decoded, plans))
+            assert len(decoded) == len(plans)
+
+    with pytest.raises(ValueError):
+        BenWriter(io.BytesIO(), xben=True).write([1, 70000])
+
+
+@pytest.mark.parametrize("data", [STANDARD_BEN, MKVCHAIN_BEN])
+def test_benreader__random_access(data):
+    reader = BenReader(io.BytesIO(data))
+    assert len(reader.index) == len(PLANS)
+    assert reader.get(2).tolist() == PLANS[2]
+    assert reader[-2].tolist() == PLANS[1]
+    assert reader[1:].tolist() == PLANS[1:]
+    assert [a.tolist() for a in reader.samples(step=2)] == PLANS[::2]
+    assert [a.tolist() for a in reader.take([2, 0, 2])] == [PLANS[i] for i in (2, 0, 2)]
+
+    with pytest.raises(IndexError):
+        reader.get(3)
+
+    # Random access doesn't disturb sequential reading.
+    assert [assignment.tolist() for assignment in reader] == PLANS
+
+
+def test_benindex(tmp_path):
+    path = tmp_path / "plans.jsonl.ben"
+    with BenWriter(path, variant="mkv", index=True) as writer:
+        for plan in PLANS:
+            writer.write(plan)
+
+    # Writers index files as they go, matching an index built by scanning.
+    scanned = BenIndex.build(path)
+    assert writer.index.offsets.tolist() == scanned.offsets.tolist() == [17, 27]
+    assert writer.index.starts.tolist() == scanned.starts.tolist() == [0, 2, 3]
+    assert writer.index.size == scanned.size == len(MKVCHAIN_BEN)
+
+    stored = BenIndex.load(index_path(path))
+    assert stored.starts.tolist() == [0, 2, 3] and stored.mkv
+
+    # Stale indexes are rebuilt.
+    path.write_bytes(STANDARD_BEN)
+    with BenReader(path) as reader:
+        assert len(reader.index) == 3 and reader[0:3:2].tolist() == PLANS[::2]
+    assert BenIndex.load(index_path(path)).offsets.tolist() == [17, 25, 33]
+
+    # So are indexes of files rewritten with the same size.
+    path.write_bytes(MKVCHAIN_BEN)
+    assert BenIndex.for_file(path).starts.tolist() == [0, 2, 3]
+    with BenWriter(path, variant="mkv") as writer:
+        for plan in PLANS[::-1]:
+            writer.write(plan)
+    mtime = BenIndex.load(index_path(path)).mtime_ns
+    os.utime(path, ns=(mtime, mtime + 10**9))
+    index = BenIndex.for_file(path)
+    assert index.size == len(MKVCHAIN_BEN) and index.starts.tolist() == [0, 1, 3]
+    with BenReader(path) as reader:
+        assert reader[1].tolist() == PLANS[0]
+
+    # XBEN files can't be read out of order.
+    with pytest.raises(ValueError):
+        BenReader(io.BytesIO(STANDARD_XBEN))[0]
+    with pytest.raises(ValueError):
+        BenWriter(io.BytesIO(), xben=True, index=True)
+
+
+def _total(assignment):
+    return int(assignment.sum())
+
+
+@pytest.mark.parametrize("variant", ["standard", "mkv"])
+def test_ben_score(tmp_path, variant):
+    rng = np.random.default_rng(2020)
+    plans = [rng.integers(1, 5, 100) for _ in range(40)]
+    plans = [plan for plan in plans for _ in range(rng.integers(1, 4))]
+
+    path = tmp_path / "plans.jsonl.ben"
+    with BenWriter(path, variant=variant) as writer:
+        for plan in plans:
+            writer.write(plan)
+
+    # Ranges cover the file in order, without splitting frames.
+    index = BenIndex.for_file(path)
+    ranges = ben_shards(index, 7)
+    assert len(ranges) == 7 and ranges[0][0] == 0 and ranges[-1][1] == len(plans)
+    assert all(stop == start for (_, stop), (start, _) in zip(ranges, ranges[1:]))
+    assert all(start in index.starts for start, _ in ranges)
+
+    expected = [_total(plan) for plan in plans]
+    assert list(ben_score(path, _total, processes=1, shards=5)) == expected
+    assert list(ben_score(path, _total, processes=2)) == expected
+
+    xben = tmp_path / "plans.jsonl.xben"
+    ben_to_xben(path, xben)
+    with pytest.raises(ValueError):
+        next(ben_score(xben, _total))
+
+
+def test_ben_replay(tmp_path):
+    path = tmp_path / "plans.jsonl.ben"
+    path.write_bytes(MKVCHAIN_BEN)
+
+    assert list(ben_replay(str(path))) == [dict(enumerate(plan)) for plan in PLANS]
+    assert [a.tolist() for a in ben_replay(str(path), arrays=True)] == PLANS
+
+
+def test_frame_lines():
+    lines = [
+        json.dumps({"assignment": plan, "sample": i + 1}).encode()
+        for i, plan in enumerate(PLANS)
+    ]
+    stream = b"\n".join(lines) + b"\n"
+
+    # Lines are reassembled however the stream is chunked.
+    for size in (1, 7, len(stream)):
+        chunks = [stream[i : i + size] for i in range(0, len(stream), size)]
+        assert list(frame_lines(chunks)) == lines
+
+    framer = LineFramer()
+    assert framer.feed(b'{"a": 1}\n{"b"') == [b'{"a": 1}']
+    assert framer.feed(b": 2}") == []
+    assert framer.flush() == b'{"b": 2}' and framer.flush() is None
+
+    for i, line in enumerate(lines):
+        record = parse_assignment_line(line)
+        assert record["sample"] == i + 1
+        assert record["assignment"].dtype == np.int32
+        assert record["assignment"].tolist() == PLANS[i]
+
+
+def test_parse_assignment_line():
+    record = parse_assignment_line(b'{"sample": 2, "assignment" : [3, 1, 2]}')
+    assert record["sample"] == 2 and record["assignment"].tolist() == [3, 1, 2]
+
+    # Lines the fast path can't handle are parsed by json, and assignments which
+    # aren't integers that fit in the dtype are left as lists, not truncated.
+    record = parse_assignment_line(b'{"assignment": [1.5, 2], "sample": 1}')
+    assert record["assignment"] == [1.5, 2]
+
+    record = parse_assignment_line(b'{"assignment": [1, 2, 3.5]}')
+    assert record["assignment"] == [1, 2, 3.5]
+
+    record = parse_assignment_line(b'{"assignment": [1, 4294967296]}')
+    assert record["assignment"] == [1, 2**32]
+
+    record = parse_assignment_line(b'{"assignment": [1, 4294967296]}', np.int64)
+    assert record["assignment"].tolist() == [1, 2**32]
+
+    record = parse_assignment_line(b'{"assignment": [1, 99999999999999999999]}')
+    assert record["assignment"] == [1, 10**20 - 1]
+
+    record = parse_assignment_line(b'{"assignment": [true, 2]}')
+    assert record["assignment"] == [True, 2]
+
+    record = parse_assignment_line(b'{"assignment": [], "sample": 1}')
+    assert record["assignment"].tolist() == []
+
+    record = parse_assignment_line(b'{"assignment": [[1, 2], [3]], "sample": 1}')
+    assert record["assignment"] == [[1, 2], [3]]
+
+    with pytest.raises(json.JSONDecodeError):
+        parse_assignment_line(b'{"assignment": [1, 2, 3], "sample": }')
+
+
+class _FakeContainer:
+    def __init__(self, client, name, volumes):
+        self.client, self.name, self.id, self.volumes = client, name, name, volumes
+
+    def remove(self, force=False):
+        self.client.removed.append(self.name)
+
+
+class _FakeImage:
+    def __init__(self, name):
+        self.id = f"sha256:{name}"
+
+
+class _FakeDockerClient:
+    """
+    Stands in for a Docker client, recording the containers started and the
+    commands run in them.
+    """
+
+    def __init__(self):
+        self.started, self.removed, self.commands = [], [], []
+        self.lookups, self.pulled, self.local = [], [], set()
+        self.offline = False
+        self.lock = threading.Lock()
+        self.running = self.peak = 0
+        self.containers = self.images = self.api = self
+
+    def run(self, image, name, volumes, **kwargs):
+        container = _FakeContainer(self, name, volumes)
+        self.started.append(container)
+        return container
+
+    def get(self, image):
+        self.lookups.append(image)
+        if image not in self.local:
+            raise docker.errors.ImageNotFound(image)
+        return _FakeImage(image)
+
+    def pull(self, image):
+        if self.offline:
+            raise docker.errors.APIError("offline")
+        self.pulled.append(image)
+        self.local.add(image)
+        return _FakeImage(image)
+
+    def exec_create(self, container, cmd, **kwargs):
+        return (container, cmd)
+
+    def exec_start(self, exec_id, socket=False, **kwargs):
+        if socket:
+            return self._attach(exec_id)
+        return self._output(exec_id)
+
+    def _attach(self, exec_id):
+        # Like an attached exec running `tr a-z A-Z`: upper-case stdin once it's
+        # closed, and send it back in Docker's multiplexed frames.
+        ours, theirs = socket.socketpair()
+
+        def respond():
+            data = b"".join(iter(lambda: ours.recv(1 << 16), b""))
+            for stream_id, chunk in ((1, data.upper()), (2, b"done\n")):
+                ours.sendall(struct.pack(">BxxxL", stream_id, len(chunk)) + chunk)
+            ours.close()
+
+        self.commands.append(exec_id)
+        threading.Thread(target=respond, daemon=True).start()
+        return theirs
+
+    def _output(self, exec_id):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.01)
+        self.commands.append(exec_id)
+        with self.lock:
+            self.running -= 1
+        yield b""
+
+    def exec_inspect(self, exec_id):
+        return {"ExitCode": 0}
+
+
+def test_containerpool(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    client = _FakeDockerClient()
+
+    with ContainerPool(size=2, client=client, pull=False) as pool:
+        # Host paths are mounted and translated, and idle containers are reused.
+        for _ in range(3):
+            assert pool.run(["ben", tmp_path / "a" / "x.ben", "-v"], echo=False) == 0
+        assert len(client.started) == 1
+
+        container, cmd = client.commands[0]
+        bind = client.started[0].volumes[str((tmp_path / "a").resolve())]["bind"]
+        assert cmd == ["ben", f"{bind}/x.ben", "-v"]
+
+        # Commands run concurrently, in at most `size` uniquely-named containers.
+        futures = [
+            pool.submit(["reben", tmp_path / "b" / f"{i}.ben"], echo=False)
+            for i in range(8)
+        ]
+        assert [future.result() for future in futures] == [0] * 8
+        assert client.peak == 2
+        names = [container.name for container in client.started]
+        assert len(names) == len(set(names))
+
+    # The idle container for "a" made way for a second one for "b", and the
+    # rest were removed when the pool closed.
+    assert len(names) == 3 and sorted(client.removed) == sorted(names)
+
+
+def test_localbackend(tmp_path):
+    backend = LocalBackend(size=2, paths={"/home/ben/mnt": str(tmp_path)})
+    copy = "import sys, shutil; shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)"
+    script = "import sys; print(sys.argv[1]); print('oops', file=sys.stderr)"
+
+    # Mapped paths are translated, and output is combined unless demultiplexed.
+    command = [sys.executable, "-c", script, "/home/ben/mnt/x.ben"]
+    output = b"".join(backend.stream(command)).decode().split()
+    assert sorted(output) == sorted([f"{tmp_path}/x.ben", "oops"])
+
+    pairs = list(backend.stream(command, demux=True))
+    assert b"".join(out for out, _ in pairs if out).strip().decode() == (
+        f"{tmp_path}/x.ben"
+    )
+    assert b"".join(err for _, err in pairs if err).strip() == b"oops"
+
+    fail = [sys.executable, "-c", "raise SystemExit(3)"]
+    assert backend.run(fail, echo=False) == 3
+    assert backend.submit(fail, echo=False).result() == 3
+
+    # Streams which don't fit in the pipes' buffers flow through without deadlocks,
+    # and pipes can be chained.
+    data = [bytes([i]) * 100_000 for i in range(40)]
+    piped = backend.pipe([sys.executable, "-c", copy], data)
+    assert b"".join(backend.pipe([sys.executable, "-c", copy], piped)) == b"".join(data)
+
+    with pytest.raises(RuntimeError):
+        list(backend.pipe(fail, b"ignored"))
+
+    def broken():
+        yield b"partial"
+        raise ValueError("upstream failed")
+
+    with pytest.raises(ValueError):
+        list(backend.pipe([sys.executable, "-c", copy], broken()))
+    backend.close()
+
+
+def test_localbackend__without_docker():
+    # docker-py is only imported when Docker is used, so local runs work on
+    # machines without it.
+    script = """
+import sys
+
+sys.modules["docker"] = None
+
+import gerrytools.ben
+import gerrytools.mgrp
+from gerrytools.ben import LocalBackend
+
+backend = LocalBackend()
+output = b"".join(backend.stream([sys.executable, "-c", "print('ran')"]))
+assert output.strip() == b"ran", output
+assert backend.run([sys.executable, "-c", "pass"], echo=False) == 0
+backend.close()
+"""
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True)
+    assert result.returncode == 0, result.stderr.decode()
+
+
+def test_fakebackend(tmp_path):
+    line = b'{"assignment": [1, 2, 2], "sample": 1}\n'
+    backend = FakeBackend({"ben": [line[:10], line[10:]]}, exit_code=1)
+
+    plans = list(ben_replay(tmp_path / "x.ben", use_docker=True, backend=backend))
+    assert plans == [{0: 1, 1: 2, 2: 2}]
+    assert backend.commands[0][0] == "ben"
+    assert backend.run(["reben"], echo=False) == 1
+
+    # Streamed inputs are piped through stdin, and so are their outputs, once
+    # they're consumed.
+    backend = FakeBackend({"ben": [line[:10], line[10:]]})
+    encoded = ben("encode", [line], backend=backend)
+    assert list(encoded) == [line[:10], line[10:]] and backend.inputs[-1] == line
+    command = ["ben", "/dev/stdin", "-w", "-m", "encode", "-o", "/dev/stdout"]
+    assert backend.commands[-1] == command
+
+    output = canonicalize_ben_file(
+        tmp_path / "x.ben", tmp_path / "y.ben", verbose=False, backend=backend
+    )
+    assert output is None and backend.inputs[-1] is None
+    assert backend.commands[-1][-2:] == ["-o", str(tmp_path / "y.ben")]
+
+    assert backend_name("docker") == "docker"
+    assert backend_name("auto", ["definitely-not-a-gerrytools-tool"]) == "docker"
+    assert backend_name("auto", [sys.executable]) == "local"
+    with pytest.raises(ValueError):
+        backend_name("kubernetes")
+
+
+def test_resolve_image():
+    client = _FakeDockerClient()
+    image = "gerrytools/test-resolve-image:v1"
+
+    # Missing images are pulled, and resolutions are cached.
+    assert resolve_image(client, image) == f"sha256:{image}"
+    assert resolve_image(client, image) == f"sha256:{image}"
+    assert client.pulled == [image] and client.lookups == [image]
+
+    # Local images aren't pulled, even when expired, unless asked.
+    client.offline = True
+    assert resolve_image(client, image, ttl=0) == f"sha256:{image}"
+    assert client.pulled == [image] and len(client.lookups) == 2
+
+    # Failed pulls fall back to the local image, if there is one.
+    assert resolve_image(client, image, pull=True) == f"sha256:{image}"
+    with pytest.raises(docker.errors.APIError):
+        resolve_image(client, "gerrytools/test-resolve-image:missing")
+
+
+def test_containerpool__stdin(tmp_path):
+    client = _FakeDockerClient()
+
+    with ContainerPool(size=1, client=client) as pool:
+        chunks = (bytes([c]) * 50_000 for c in b"abc")
+        output = list(pool.stream(["tr", "a-z", "A-Z"], demux=True, stdin=chunks))
+
+        stdout = b"".join(out for out, _ in output if out)
+        assert stdout == b"A" * 50_000 + b"B" * 50_000 + b"C" * 50_000
+        assert [err for _, err in output if err] == [b"done\n"]
+        assert b"".join(pool.pipe(["tr", "a-z", "A-Z"], b"ben")) == b"BEN"
@@ -1,7 +1,14 @@
+import json
+import timeit
 from functools import partial
+from pathlib import Path
 
 import geopandas as gpd
+import networkx as nx
+import numpy as np
+import pandas as pd
 import pytest
+import shapely
 from gerrychain import (
     GeographicPartition,
     Graph,
@@ -12,19 +19,53 @@ from gerrychain import (
     updaters,
 )
 from gerrychain.proposals import recom
+from shapely.geometry import Polygon, box
+from shapely.strtree import STRtree
 
 from gerrytools.geometry import (
+    GraphArrays,
+    PerimeterIndex,
+    PointIndex,
+    SpatialIndexRegistry,
+    UnitMap,
+    adjacencymatrix,
+    arealoverlap,
     dataframe,
+    calculate_dispersion,
+    compactness_updaters,
     dispersion_updater_closure,
+    dispersion_updaters,
     dissolve,
     dualgraph,
     invert,
+    levelsofdetail,
+    loadarrays,
+    loadgraph,
+    minimize_dispersion,
+    minimize_dispersion_with_parity,
+    minimize_parity,
+    nodeframe,
+    optimalrelabeling,
+    populationoverlap,
+    relabelensemble,
+    savegraph,
+    simplify,
+    spatialindexes,
     unitmap,
 )
 
 from .utils import remotegraphresource, remoteresource
 
 
+@pytest.fixture(scope="module")
+def ia_dataframe():
+    """`GeoDataFrame` of Iowa counties."""
+    shp_path = (
+        Path(__file__).resolve().parent / "fixtures" / "ia_county_with_enacted_2020.zip"
+    )
+    return gpd.read_file(shp_path)
+
+
 @pytest.mark.xfail(
     reason="Documentation and call signature do not match; clarification needed."
 )
@@ -128,6 +169,339 @@ def test_dualgraph():
         assert data.get("BIDEN", False)
 
 
+def test_dualgraph_matches_gerrychain(ia_dataframe):
+    counties = ia_dataframe.to_crs("epsg:26915")
+    expected = Graph.from_geodataframe(counties.set_index("GEOID20"))
+    dg = dualgraph(counties, index="GEOID20")
+
+    # The caller's geometries shouldn't be buffered in place.
+    assert "GEOID20" in counties
+
+    # Same edges, shared perimeters, and boundary data as GerryChain.
+    assert set(map(frozenset, dg.edges())) == set(map(frozenset, expected.edges()))
+    for u, v, data in expected.edges(data=True):
+        assert dg.edges[u, v]["shared_perim"] == pytest.approx(data["shared_perim"])
+    for node, data in expected.nodes(data=True):
+        assert dg.nodes[node]["boundary_node"] == data["boundary_node"]
+        assert dg.nodes[node]["area"] == pytest.approx(data["area"])
+        if data["boundary_node"]:
+            assert dg.nodes[node]["boundary_perim"] == pytest.approx(
+                data["boundary_perim"]
+            )
+
+
+def test_adjacencymatrix(ia_dataframe):
+    counties = ia_dataframe.to_crs("epsg:26915")
+    rook = adjacencymatrix(counties)
+    queen = adjacencymatrix(counties, adjacency="queen")
+    tiled = adjacencymatrix(counties, processes=2, tiles=4)
+
+    # Rook adjacencies are symmetric, and a subset of queen adjacencies.
+    assert (rook != rook.T).nnz == 0
+    assert queen.nnz > rook.nnz
+    assert (queen.data == 0).sum() == queen.nnz - rook.nnz
+
+    # Tiling doesn't change the result.
+    assert (tiled != rook).nnz == 0
+
+    # Precomputed adjacencies can be reused.
+    dg = dualgraph(counties, index="GEOID20", adjacency=rook)
+    assert dg.number_of_edges() == rook.nnz // 2
+
+
+def test_arealoverlap(ia_dataframe):
+    counties = ia_dataframe.to_crs("epsg:26915")
+    enacted = counties.dissolve(by="DISTRICT", as_index=False)
+    proposed = enacted.assign(DISTRICT=enacted["DISTRICT"] % 4 + 1)
+
+    overlaps = arealoverlap(proposed, enacted)
+    expected = [
+        [p.intersection(e).area for e in enacted.geometry] for p in proposed.geometry
+    ]
+    assert overlaps.to_numpy() == pytest.approx(np.array(expected))
+    assert list(overlaps.index) == list(proposed["DISTRICT"])
+    assert list(overlaps.columns) == list(enacted["DISTRICT"])
+
+    # Sparse matrices have the same entries, and both give the same relabeling.
+    sparse = arealoverlap(proposed, enacted, sparse=True)
+    assert sparse.sparse.to_dense().equals(overlaps)
+    assert optimalrelabeling(
+        proposed, enacted, costmatrix=partial(arealoverlap, sparse=True)
+    ) == {d % 4 + 1: d for d in enacted["DISTRICT"]}
+
+
+def test_populationoverlap(ia_dataframe):
+    enacted = ia_dataframe[["GEOID20", "TOTPOP20", "DISTRICT"]].copy()
+    proposed = enacted.assign(DISTRICT=enacted["DISTRICT"] % 4 + 1)
+    before = proposed.copy()
+
+    overlaps = populationoverlap(proposed, enacted)
+
+    # Each proposed district shares all its population with one enacted district,
+    # and the inputs aren't modified.
+    assert overlaps.to_numpy().sum() == enacted["TOTPOP20"].sum()
+    assert (overlaps.astype(bool).sum(axis=1) == 1).all()
+    assert list(overlaps.index) == list(proposed["DISTRICT"].astype(str).unique())
+    assert proposed.equals(before)
+    assert optimalrelabeling(proposed, enacted) == {
+        str(d % 4 + 1): str(d) for d in enacted["DISTRICT"]
+    }
+
+
+def test_relabelensemble(ia_dataframe, tmp_path):
+    enacted = ia_dataframe["DISTRICT"].to_numpy()
+    population = ia_dataframe["TOTPOP20"].to_numpy()
+    plans = [(enacted + k) % 4 + 1 for k in range(3)]
+
+    # Relabeled plans match the reference plan, whatever form the plans take.
+    for relabeled in relabelensemble(plans, enacted, population):
+        assert (relabeled == enacted).all()
+
+    with open(tmp_path / "plans.jsonl", "w") as w:
+        w.writelines(json.dumps({"assignment": plan.tolist()}) + "\n" for plan in plans)
+
+    replayed = [dict(enumerate(plan.tolist())) for plan in plans]
+    assert [m for m in relabelensemble(replayed, enacted, mappings=True)] == [
+        m
+        for m in relabelensemble(str(tmp_path / "plans.jsonl"), enacted, mappings=True)
+    ]
+
+    # Mappings agree with optimalrelabeling().
+    frame = ia_dataframe[["GEOID20", "TOTPOP20"]]
+    left = frame.assign(DISTRICT=plans[1])
+    right = frame.assign(DISTRICT=enacted)
+    mapping = next(relabelensemble([plans[1]], enacted, population, mappings=True))
+    assert {str(k): str(v) for k, v in mapping.items()} == optimalrelabeling(
+        left, right
+    )
+
+    # Plans are read a few batches at a time when relabeling in parallel, and
+    # come back in order.
+    read = []
+
+    def stream():
+        for k in range(40):
+            read.append(k)
+            yield plans[k % 3]
+
+    relabeled = relabelensemble(stream(), enacted, population, processes=2, chunksize=2)
+    assert (next(relabeled) == enacted).all()
+    assert len(read) <= 2 * 2 * 2 + 2
+    assert len(list(relabeled)) == 39 and len(read) == 40
+
+    # Plans must cover the same units as the reference plan, and assign them all.
+    unassigned = plans[0].astype(float)
+    unassigned[0] = np.nan
+    with pytest.raises(ValueError):
+        next(relabelensemble([unassigned], enacted, population))
+    with pytest.raises(ValueError):
+        next(relabelensemble([plans[0][1:]], enacted, population))
+    with pytest.raises(ValueError):
+        next(relabelensemble(plans, unassigned, population))
+    with pytest.raises(ValueError):
+        next(relabelensemble(plans, enacted, population[1:]))
+
+
+def test_minimize_dispersion(ia_dataframe):
+    units = ia_dataframe[["TOTPOP20"]].assign(
+        DISTRICT=ia_dataframe["DISTRICT"].astype(int)
+    )
+    units["PROPOSED"] = units["DISTRICT"] % 4 + 1
+    units.loc[::7, "PROPOSED"] = 1
+
+    # Without extra constraints, the assignment problem is solved directly, and
+    # agrees with the model.
+    mapping = minimize_dispersion(units, "DISTRICT", "PROPOSED", "TOTPOP20")
+    assert mapping == {2: 1, 3: 2, 4: 3, 1: 4}
+    assert mapping == minimize_dispersion(
+        units, "DISTRICT", "PROPOSED", "TOTPOP20", lambda *args: None
+    )
+
+    with pytest.raises(ValueError):
+        minimize_dispersion(
+            units.assign(PROPOSED=0), "DISTRICT", "PROPOSED", "TOTPOP20"
+        )
+
+
+def test_minimize_parity():
+    units = pd.DataFrame(
+        {
+            "ENACTED": [1, 1, 2, 3, 3, 4, 5],
+            "PROPOSED": [1, 2, 2, 3, 4, 4, 5],
+            "POP": [10, 5, 7, 3, 8, 2, 4],
+        }
+    )
+
+    # Odd-enacted population is 10, 5, 3, 8, and 4 in proposed districts 1
+    # through 5, so districts 3 and 5 should be even.
+    parity = minimize_parity(units, "ENACTED", "PROPOSED", "POP")
+    assert parity == {1: False, 2: False, 3: True, 4: False, 5: True}
+
+    mapping = minimize_dispersion_with_parity(units, "ENACTED", "PROPOSED", "POP")
+    assert mapping[3] % 2 == 0 and mapping[5] % 2 == 0
+
+
+def test_dispersion_updaters(ia_dataframe):
+    graph = Graph.from_json(
+        Path(__file__).resolve().parent
+        / "fixtures"
+        / "ia_county_with_enacted_2020.json"
+    )
+    units = ia_dataframe[["DISTRICT", "TOTPOP20"]].copy()
+    before = units.copy()
+
+    initial_partition = Partition(
+        graph,
+        assignment="DISTRICT",
+        updaters={
+            "population": updaters.Tally("TOTPOP20", alias="population"),
+            "closure": dispersion_updater_closure(units, "DISTRICT", "TOTPOP20"),
+            **dispersion_updaters(units, "DISTRICT", "TOTPOP20"),
+        },
+    )
+    ideal_population = sum(initial_partition["population"].values()) / 4
+    chain = MarkovChain(
+        proposal=partial(
+            recom, pop_col="TOTPOP20", pop_target=ideal_population, epsilon=0.05
+        ),
+        constraints=[
+            constraints.within_percent_of_ideal_population(initial_partition, 0.05)
+        ],
+        accept=accept.always_accept,
+        initial_state=initial_partition,
+        total_steps=10,
+    )
+
+    # Incrementally-updated dispersion matches dispersion computed from scratch.
+    for partition in chain:
+        proposed = units.assign(PROPOSED=partition.assignment.to_series())
+        relabeling = minimize_dispersion(proposed, "DISTRICT", "PROPOSED", "TOTPOP20")
+        proposed["PROPOSED"] = proposed["PROPOSED"].map(relabeling)
+        expected = calculate_dispersion(proposed, "DISTRICT", "PROPOSED", "TOTPOP20")
+
+        assert partition["dispersion"] == partition["closure"] == expected
+
+    assert units.equals(before)
+
+
+def test_spatialindexes(ia_dataframe):
+    counties = ia_dataframe.to_crs("epsg:26915")
+    districts = counties.dissolve(by="DISTRICT", as_index=False)
+
+    # Repeated mappings reuse the cached points and indexes, including for
+    # equivalent copies of the same layer.
+    spatialindexes.invalidate()
+    first = unitmap((counties, "GEOID20"), (districts, "DISTRICT"))
+    hits = spatialindexes.hits
+    second = unitmap((counties.copy(), "GEOID20"), (districts, "DISTRICT"))
+    assert first == second
+    assert first == dict(zip(counties["GEOID20"], counties["DISTRICT"]))
+    assert spatialindexes.hits == hits + 2
+    assert len(spatialindexes) == 2
+
+    spatialindexes.invalidate(districts)
+    assert len(spatialindexes) == 1
+
+    # Entries are evicted when there are too many, or they're too large.
+    registry = SpatialIndexRegistry(maxentries=1)
+    registry.tree(counties)
+    registry.tree(districts)
+    assert len(registry) == 1
+    assert registry.tree(districts) is registry.tree(districts.to_crs(districts.crs))
+
+    registry = SpatialIndexRegistry(maxbytes=0)
+    registry.points(counties)
+    assert len(registry) == 0
+
+    # Layers with the same bounds and vertex counts, but different shapes, don't
+    # share entries.
+    registry = SpatialIndexRegistry()
+    square = gpd.GeoSeries([box(0, 0, 2, 2)], crs="epsg:26915")
+    notched = gpd.GeoSeries(
+        [Polygon([(0, 0), (2, 0), (2, 2), (0, 1)])], crs="epsg:26915"
+    )
+    assert shapely.get_num_coordinates(square.values).tolist() == [5]
+    assert shapely.get_num_coordinates(notched.values).tolist() == [5]
+    assert (square.total_bounds == notched.total_bounds).all()
+    assert registry.fingerprint(square) != registry.fingerprint(notched)
+    assert registry.tree(square) is not registry.tree(notched)
+
+    # Hits don't re-read the geometries, so they're cheaper than rebuilding.
+    registry = SpatialIndexRegistry()
+    x, y = np.divmod(np.arange(40000), 200)
+    grid = gpd.GeoSeries(shapely.box(x, y, x + 1, y + 1), crs="epsg:26915")
+    registry.tree(grid)
+    hit = min(timeit.repeat(lambda: registry.tree(grid), number=1, repeat=5))
+    build = min(timeit.repeat(lambda: STRtree(grid.values), number=1, repeat=5))
+    assert registry.hits == 5 and hit < build / 10
+
+    # Layers modified in place are re-indexed once invalidated.
+    grid[0] = box(-1, -1, 0, 0)
+    registry.invalidate(grid)
+    assert len(registry) == 0
+    assert registry.tree(grid).geometries[0].equals(box(-1, -1, 0, 0))
+
+
+def test_binarygraph(ia_dataframe, tmp_path):
+    graph = Graph.from_json(
+        Path(__file__).resolve().parent
+        / "fixtures"
+        / "ia_county_with_enacted_2020.json"
+    )
+    savegraph(graph, tmp_path / "graph")
+    loaded = loadgraph(tmp_path / "graph")
+
+    # Nodes, edges, and their attributes survive the round trip, including
+    # missing and None-valued attributes.
+    assert list(loaded.nodes) == list(graph.nodes)
+    assert set(map(frozenset, loaded.edges)) == set(map(frozenset, graph.edges))
+    assert all(loaded.nodes[n] == data for n, data in graph.nodes(data=True))
+    assert all(loaded.edges[u, v] == data for u, v, data in graph.edges(data=True))
+    assert loaded.graph["crs"] == graph.graph["crs"]
+
+    # Arrays are memory-mapped, and the adjacency structure is available without
+    # building a graph.
+    arrays = loadarrays(tmp_path / "graph")
+    assert isinstance(arrays.columns["TOTPOP20"], np.memmap)
+    assert arrays.adjacency.nnz == 2 * graph.number_of_edges()
+
+    # Graphs can be written straight from an adjacency matrix.
+    counties = ia_dataframe.to_crs("epsg:26915")
+    savegraph(
+        GraphArrays.from_adjacency(adjacencymatrix(counties), counties),
+        tmp_path / "direct",
+    )
+    direct = loadgraph(tmp_path / "direct")
+    assert direct.number_of_edges() == dualgraph(counties).number_of_edges()
+    assert "geometry" not in direct.nodes[0]
+
+    # Mixed-type attributes keep their types rather than being coerced to a
+    # common one.
+    mixed = Graph()
+    mixed.add_nodes_from(range(6))
+    mixed.add_edges_from(zip(range(5), range(1, 6)))
+    values = [1, "1", 2.5, True, None, (1, 2)]
+    for node, value in zip(mixed.nodes, values):
+        mixed.nodes[node].update(MIXED=value, NUMBER=[3, 1.5, None, 4, 0, 2][node])
+    savegraph(mixed, tmp_path / "mixed")
+    loaded = loadgraph(tmp_path / "mixed")
+    for node, data in mixed.nodes(data=True):
+        for name, value in data.items():
+            assert loaded.nodes[node][name] == value
+            assert type(loaded.nodes[node][name]) is type(value)
+
+    # So do node labels.
+    labeled = nx.relabel_nodes(mixed, dict(enumerate([1, "1", 2.5, (1, 2), "a", 3])))
+    savegraph(labeled, tmp_path / "labeled")
+    loaded = loadgraph(tmp_path / "labeled")
+    assert list(loaded.nodes) == list(labeled.nodes)
+    assert [type(node) for node in loaded.nodes] == [type(n) for n in labeled.nodes]
+    assert set(map(frozenset, loaded.edges)) == set(map(frozenset, labeled.edges))
+    assert (
+        loaded.nodes[1] == labeled.nodes[1] and loaded.nodes["1"] == labeled.nodes["1"]
+    )
+
+
 def test_unitmap():
     # Read in some test dataframes.
     vtds = gpd.read_file(remoteresource("test-vtds.geojson"))
@@ -148,6 +522,33 @@ def test_unitmap():
     assert len(inverse) == len(counties)
 
 
+def test_unitmap_compact(ia_dataframe, tmp_path):
+    counties = ia_dataframe.to_crs("epsg:26915")
+    districts = dissolve(counties, by="DISTRICT")
+
+    # Make a compact assignment and check it against the dictionary version.
+    umap = unitmap((counties, "GEOID20"), (districts, "DISTRICT"), compact=True)
+    assert type(umap) is UnitMap
+    assert len(umap) == len(counties)
+    assert umap.to_dict() == dict(zip(counties["GEOID20"], counties["DISTRICT"]))
+    assert UnitMap.from_dict(umap.to_dict()).to_dict() == umap.to_dict()
+
+    # Invert it; each district should get its counties.
+    inverse = invert(umap)
+    assert len(inverse) == len(districts)
+    assert sum(len(members) for members in inverse.values()) == len(counties)
+    assert set(umap.members(1)) == set(inverse[1])
+
+    # Compose with a district-to-parity mapping.
+    parity = UnitMap.from_dict({d: d % 2 for d in districts["DISTRICT"]})
+    composed = umap.compose(parity)
+    assert composed.to_dict() == {c: d % 2 for c, d in umap.to_dict().items()}
+
+    # Save and load.
+    umap.save(tmp_path / "umap.npz")
+    assert UnitMap.load(tmp_path / "umap.npz").to_dict() == umap.to_dict()
+
+
 def test_dataframe():
     G = remotegraphresource("test-graph.json")
 
@@ -161,6 +562,155 @@ def test_dataframe():
     len(P.parts) == 92
 
 
+def test_dataframe_cached():
+    G = Graph.from_json(
+        Path(__file__).resolve().parent
+        / "fixtures"
+        / "ia_county_with_enacted_2020.json"
+    )
+    P = Partition(graph=G, assignment="DISTRICT")
+    Q = P.flip({0: 1 if P.assignment[0] != 1 else 2})
+
+    # Node data is framed once per graph, and shared by partitions on it.
+    assert nodeframe(P.graph) is nodeframe(Q.graph) is nodeframe(G)
+
+    # Cached frames match freshly-built ones, and aren't modified by callers.
+    df = dataframe(Q, columns=["TOTPOP20"])
+    fresh = dataframe(Q, columns=["TOTPOP20"], cache=False)
+    assert df.equals(fresh)
+    assert list(df.columns) == ["DISTRICT", "id", "TOTPOP20"]
+    assert df["DISTRICT"].tolist() == [Q.assignment[v] for v in G.nodes]
+
+    df["TOTPOP20"] = 0
+    assert "PLAN" in dataframe(P, assignment="PLAN", columns=["TOTPOP20"])
+    assert "PLAN" not in nodeframe(G)
+    assert (dataframe(P)["TOTPOP20"] > 0).all()
+
+
+def test_simplify(ia_dataframe, tmp_path):
+    counties = ia_dataframe.to_crs("epsg:26915")
+    simplified = simplify(counties, 1000)
+    coordinates = lambda gdf: shapely.get_num_coordinates(gdf.geometry.values).sum()
+
+    # Simplified counties are valid, smaller, and still tile the state: they
+    # have the same neighbors and don't overlap.
+    assert coordinates(simplified) < coordinates(counties) / 10
+    assert simplified.is_valid.all()
+    assert simplified.drop(columns="geometry").equals(counties.drop(columns="geometry"))
+    before, after = adjacencymatrix(counties), adjacencymatrix(simplified)
+    assert (before.astype(bool) != after.astype(bool)).nnz == 0
+
+    areas = simplified.area.sum()
+    assert simplified.union_all().area == pytest.approx(areas, rel=1e-9)
+
+    # Levels of detail are cached on disk and read back.
+    levels = levelsofdetail(counties, [100, 5000], cache=str(tmp_path))
+    assert set(levels) == {100, 5000}
+    assert len(list(tmp_path.iterdir())) == 2
+    assert coordinates(levels[5000]) < coordinates(levels[100])
+
+    cached = simplify(counties, 5000, cache=str(tmp_path))
+    assert cached.geom_equals_exact(levels[5000], 0).all()
+
+    # A sliver whose two sides run between the same junctions would collapse if
+    # both were simplified; its sides are kept instead, so the units still tile
+    # the square without gaps or overlaps.
+    sliver = Polygon(
+        [(5, 2), (4.8, 3), (4.9, 5), (4.8, 7), (5, 8), (5.2, 7), (5.1, 5), (5.2, 3)]
+    )
+    plan = gpd.GeoDataFrame(
+        {"DISTRICT": [1, 2, 3]},
+        geometry=[
+            box(0, 0, 5, 10).difference(sliver),
+            sliver,
+            box(5, 0, 10, 10).difference(sliver),
+        ],
+    )
+    simplified = simplify(plan, 1)
+    assert simplified.is_valid.all() and not simplified.is_empty.any()
+    assert simplified.area.sum() == pytest.approx(100)
+    assert simplified.union_all().equals(box(0, 0, 10, 10))
+    assert simplified.geometry[1].equals(sliver)
+
+
+def test_perimeterindex(ia_dataframe):
+    graph = dualgraph(ia_dataframe.to_crs("epsg:26915"))
+    initial_partition = GeographicPartition(
+        graph,
+        assignment="DISTRICT",
+        updaters={
+            "population": updaters.Tally("TOTPOP20", alias="population"),
+            **compactness_updaters(graph),
+        },
+    )
+
+    ideal_population = sum(initial_partition["population"].values()) / 4
+    chain = MarkovChain(
+        proposal=partial(
+            recom, pop_col="TOTPOP20", pop_target=ideal_population, epsilon=0.05
+        ),
+        constraints=[
+            constraints.within_percent_of_ideal_population(initial_partition, 0.05)
+        ],
+        accept=accept.always_accept,
+        initial_state=initial_partition,
+        total_steps=10,
+    )
+
+    # Array-based areas and perimeters (which replace GeographicPartition's
+    # defaults) match GerryChain's updaters.
+    index = PerimeterIndex.from_graph(GraphArrays.from_graph(graph))
+    for partition in chain:
+        assignment = partition["assignment_array"]
+        assert (assignment == index.assignment(partition)).all()
+
+        expected = updaters.perimeter(partition)
+        for part, perimeter in index.perimeters(assignment).items():
+            assert perimeter == pytest.approx(expected[part])
+
+        for part, score in partition["polsby_popper"].items():
+            assert score == pytest.approx(
+                4 * np.pi * partition["area"][part] / expected[part] ** 2
+            )
+
+
+def test_pointindex(ia_dataframe, tmp_path):
+    counties = ia_dataframe.to_crs("epsg:26915")
+    index = PointIndex.from_geometries(counties, "GEOID20")
+
+    # Scatter points over (and around) the state.
+    rng = np.random.default_rng(2020)
+    minx, miny, maxx, maxy = counties.total_bounds
+    points = gpd.GeoDataFrame(
+        geometry=gpd.points_from_xy(
+            rng.uniform(minx - 1e4, maxx + 1e4, 20000),
+            rng.uniform(miny - 1e4, maxy + 1e4, 20000),
+        ),
+        crs=counties.crs,
+    )
+
+    # Points are located in the same counties as a spatial join, including
+    # when they're in another CRS.
+    joined = gpd.sjoin(points, counties[["GEOID20", "geometry"]], how="left")
+    expected = joined["GEOID20"].groupby(level=0).first()
+    located = index.locate(points.to_crs("epsg:4326"))
+
+    assert isinstance(located, UnitMap)
+    assert located.to_dict() == expected.dropna().to_dict()
+
+    # Points are mapped to districts through an assignment.
+    assignment = dict(zip(counties["GEOID20"], counties["DISTRICT"]))
+    districts = index.assign(points, assignment)
+    assert np.array_equal(
+        districts, expected.map(assignment).to_numpy(dtype=float), equal_nan=True
+    )
+
+    # Indexes round-trip through disk.
+    index.save(tmp_path / "index.npz")
+    loaded = PointIndex.load(tmp_path / "index.npz")
+    assert np.array_equal(loaded.codes(points), index.codes(points))
+
+
 if __name__ == "__main__":
     test_dataframe()
     # test_dualgraph()
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from gerrychain import Graph
+
+from gerrytools.ben import FakeBackend
+from gerrytools.mgrp import RecomRunInfo, RecomRunnerConfig, RunContainer, RunLauncher
+
+
+class _SlowBackend(FakeBackend):
+    """
+    Replays output slowly, recording how many commands run at once.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.running = self.peak = 0
+
+    def stream(self, command, demux=False, stdin=None):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.05)
+        try:
+            return (yield from super().stream(command, demux, stdin))
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_runlauncher(tmp_path):
+    config = RecomRunnerConfig(
+        json_file_path=str(tmp_path / "grid.json"),
+        output_folder=str(tmp_path / "output"),
+        log_folder=str(tmp_path / "logs"),
+    )
+    runs = [
+        RecomRunInfo(
+            pop_col="TOTPOP",
+            assignment_col="district",
+            variant="A",
+            n_threads=2,
+            rng_seed=seed,
+        )
+        for seed in range(6)
+    ]
+    outputs = {"frcw": [(b"sample\n", None), (None, b"step 1\nstep"), (None, b" 2\n")]}
+    backend = _SlowBackend(outputs)
+
+    lines = []
+    launcher = RunLauncher(config, max_containers=3, cores=4, backend=backend)
+    results = launcher.run(
+        runs, lambda result, line: lines.append(line), capture_output=True
+    )
+
+    # Runs reserve their threads, so only two of the three containers run at once.
+    assert backend.peak == 2 and len(backend.commands) == 6
+    assert [result.index for result in results] == list(range(6))
+    assert all(result.ok and result.output == b"sample\n" for result in results)
+    assert lines.count("step 1") == lines.count("step 2") == 6
+    with open(results[0].log_file) as log:
+        assert log.read() == "step 1\nstep 2\n"
+
+    # Failed runs are reported without stopping the others.
+    backend.exit_code = 1
+    results = launcher.run(runs[:2] + [{"bad": "kwargs"}], lambda *args: None)
+    assert [result.status for result in results] == ["failed"] * 3
+    assert results[0].exit_code == 1 and isinstance(results[2].error, TypeError)
+
+
+def test_runcontainer_output(tmp_path):
+    config = RecomRunnerConfig(
+        json_file_path=str(tmp_path / "grid.json"),
+        output_folder=str(tmp_path / "output"),
+        log_folder=str(tmp_path / "logs"),
+    )
+    run_info = RecomRunInfo(
+        pop_col="TOTPOP",
+        assignment_col="district",
+        variant="A",
+        updaters={"parts": lambda partition: len(partition.parts)},
+    )
+    lines = b'{"assignment": [1, 2], "sample": 1}\n{"assignment": ["a", "a"], "sample": 2}\n'
+    backend = FakeBackend({"frcw": [(lines, None)]})
+    graph = Graph()
+    graph.add_edge(0, 1)
+
+    # Assignments are parsed the same way whether or not the fast path applies.
+    with RunContainer(config, backend=backend) as container:
+        records = [record for record, _ in container.run_iter(run_info)]
+        assert records[0]["assignment"].tolist() == [1, 2]
+        assert records[1]["assignment"] == ["a", "a"]
+
+        outputs = container.mcmc_run_with_updaters(run_info, graph=graph)
+        assert [output["updaters"]["parts"] for output, _ in outputs] == [2, 1]
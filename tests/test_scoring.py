@@ -1,3 +1,5 @@
+import importlib
+from collections import OrderedDict
 from math import pi, sqrt
 from pathlib import Path
 
@@ -7,10 +9,12 @@ from gerrychain import Graph, Partition
 from gerrychain.grid import Grid
 from shapely.geometry import box
 
+from gerrytools.geometry import calculate_dispersion_per_district_many
 from gerrytools.scoring import (
     contiguous,
     convex_hull,
     deviations,
+    dispersion,
     pieces,
     polsby_popper,
     pop_polygon,
@@ -18,11 +22,15 @@ from gerrytools.scoring import (
     schwartzberg,
     splits,
     summarize,
+    summarize_many,
     unassigned_units,
 )
 
 from .utils import remotegraphresource
 
+# The module, rather than the function of the same name which shadows it.
+simplifymodule = importlib.import_module("gerrytools.geometry.simplify")
+
 
 @pytest.fixture(scope="module")
 def ia_dataframe():
@@ -259,6 +267,55 @@ def test_reock__iowa_counties(ia_enacted, ia_dataframe):
     assert abs(avg_reock - 0.38247) < 1e-4
 
 
+def test_compactness__simplified(ia_enacted, ia_dataframe, monkeypatch):
+    simplified = []
+    simplifyshapes = simplifymodule._simplifyshapes
+
+    def counted(*args):
+        simplified.append(args)
+        return simplifyshapes(*args)
+
+    monkeypatch.setattr(simplifymodule, "_simplifyshapes", counted)
+    monkeypatch.setattr(simplifymodule, "_SIMPLIFIED", OrderedDict())
+
+    # Units are simplified once, and reused for every plan and score.
+    scores = [
+        reock(0.001),
+        polsby_popper(0.001),
+        schwartzberg(0.001),
+        convex_hull(0.001),
+    ]
+    flipped = ia_enacted.flip({0: 1 if ia_enacted.assignment[0] != 1 else 2})
+    summaries = [
+        summarize(plan, scores, gdf=ia_dataframe, join_on="GEOID20")
+        for plan in (ia_enacted, flipped)
+    ]
+    assert len(simplified) == 1
+
+    # Scores of the simplified districts approximate the exact scores.
+    exact = summarize(
+        ia_enacted,
+        [reock(), polsby_popper(), schwartzberg(), convex_hull()],
+        gdf=ia_dataframe,
+        join_on="GEOID20",
+    )
+    for name, values in exact.items():
+        assert summaries[0][name] == pytest.approx(values, rel=0.05)
+
+
+def test_pop_polygon__iowa_counties(ia_dataframe):
+    districts = ia_dataframe.dissolve(by="DISTRICT", aggfunc={"TOTPOP20": "sum"})
+    scores = pop_polygon(ia_dataframe).apply(districts)
+
+    # Each district's population is divided by the population of the counties
+    # touching its convex hull.
+    for district, row in districts.iterrows():
+        hull = gpd.clip(ia_dataframe, row.geometry.convex_hull)
+        assert scores[district] == pytest.approx(
+            row["TOTPOP20"] / hull["TOTPOP20"].sum()
+        )
+
+
 @pytest.mark.skip(reason="Tests should use real-world data.")
 def test_reock_score_squares_geodataframe():
     grid = Grid((10, 10))
@@ -315,5 +372,28 @@ def test_reock_score_disconnected():
     assert abs(scored[3] == (27 / 25) * (pi / 2)) < 1e-4
 
 
+def test_dispersion__iowa_counties(ia_graph, ia_dataframe):
+    shifted = {v: d % 4 + 1 for v, d in ia_graph.nodes(data="DISTRICT")}
+    parts = [
+        Partition(graph=ia_graph, assignment="DISTRICT"),
+        Partition(graph=ia_graph, assignment=shifted),
+    ]
+
+    # No one is displaced by the enacted plan, and everyone is displaced when
+    # the labels are shifted.
+    summaries = summarize_many(parts, [dispersion("DISTRICT", "TOTPOP20")])
+    totals = ia_dataframe.groupby("DISTRICT")["TOTPOP20"].sum().to_dict()
+    assert summaries[0]["DISTRICT_dispersion"] == {d: 0 for d in totals}
+    assert summaries[1]["DISTRICT_dispersion"] == totals
+
+    # Batch dispersion agrees with the score.
+    units = ia_dataframe.assign(SHIFTED=ia_dataframe["DISTRICT"] % 4 + 1)
+    batch = calculate_dispersion_per_district_many(
+        units, "DISTRICT", ["DISTRICT", "SHIFTED"], "TOTPOP20"
+    )
+    assert batch.loc["DISTRICT"].to_dict() == summaries[0]["DISTRICT_dispersion"]
+    assert batch.loc["SHIFTED"].to_dict() == totals
+
+
 if __name__ == "__main__":
     pass